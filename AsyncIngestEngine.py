@@ -0,0 +1,385 @@
+"""
+    Asyncio ingestion engine, an alternative to IngestPool built on the
+    asyncpg driver. Requires Python 3 and asyncpg.
+"""
+from BatchParser import parse_batch
+from CopyStream import CopyStream
+from DataFileHandler import DataFileHandler
+from DataFormat import DataFormat
+from IngestLedger import fingerprint
+from IngestLedger import LOADED
+from IngestLedger import LOADING
+from Specification import Specification
+from SpecificationCache import SpecificationCache
+from TableCache import TABLES_QUERY as CATALOG_TABLES_QUERY
+
+import asyncio
+import io
+import logging
+import os
+import threading
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+LOG = logging.getLogger(__name__)
+
+SPEC_ID_QUERY = """SELECT spec_id FROM specification_formats WHERE
+                   spec_name = $1;"""
+SPEC_COLUMNS_QUERY = """SELECT * FROM specification_format_columns WHERE
+                        spec_id = $1 ORDER BY column_id;"""
+# TableCache's query, with the asyncpg placeholder
+TABLES_QUERY = CATALOG_TABLES_QUERY.replace('%s', '$1')
+LEDGER_ENTRY_QUERY = """SELECT file_size, content_hash, status, byte_offset,
+                        next_line, row_count, rows_rejected
+                        FROM file_ingest_ledger WHERE file_path = $1;"""
+# claims the file's entry for the load's transaction, as long as no other
+# load moved it on from where this one starts
+LEDGER_CLAIM_QUERY = """INSERT INTO file_ingest_ledger(file_path, file_size,
+                        content_hash, spec_name, status, byte_offset,
+                        next_line, row_count, rows_rejected)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                        ON CONFLICT (file_path) DO UPDATE SET
+                        file_size = EXCLUDED.file_size,
+                        content_hash = EXCLUDED.content_hash,
+                        spec_name = EXCLUDED.spec_name,
+                        status = EXCLUDED.status, updated_at = now()
+                        WHERE file_ingest_ledger.byte_offset = $6
+                        RETURNING file_path;"""
+LEDGER_FINISH_QUERY = """UPDATE file_ingest_ledger SET status = $2,
+                         byte_offset = $3, next_line = $4, row_count = $5,
+                         rows_rejected = $6, updated_at = now()
+                         WHERE file_path = $1;"""
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class AsyncIngestEngine(object):
+    """
+        Loads data files on an asyncio event loop running in its own
+        thread. Files submitted from the watchdog threads are queued and
+        loaded by a bounded number of concurrent tasks; within a file,
+        reading and parsing the next batch runs in an executor while the
+        current batch is being copied, so CPU work overlaps the network
+        wait. Files for the same table are loaded one at a time.
+
+        Parsing follows DataFormat: the same row slicer, converters, batch
+        validation and reject file, with each file loaded in one
+        transaction through COPY in the text format, so postgres casts
+        every column as it does for DataFormat's COPY. A batch whose COPY
+        fails is copied again a row at a time, each behind a savepoint,
+        so a bad row only loses itself. The transaction also
+        records the file in the ingest ledger, so a loaded file is skipped
+        and a file whose load DataFileHandler left unfinished resumes from
+        its last checkpoint, with IngestLedger's rules.
+
+        It has the same submit/queue_depth/wait/stop interface as
+        IngestPool, so DataFileHandler can use it as its pool.
+
+        Attributes:
+        connect_params (dict): asyncpg connection parameters, ex. the
+            database.ini postgresql section
+        concurrency (int): Maximum number of files loaded at once
+        batch_size (int): Number of lines parsed and copied at a time
+        spec_cache (object): SpecificationCache of the loaded specs
+    """
+
+    def __init__(self, connect_params, concurrency=4, batch_size=10000,
+                 spec_cache=None):
+        if asyncpg is None:
+            raise ImportError('AsyncIngestEngine requires asyncpg')
+
+        self.connect_params = dict(connect_params)
+        if 'port' in self.connect_params:
+            self.connect_params['port'] = int(self.connect_params['port'])
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.spec_cache = spec_cache or SpecificationCache()
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._db_pool = None
+        self._workers = []
+        self._table_locks = {}
+        self._known_tables = set()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop,
+                                        args=(started,))
+        self._thread.daemon = True
+        self._thread.start()
+        started.wait()
+        self._call(self._start())
+
+    def submit(self, path_to_file):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, path_to_file)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def wait(self):
+        """Block until every submitted file has been processed."""
+        self._call(self._queue.join())
+
+    def stop(self):
+        self._call(self._stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(started.set)
+        self._loop.run_forever()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine,
+                                                self._loop).result()
+
+    async def _start(self):
+        self._queue = asyncio.Queue()
+        self._db_pool = await asyncpg.create_pool(
+            min_size=1, max_size=self.concurrency, **self.connect_params)
+        self._workers = [asyncio.ensure_future(self._work())
+                         for _ in range(self.concurrency)]
+
+    async def _stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self._db_pool.close()
+
+    async def _work(self):
+        while True:
+            path_to_file = await self._queue.get()
+            try:
+                await self._process_file(path_to_file)
+            except Exception:
+                LOG.exception('Could not process %s' % path_to_file)
+            finally:
+                self._queue.task_done()
+
+    async def _process_file(self, path_to_file):
+        spec_name = DataFileHandler.parse_file_name(path_to_file)[0]
+
+        spec = await self._load_specification(spec_name)
+        if not spec.columns:
+            LOG.error('Specification does not exist for data file')
+            return
+
+        # wait for the table before taking a connection, so files queued
+        # behind another load of their table do not hold the pool
+        lock = self._table_locks.setdefault(spec_name, asyncio.Lock())
+        async with lock:
+            async with self._db_pool.acquire() as conn:
+                entry = await self._begin_load(conn, path_to_file,
+                                               spec_name)
+                if entry is None:
+                    LOG.info('Data file not loaded: %s', path_to_file)
+                    return
+                data_format = DataFormat(spec, None, path_to_file,
+                                         batch_size=self.batch_size,
+                                         resume_from=entry)
+                await self._create_table(conn, data_format)
+                if not await self._copy_file(conn, data_format):
+                    return
+
+        LOG.info('Data successfully added: %(path_to_file)s, ' +
+                 '%(rows_loaded)s rows loaded, %(rows_rejected)s rows ' +
+                 'rejected, reject file %(reject_file)s',
+                 data_format.summary())
+
+    async def _load_specification(self, spec_name):
+        spec = Specification(spec_name, None, self.spec_cache)
+
+        entry = self.spec_cache.get(spec_name)
+        if entry is not None:
+            spec.spec_id = entry['spec_id']
+            spec.columns = entry['columns']
+            spec.compiled = entry['compiled']
+            return spec
+
+        spec.spec_id = await self._db_pool.fetchval(SPEC_ID_QUERY, spec_name)
+        if spec.spec_id:
+            spec.columns = [tuple(row) for row in
+                            await self._db_pool.fetch(SPEC_COLUMNS_QUERY,
+                                                      spec.spec_id)]
+        if spec.columns:
+            self.spec_cache.put(spec_name, spec.spec_id, spec.columns,
+                                spec.compiled)
+        return spec
+
+    async def _begin_load(self, conn, path_to_file, spec_name):
+        """
+            Decide how to load a data file from its ingest ledger entry, as
+            IngestLedger.begin does: skip it if it is loaded, resume it if
+            its load was interrupted, and refuse it if it changed after
+            some of its rows were committed.
+
+        Returns:
+            entry (dict): Where to load the file from, with its size,
+                fingerprint and spec name, or None to skip it
+        """
+        loop = asyncio.get_event_loop()
+        file_size = os.path.getsize(path_to_file)
+        content_hash = await loop.run_in_executor(None, fingerprint,
+                                                  path_to_file, file_size)
+        start = {'file_size': file_size, 'content_hash': content_hash,
+                 'spec_name': spec_name, 'byte_offset': 0, 'next_line': 1,
+                 'row_count': 0, 'rows_rejected': 0}
+
+        row = await conn.fetchrow(LEDGER_ENTRY_QUERY, path_to_file)
+        if row is None:
+            return start
+        entry = dict(row)
+        if (entry['file_size'] == file_size and
+                entry['content_hash'] == content_hash):
+            if entry['status'] == LOADED:
+                return None
+            entry['spec_name'] = spec_name
+            return entry
+        if entry['byte_offset']:
+            LOG.error('%s changed after %s of its lines were loaded; not ' +
+                      'loading it again, since its rows are already in the ' +
+                      'table', path_to_file, entry['next_line'] - 1)
+            return None
+        LOG.warning('%s changed since it was last loaded; loading it ' +
+                    'again from the beginning', path_to_file)
+        return start
+
+    async def _create_table(self, conn, data_format):
+        table_name = data_format.spec.file_name
+        if table_name in self._known_tables:
+            return
+
+        if not await conn.fetch(TABLES_QUERY, [table_name]):
+            create_string = data_format.spec.get_compiled(
+                'create_string',
+                data_format._get_create_sql_string_given_columns)
+            await conn.execute(create_string.format(quote_ident(table_name)))
+        self._known_tables.add(table_name)
+
+    async def _copy_file(self, conn, data_format):
+        """
+            Copy the file in one transaction, which first claims the file's
+            ledger entry and finally marks it loaded. A producer task reads,
+            parses and renders batches in the default executor and hands
+            them over a queue of two, so the next batch is parsed while the
+            current one is being copied.
+
+        Returns:
+            bool: Whether the file was loaded, rather than left to another
+                load which claimed it first
+        """
+        loop = asyncio.get_event_loop()
+        spec = data_format.spec
+        slicer = spec.get_row_slicer()
+        converter = spec.get_row_converter()
+        column_names = [column[2].lower() for column in spec.columns]
+        batches = asyncio.Queue(maxsize=2)
+
+        def parse_next(line_batches):
+            for line_number, lines, end_offset in line_batches:
+                rows, errors = parse_batch(lines, slicer, converter)
+                text = CopyStream(rows).read().encode('utf-8')
+                return line_number, lines, end_offset, rows, errors, text
+            return None
+
+        async def produce():
+            line_batches = data_format._get_line_batches()
+            try:
+                while True:
+                    batch = await loop.run_in_executor(None, parse_next,
+                                                       line_batches)
+                    await batches.put(batch)
+                    if batch is None:
+                        return
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # hand the error to the consumer, which would otherwise
+                # wait for the next batch forever
+                await batches.put(error)
+
+        entry = data_format.resume_from
+        byte_offset = entry['byte_offset']
+        next_line = entry['next_line']
+        data_format.rows_loaded = entry['row_count']
+        producer = asyncio.ensure_future(produce())
+        try:
+            async with conn.transaction():
+                claimed = await conn.fetchval(
+                    LEDGER_CLAIM_QUERY, data_format.path_to_file,
+                    entry['file_size'], entry['content_hash'],
+                    entry['spec_name'], LOADING, byte_offset, next_line,
+                    entry['row_count'], entry['rows_rejected'])
+                if claimed is None:
+                    LOG.info('%s is being loaded by another load',
+                             data_format.path_to_file)
+                    return False
+                # only the load holding the claim may touch the reject file
+                data_format._reset_rejects()
+                while True:
+                    batch = await batches.get()
+                    if batch is None:
+                        break
+                    if isinstance(batch, Exception):
+                        raise batch
+                    line_number, lines, byte_offset, rows, errors, text = (
+                        batch)
+                    data_format._reject_rows(line_number, errors)
+                    if rows:
+                        data_format.rows_loaded += await self._copy_batch(
+                            conn, data_format, column_names, line_number,
+                            lines, errors, rows, text)
+                    next_line = line_number + len(lines)
+                await conn.execute(
+                    LEDGER_FINISH_QUERY, data_format.path_to_file, LOADED,
+                    byte_offset, next_line, data_format.rows_loaded,
+                    data_format.rows_rejected)
+            return True
+        finally:
+            producer.cancel()
+            if data_format.reject_file is not None:
+                data_format.reject_file.close()
+
+    async def _copy_batch(self, conn, data_format, column_names, line_number,
+                          lines, errors, rows, text):
+        """
+            Copy the rendered rows of a batch behind a savepoint; if the
+            COPY fails, copy them again one at a time, each behind its own
+            savepoint, rejecting the rows postgres refuses.
+
+        Returns:
+            int: Number of rows loaded
+        """
+        table_name = data_format.spec.file_name
+        try:
+            async with conn.transaction():
+                await conn.copy_to_table(table_name, source=io.BytesIO(text),
+                                         columns=column_names, format='text')
+            return len(rows)
+        except asyncpg.PostgresError as error:
+            LOG.warning('_copy_batch bulk load failed, copying rows one ' +
+                        'at a time ' + str(error))
+
+        rows_loaded = 0
+        indexes = data_format._get_loaded_line_indexes(lines, errors)
+        for index, values in zip(indexes, rows):
+            row_text = CopyStream([values]).read().encode('utf-8')
+            try:
+                async with conn.transaction():
+                    await conn.copy_to_table(
+                        table_name, source=io.BytesIO(row_text),
+                        columns=column_names, format='text')
+                rows_loaded += 1
+            except asyncpg.PostgresError as error:
+                data_format._reject_rows(line_number, [
+                    (index, str(error).strip(), lines[index])])
+        return rows_loaded
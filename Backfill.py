@@ -0,0 +1,86 @@
+from IngestLedger import LOADED
+
+import logging
+import os
+
+LOG = logging.getLogger(__name__)
+
+
+def list_files(directory, is_wanted):
+    """
+        List the files of a directory accepted by is_wanted, sorted by name
+        so dated data files are loaded oldest first.
+
+    Args:
+        directory (str): Directory to scan
+        is_wanted (callable): Filter taking a file path
+    Returns:
+        list of file paths
+    """
+    paths = [os.path.join(directory, file_name)
+             for file_name in sorted(os.listdir(directory))]
+    return [path for path in paths
+            if os.path.isfile(path) and is_wanted(path)]
+
+
+def find_new_spec_files(spec_handler, spec_dir='specs'):
+    """
+        Find the specification files in spec_dir which are not registered
+        yet, checking every name with a single query.
+
+    Args:
+        spec_handler (object): SpecificationFileHandler
+        spec_dir (str): Directory holding the specification files
+    Returns:
+        list of file paths
+    """
+    sql = """SELECT spec_name FROM specification_formats
+             WHERE spec_name = ANY(%s);"""
+
+    paths = list_files(spec_dir, spec_handler.is_spec_file)
+    names = [spec_handler.parse_file_name(path) for path in paths]
+    registered = set(row[0] for row in
+                     spec_handler.db.query_all(sql, (names,)))
+
+    return [path for path, name in zip(paths, names)
+            if name not in registered]
+
+
+def find_new_data_files(data_handler, data_dir='data'):
+    """
+        Find the data files in data_dir which the ingest ledger does not
+        have as loaded with their current size, checking every path with a
+        single query.
+
+    Args:
+        data_handler (object): DataFileHandler
+        data_dir (str): Directory holding the data files
+    Returns:
+        list of file paths
+    """
+    sql = """SELECT file_path, file_size FROM file_ingest_ledger
+             WHERE file_path = ANY(%s) AND status = %s;"""
+
+    paths = list_files(data_dir, data_handler.is_data_file)
+    loaded = dict(data_handler.db.query_all(sql, (paths, LOADED)))
+
+    return [path for path in paths
+            if loaded.get(path) != os.path.getsize(path)]
+
+
+def backfill(handler, paths):
+    """
+        Feed files found at startup through a handler as if they had just
+        been created; a DataFileHandler with a pool loads them in parallel.
+
+    Args:
+        handler (object): SpecificationFileHandler or DataFileHandler
+        paths (list): File paths to process
+    Returns:
+        int: number of files handed to the handler
+    """
+    for path in paths:
+        handler.handle_file(path)
+    if paths:
+        LOG.info('Backfilled %s files', len(paths))
+    return len(paths)
@@ -0,0 +1,46 @@
+import time
+
+
+def parse_batch(lines, slicer, converter, timings=None):
+    """
+        Validate a batch of fixed width lines against the specification
+        widths, then slice and convert the valid ones.
+        A line is rejected when it holds more than whitespace past the
+        record width, or when one of its values cannot be converted.
+
+    Args:
+        lines (list): Lines read from the data file
+        slicer (object): RowSlicer of the specification
+        converter (object): RowConverter of the specification
+        timings (dict): When given, the seconds spent slicing and
+            converting are added to its 'slice' and 'convert' entries
+    Returns:
+        tuple: (converted rows, list of (line index, reason, line) for the
+            lines which were rejected)
+    """
+    start = time.time()
+    record_width = slicer.record_width
+    errors = []
+    kept = []
+    sliced = []
+
+    for index, line in enumerate(lines):
+        record = line.rstrip('\r\n')
+        if len(record) > record_width and record[record_width:].strip():
+            errors.append((index, 'record is %s characters, specification '
+                           'is %s' % (len(record), record_width), line))
+            continue
+        kept.append(index)
+        sliced.append(slicer.slice(record))
+
+    sliced_at = time.time()
+    rows, conversion_errors = converter.convert_batch(sliced)
+    if timings is not None:
+        timings['slice'] += sliced_at - start
+        timings['convert'] += time.time() - sliced_at
+    if conversion_errors:
+        errors.extend((kept[index], reason, lines[kept[index]])
+                      for index, reason in conversion_errors)
+        errors.sort()
+
+    return rows, errors
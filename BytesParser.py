@@ -0,0 +1,207 @@
+from BatchParser import parse_batch
+from CopyStream import CopyStream
+from RowSlicer import RowSlicer
+from ValueConverter import FALSE_VALUES
+from ValueConverter import get_base_type
+from ValueConverter import RowConverter
+from ValueConverter import TRUE_VALUES
+
+import re
+import time
+
+NULL_VALUE = b'\\N'
+
+# bytes COPY treats specially in a value; a value never holds a newline
+ESCAPES = ((b'\\', b'\\\\'), (b'\t', b'\\t'), (b'\r', b'\\r'))
+
+INTEGER_BITS = {'SMALLINT': 16, 'INT2': 16, 'INTEGER': 32, 'INT': 32,
+                'INT4': 32, 'BIGINT': 64, 'INT8': 64}
+BOOLEAN_TYPES = ('BOOLEAN', 'BOOL')
+
+# ValueConverter.INTEGER_PATTERN over bytes
+INTEGER_PATTERN = re.compile(
+    br'[ \t\n\r\f\v]*[+-]?[0-9]+[ \t\n\r\f\v]*\Z')
+
+TRUE_BYTES = frozenset(value.encode('ascii') for value in TRUE_VALUES)
+FALSE_BYTES = frozenset(value.encode('ascii') for value in FALSE_VALUES)
+
+
+def _is_ascii(block):
+    try:
+        return block.isascii()
+    except AttributeError:
+        try:
+            block.decode('ascii')
+        except UnicodeDecodeError:
+            return False
+        return True
+
+
+def _integer_renderer(bits, converter):
+    low = -2 ** (bits - 1)
+    high = 2 ** (bits - 1) - 1
+
+    def render(value):
+        number = None
+        if INTEGER_PATTERN.match(value):
+            number = int(value)
+        if number is None or not low <= number <= high:
+            # let the converter raise its usual error
+            converter(value.decode('ascii'))
+        return value
+
+    return render
+
+
+def _boolean_renderer(converter):
+
+    def render(value):
+        lowered = value.lower()
+        if lowered in TRUE_BYTES:
+            return b't'
+        if lowered in FALSE_BYTES:
+            return b'f'
+        converter(value.decode('ascii'))
+
+    return render
+
+
+def _validating_renderer(converter):
+
+    def render(value):
+        converter(value.decode('ascii'))
+        return value
+
+    return render
+
+
+def get_renderer(data_type, converter):
+    """
+        Build the function which checks one stripped, non blank bytes
+        value of a typed column and returns it as it goes into COPY. The
+        value is validated like RowConverter would, but passed through as
+        bytes rather than converted, since postgres parses the same text.
+    """
+    base_type = get_base_type(data_type)
+    if base_type in INTEGER_BITS:
+        return _integer_renderer(INTEGER_BITS[base_type], converter)
+    if base_type in BOOLEAN_TYPES:
+        return _boolean_renderer(converter)
+    return _validating_renderer(converter)
+
+
+class BytesRowRenderer(object):
+    """
+        Renders blocks of fixed width lines straight from bytes to the COPY
+        text format, slicing each line at the specification offsets
+        without decoding it. Text columns are passed through as they are
+        and typed columns are only validated, so an ASCII line costs a
+        slice per field and no str objects at all.
+
+        Blocks which are not pure ASCII, where byte and character offsets
+        could differ, are decoded and parsed with parse_batch instead.
+
+        Attributes:
+        slicer (object): RowSlicer of the specification
+        converter (object): RowConverter of the specification, for the
+            decoded fallback and error messages
+        renderers (list): (index, renderer) of each typed column
+    """
+
+    def __init__(self, columns):
+        self.slicer = RowSlicer.from_columns(columns)
+        self.converter = RowConverter(columns)
+        self.renderers = [
+            (index, get_renderer(column[4], converter))
+            for index, (column, converter) in enumerate(
+                zip(columns, self.converter.converters))
+            if converter is not None]
+
+    def render_block(self, block, timings=None):
+        """
+            Render a block of whole lines
+
+        Args:
+            block (bytes): Lines of the data file, newlines included
+            timings (dict): When given, the seconds spent are added to
+                its 'slice' entry, or its 'slice' and 'convert' entries
+                for a decoded block
+        Returns:
+            tuple: (COPY text as bytes, row count, line count, list of
+                (line index, reason, line) for the lines which were
+                rejected)
+        """
+        if not _is_ascii(block):
+            return self._render_decoded(block, timings)
+
+        start = time.time()
+        lines = block.split(b'\n')
+        if not lines[-1]:
+            lines.pop()
+        records = lines
+        if b'\r' in block:
+            records = [line.rstrip(b'\r') for line in lines]
+        escape = (b'\\' in block or b'\t' in block or b'\r' in block)
+
+        record_width = self.slicer.record_width
+        fields = self.slicer.fields
+        renderers = self.renderers
+        rows = []
+        errors = []
+
+        for index, record in enumerate(records):
+            if len(record) > record_width and record[record_width:].strip():
+                errors.append((index, 'record is %s characters, '
+                               'specification is %s' % (len(record),
+                                                        record_width),
+                               self._get_line(block, lines, index)))
+                continue
+            values = [value.strip() for value in fields(record)]
+            if escape:
+                values = [self._escape(value) for value in values]
+            try:
+                for column_index, render in renderers:
+                    value = values[column_index]
+                    if value:
+                        values[column_index] = render(value)
+                    else:
+                        values[column_index] = NULL_VALUE
+            except ValueError as error:
+                errors.append((index, '%s: %s' % (
+                    self.converter.column_names[column_index], error),
+                    self._get_line(block, lines, index)))
+                continue
+            rows.append(b'\t'.join(values))
+
+        if timings is not None:
+            timings['slice'] += time.time() - start
+        text = b'\n'.join(rows) + b'\n' if rows else b''
+        return text, len(rows), len(lines), errors
+
+    def _render_decoded(self, block, timings):
+        # split on newlines only, as the line readers do
+        lines = [line + '\n' for line in block.decode('utf-8').split('\n')]
+        if lines[-1] == '\n':
+            lines.pop()
+        elif not block.endswith(b'\n'):
+            lines[-1] = lines[-1][:-1]
+        if timings is None:
+            timings = {'slice': 0.0, 'convert': 0.0}
+        rows, errors = parse_batch(lines, self.slicer, self.converter,
+                                   timings)
+        stream = CopyStream(rows)
+        text = stream.read().encode('utf-8')
+        return text, stream.rows_written, len(lines), errors
+
+    def _get_line(self, block, lines, index):
+        """Decode a rejected line as the line readers return it."""
+        line = lines[index].decode('ascii')
+        if index < len(lines) - 1 or block.endswith(b'\n'):
+            line += '\n'
+        return line
+
+    def _escape(self, value):
+        for character, escaped in ESCAPES:
+            if character in value:
+                value = value.replace(character, escaped)
+        return value
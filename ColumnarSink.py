@@ -0,0 +1,238 @@
+from DataFileReader import get_compression
+from DataSink import DataSink
+from DataSink import DataSinkException
+from decimal import Context
+from decimal import Decimal
+from decimal import ROUND_HALF_UP
+from ValueConverter import get_base_type
+
+import logging
+import os
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+LOG = logging.getLogger(__name__)
+
+# file format to the extension of the files written in it
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# rows buffered before they are written out as one parquet row group or
+# arrow record batch
+ROW_GROUP_SIZE = 100000
+
+# column_data_type to the name of the pyarrow type its values are stored
+# as; types which are not listed, like TEXT, are stored as strings
+ARROW_TYPES = {
+    'BOOLEAN': 'bool_', 'BOOL': 'bool_',
+    'SMALLINT': 'int16', 'INT2': 'int16',
+    'INTEGER': 'int32', 'INT': 'int32', 'INT4': 'int32',
+    'BIGINT': 'int64', 'INT8': 'int64',
+    'REAL': 'float32', 'FLOAT4': 'float32',
+    'FLOAT8': 'float64', 'DOUBLE PRECISION': 'float64',
+    'DATE': 'date32',
+}
+
+DECIMAL_TYPES = ('NUMERIC', 'DECIMAL')
+
+# widest precisions of arrow's 128 and 256 bit decimals
+DECIMAL128_PRECISION = 38
+DECIMAL256_PRECISION = 76
+
+
+def get_arrow_type(data_type):
+    """
+        Find the pyarrow type of a declared column_data_type, ex.
+        'numeric(10, 2)' -> decimal128(10, 2), or decimal256 above 38
+        digits. NUMERIC without a precision has no fixed scale, and
+        NUMERIC above 76 digits does not fit a decimal, so their values
+        are stored as strings.
+
+    Args:
+        data_type (str): column_data_type from the specification
+    Returns:
+        pyarrow DataType
+    """
+    base_type = get_base_type(data_type)
+    if base_type in DECIMAL_TYPES and '(' in data_type:
+        modifier = data_type.split('(', 1)[1].rstrip(') ').split(',')
+        precision = int(modifier[0])
+        scale = int(modifier[1]) if len(modifier) > 1 else 0
+        if precision <= DECIMAL128_PRECISION:
+            return pyarrow.decimal128(precision, scale)
+        if precision <= DECIMAL256_PRECISION:
+            return pyarrow.decimal256(precision, scale)
+        return pyarrow.string()
+    return getattr(pyarrow, ARROW_TYPES.get(base_type, 'string'))()
+
+
+def _get_preparer(arrow_type):
+    """Build the function fitting a converted value to arrow_type, or
+    None if values are stored as they are."""
+    if pyarrow.types.is_decimal(arrow_type):
+        # rounded half away from zero, as postgres rounds NUMERIC, with
+        # as many digits as the column holds
+        exponent = Decimal(1).scaleb(-arrow_type.scale)
+        context = Context(prec=arrow_type.precision, rounding=ROUND_HALF_UP)
+        return lambda value: (None if value is None
+                              else value.quantize(exponent, context=context))
+    if pyarrow.types.is_string(arrow_type):
+        return lambda value: None if value is None else str(value)
+    return None
+
+
+class ColumnarSink(DataSink):
+    """
+        Writes the rows of a data file to a typed, compressed Parquet or
+        Arrow IPC file in a directory, ex. data/fileformat1_2015-06-28.txt
+        to <directory>/fileformat1_2015-06-28.parquet. Each column is typed
+        after its column_data_type in the specification. The file is
+        written under a .partial name and only renamed into place once
+        the whole data file is written. Needs the optional pyarrow package.
+
+        Attributes:
+        directory (string): Directory the files are written to
+        file_format (string): 'parquet' or 'arrow'
+        compression (string): Codec of the file, ex. 'zstd', 'snappy' or
+            None; arrow files support 'zstd' and 'lz4' only
+        row_group_size (int): Rows in each row group or record batch
+        path (string): Path of the file written by the last load
+        rows_written (int): Number of rows written by the last load
+    """
+
+    def __init__(self, directory, file_format='parquet', compression='zstd',
+                 row_group_size=ROW_GROUP_SIZE):
+        if file_format not in EXTENSIONS:
+            raise DataSinkException('Unknown columnar format ' +
+                                    str(file_format))
+        self.directory = directory
+        self.file_format = file_format
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.path = None
+        self.rows_written = 0
+        self._writer = None
+        self._schema = None
+        self._preparers = None
+        self._pending = []
+        self._pending_rows = 0
+        self._checked = None
+
+    def open(self, data_format):
+        if pyarrow is None:
+            raise DataSinkException('pyarrow is required to write ' +
+                                    self.file_format + ' files')
+
+        name = os.path.basename(data_format.path_to_file)
+        compression = get_compression(name)
+        if compression is not None:
+            name = name[:-len(compression)]
+        name = os.path.splitext(name)[0] + EXTENSIONS[self.file_format]
+        self.path = os.path.join(self.directory, name)
+        self.rows_written = 0
+        self._pending = []
+        self._pending_rows = 0
+
+        try:
+            self._schema = pyarrow.schema([
+                (column[2].lower(), get_arrow_type(column[4]))
+                for column in data_format.spec.columns])
+            self._preparers = [_get_preparer(field.type)
+                               for field in self._schema]
+
+            if self.file_format == 'parquet':
+                self._writer = pyarrow.parquet.ParquetWriter(
+                    self.path + '.partial', self._schema,
+                    compression=self.compression or 'none')
+            else:
+                options = pyarrow.ipc.IpcWriteOptions(
+                    compression=self.compression)
+                self._writer = pyarrow.ipc.new_file(self.path + '.partial',
+                                                    self._schema,
+                                                    options=options)
+        except (pyarrow.ArrowException, ValueError, EnvironmentError) as error:
+            raise DataSinkException('Cannot write %s: %s' % (self.path,
+                                                             error))
+
+    def check_batch(self, rows):
+        batch, errors = self._convert(rows)
+        # write_batch is usually handed the same rows back, unless some
+        # were refused, and then writes the batch converted here
+        self._checked = None if errors else (rows, batch)
+        return errors
+
+    def write_batch(self, rows):
+        if self._checked is not None and self._checked[0] is rows:
+            batch, errors = self._checked[1], []
+        else:
+            batch, errors = self._convert(rows)
+        self._checked = None
+
+        if batch.num_rows:
+            self._pending.append(batch)
+            self._pending_rows += batch.num_rows
+            if self._pending_rows >= self.row_group_size:
+                self._flush()
+        return errors
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        self._writer = None
+        os.rename(self.path + '.partial', self.path)
+        LOG.info('Wrote %s rows to %s', self.rows_written, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.path and os.path.exists(self.path + '.partial'):
+            os.remove(self.path + '.partial')
+
+    def _convert(self, rows):
+        try:
+            return self._to_record_batch(rows), []
+        except (pyarrow.ArrowException, ArithmeticError) as error:
+            LOG.warning('_convert could not convert the batch, ' +
+                        'converting rows one at a time ' + str(error))
+            return self._to_record_batch_by_row(rows)
+
+    def _to_record_batch(self, rows):
+        arrays = []
+        for index, field in enumerate(self._schema):
+            values = [row[index] for row in rows]
+            prepare = self._preparers[index]
+            if prepare is not None:
+                values = [prepare(value) for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self._schema)
+
+    def _to_record_batch_by_row(self, rows):
+        converted = []
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                self._to_record_batch([row])
+                converted.append(row)
+            except (pyarrow.ArrowException, ArithmeticError) as error:
+                errors.append((index, '%s: %s' % (self.file_format,
+                                                  str(error).strip())))
+        return self._to_record_batch(converted), errors
+
+    def _flush(self):
+        if not self._pending:
+            return
+        table = pyarrow.Table.from_batches(self._pending, self._schema)
+        if self.file_format == 'parquet':
+            self._writer.write_table(table,
+                                     row_group_size=self.row_group_size)
+        else:
+            self._writer.write_table(table.combine_chunks(),
+                                     max_chunksize=self.row_group_size)
+        self.rows_written += self._pending_rows
+        self._pending = []
+        self._pending_rows = 0
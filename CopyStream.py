@@ -0,0 +1,95 @@
+NULL_VALUE = '\\N'
+
+ESCAPES = (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'))
+
+
+class CopyStream(object):
+    """
+        File-like adapter over an iterable of rows which renders each row in
+        the postgres COPY text format, so the rows can be streamed to
+        cursor.copy_expert without building the whole payload in memory.
+
+        Attributes:
+        rows_written (int): Number of rows handed to COPY so far
+    """
+    EMPTY = ''
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = self.EMPTY
+        self._offset = 0
+        self.rows_written = 0
+
+    def read(self, size=-1):
+        pieces = []
+        wanted = size
+        while size < 0 or wanted > 0:
+            if self._offset >= len(self._pending):
+                try:
+                    text, row_count = self._next_chunk()
+                except StopIteration:
+                    break
+                self._pending = text
+                self._offset = 0
+                self.rows_written += row_count
+                continue
+
+            if size < 0:
+                piece = self._pending[self._offset:]
+            else:
+                piece = self._pending[self._offset:self._offset + wanted]
+                wanted -= len(piece)
+            self._offset += len(piece)
+            pieces.append(piece)
+
+        return self.EMPTY.join(pieces)
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+    def _next_chunk(self):
+        return self._format_row(next(self._rows)), 1
+
+    def _format_row(self, row):
+        """
+            Renders one row as a tab separated COPY line, escaping the
+            characters COPY treats specially and writing None as NULL
+
+        Args:
+            row (list): List of column values
+        Returns:
+            line, ex. 'Foonyor\t1\t1\n'
+        """
+        return '\t'.join([self._format_value(value) for value in row]) + '\n'
+
+    def _format_value(self, value):
+        if value is None:
+            return NULL_VALUE
+        if value is True:
+            return 't'
+        if value is False:
+            return 'f'
+        value = str(value)
+        for character, escaped in ESCAPES:
+            if character in value:
+                value = value.replace(character, escaped)
+        return value
+
+
+class RenderedCopyStream(CopyStream):
+    """
+        CopyStream over blocks of rows which were already rendered in the
+        COPY text format, given as (text, row_count) pairs, ex. blocks
+        rendered by parallel parse workers.
+    """
+
+    def _next_chunk(self):
+        return next(self._rows)
+
+
+class BytesCopyStream(RenderedCopyStream):
+    """
+        RenderedCopyStream over blocks of rows rendered as bytes, which
+        are handed to COPY without being decoded.
+    """
+    EMPTY = b''
@@ -1,9 +1,21 @@
+from DataFileReader import find_complete_end
+from DataFileReader import get_compression
 from DataFormat import DataFormat
 from DataFormat import DataFormatException
+from IngestLedger import IngestLedger
+from IngestLedger import IngestLedgerException
+from Metrics import REGISTRY
 from Specification import Specification
+from TableCache import TableCache
 from watchdog.events import FileSystemEventHandler
 
+from datetime import datetime
+
+import fnmatch
+import functools
 import logging
+import os
+import time
 
 LOG = logging.getLogger(__name__)
 
@@ -13,30 +25,253 @@ class DataFileHandler(FileSystemEventHandler):
         Takes data file 'created' events dispatched by the observer and
         processes those events, finding a corresponding specification format
         in the database, applying that format to the data, and loading the
-        data into the database
+        data into the database.
+        If a pool is given, files are handed to it instead of being loaded
+        on the observer thread, and parse_workers > 1 parses each file in
+        that many processes.
+        With track_ingest, every load is recorded in the ingest ledger:
+        files already loaded are skipped and interrupted loads resume from
+        their last committed batch.
+        Data files compressed with gzip, bzip2, xz or zstandard are
+        decompressed as they are read. With map_files, uncompressed files
+        are memory mapped and rendered to COPY without being decoded, and
+        with vectorize_files they are rendered a column at a time.
+        With partition_by_date, each file is loaded into the partition of
+        the date in its name, and with replace_partitions a reloaded file
+        replaces its date's partition rather than adding to it. With
+        staging_load, files are loaded into an unlogged staging table and
+        merged into their table whole. With a sink_factory, each file's
+        rows are also written to a new sink made by it, ex. a
+        ColumnarSink, in the same pass over the file.
+        With tail_files, uncompressed files are also loaded as they grow:
+        each change to a file loads the complete lines appended since its
+        last load, tail_batch_size lines at a time, into its table only;
+        the ledger records how far each file is committed.
     """
-    patterns = ["*.txt"]
+    patterns = ["*.txt", "*.txt.gz", "*.txt.bz2", "*.txt.xz", "*.txt.zst"]
 
-    def __init__(self, db):
+    def __init__(self, db, spec_cache=None, table_cache=None, pool=None,
+                 parse_workers=0, track_ingest=False, map_files=False,
+                 partition_by_date=False, replace_partitions=False,
+                 staging_load=False, sink_factory=None,
+                 vectorize_files=False, tail_files=False,
+                 tail_batch_size=1000):
         self.db = db
+        self.spec_cache = spec_cache
+        self.table_cache = table_cache or TableCache()
+        self.pool = pool
+        self.parse_workers = parse_workers
+        self.map_files = map_files
+        self.partition_by_date = partition_by_date
+        self.replace_partitions = replace_partitions
+        self.staging_load = staging_load
+        self.sink_factory = sink_factory
+        self.vectorize_files = vectorize_files
+        self.tail_files = tail_files
+        self.tail_batch_size = tail_batch_size
+        self.ledger = None
+        if track_ingest or tail_files:
+            self.ledger = IngestLedger(db)
+
+    @staticmethod
+    def parse_file_name(path_to_file):
+        """Split a data file path into its spec name and date portion,
+        dropping the extension of a compressed file.
+        Args:
+            path_to_file (str): ex. 'data/fileformat1_2015-06-28.txt.gz'
+        Returns:
+            tuple: ex. ('fileformat1', '2015-06-28.txt')
+        """
+        full_file_name = os.path.basename(path_to_file)
+        compression = get_compression(full_file_name)
+        if compression is not None:
+            full_file_name = full_file_name[:-len(compression)]
+        spec_file_name, date_added_portion = full_file_name.rsplit('_', 1)
+        return spec_file_name, date_added_portion
+
+    @staticmethod
+    def parse_data_date(date_added_portion):
+        """Return the date of a data file from the date portion of its name.
+        Args:
+            date_added_portion (str): ex. '2015-06-28.txt'
+        Returns:
+            str: ex. '2015-06-28'
+        Raises:
+            ValueError if the name does not start with a YYYY-MM-DD date
+        """
+        data_date = date_added_portion.split('.')[0]
+        datetime.strptime(data_date, '%Y-%m-%d')
+        return data_date
 
     def process(self, event):
-        full_file_name = event.src_path.split('/')[1]
-        spec_file_name, date_added_portion = full_file_name.split('_')
+        self.process_file(event.src_path)
 
-        spec = Specification(spec_file_name, self.db)
+    def process_file(self, path_to_file):
+        spec_file_name, date_added_portion = self.parse_file_name(
+            path_to_file)
+
+        spec = Specification(spec_file_name, self.db, self.spec_cache)
 
         if not spec.does_specification_exist():
             LOG.error('Specification does not exist for data file')
             return
 
-        data_format = DataFormat(spec, self.db, event.src_path)
+        data_date = None
+        if self.partition_by_date:
+            try:
+                data_date = self.parse_data_date(date_added_portion)
+            except ValueError:
+                LOG.error('Data file name has no date to partition by: %s',
+                          path_to_file)
+                return
+
+        if self.tail_files and get_compression(path_to_file) is None:
+            self._tail_file(path_to_file, spec, data_date)
+            return
 
+        checkpoint = None
+        resume_from = None
+        finish = None
+        if self.ledger is not None:
+            # a replaced date partition holds only the file's new rows
+            resume_from = self.ledger.begin(
+                path_to_file, spec_file_name,
+                replaces=self.partition_by_date and self.replace_partitions)
+            if resume_from is None:
+                LOG.info('Data file not loaded: %s', path_to_file)
+                return
+            checkpoint = self.ledger.checkpointer(path_to_file, resume_from)
+            finish = self.ledger.finisher(path_to_file)
+
+        sinks = None
+        if self.sink_factory is not None:
+            sinks = [self.sink_factory()]
+
+        data_format = DataFormat(spec, self.db, path_to_file,
+                                 table_cache=self.table_cache,
+                                 parse_workers=self.parse_workers,
+                                 checkpoint=checkpoint,
+                                 resume_from=resume_from,
+                                 map_file=self.map_files,
+                                 data_date=data_date,
+                                 replace_partition=self.replace_partitions,
+                                 staging=self.staging_load,
+                                 sinks=sinks,
+                                 vectorize=self.vectorize_files,
+                                 finish=finish)
+
+        start = time.time()
         try:
-            data_format.process_data_format()
-            LOG.info('Data successfully added')
+            if checkpoint is None:
+                # without checkpoints the whole load, tables included,
+                # commits or rolls back as one on a single connection
+                with self.db.transaction():
+                    data_format.process_data_format()
+            else:
+                data_format.process_data_format()
+            LOG.info('Data successfully added: %(path_to_file)s, ' +
+                     '%(rows_loaded)s rows loaded, %(rows_rejected)s rows ' +
+                     'rejected, reject file %(reject_file)s',
+                     data_format.summary())
+            self._record_load(data_format, time.time() - start)
         except DataFormatException as error:
+            self._forget_tables(data_format)
+            REGISTRY.inc('files_failed_total')
             LOG.error(error)
+        except IngestLedgerException as error:
+            LOG.warning(error)
+
+    def _tail_file(self, path_to_file, spec, data_date):
+        """
+            Load the complete lines appended to a data file since its last
+            load, in small committed batches, until the ledger has it up to
+            its last complete line or another worker holds it.
+        """
+        while True:
+            end_offset = find_complete_end(path_to_file)
+            entry = self.ledger.begin_tail(path_to_file, spec.file_name,
+                                           end_offset)
+            if entry is None:
+                return
+
+            data_format = DataFormat(
+                spec, self.db, path_to_file, batch_size=self.tail_batch_size,
+                table_cache=self.table_cache,
+                checkpoint=functools.partial(self.ledger.checkpoint_tail,
+                                             path_to_file),
+                resume_from=entry, data_date=data_date,
+                end_offset=end_offset)
+
+            start = time.time()
+            try:
+                data_format.process_data_format()
+            except DataFormatException as error:
+                self.ledger.release(path_to_file)
+                REGISTRY.inc('files_failed_total')
+                LOG.error(error)
+                return
+            self.ledger.finish(path_to_file, data_format.rows_loaded,
+                               data_format.rows_rejected)
+
+            rows_loaded = data_format.rows_loaded - entry['row_count']
+            rows_rejected = (data_format.rows_rejected -
+                             entry['rows_rejected'])
+            REGISTRY.inc('appends_loaded_total')
+            REGISTRY.inc('rows_loaded_total', rows_loaded)
+            REGISTRY.inc('rows_rejected_total', rows_rejected)
+            LOG.info('Appended lines loaded: %s, lines %s to %s, %s rows ' +
+                     'loaded, %s rows rejected in %.3fs', path_to_file,
+                     entry['next_line'],
+                     entry['next_line'] + rows_loaded + rows_rejected - 1,
+                     rows_loaded, rows_rejected, time.time() - start)
+
+    def _forget_tables(self, data_format):
+        """Drop the tables of a failed load from the table cache, since
+        the transaction which created them may have been rolled back."""
+        for table_name in (data_format.spec.file_name,
+                           data_format.partition_name,
+                           data_format.table_name):
+            if table_name is not None:
+                self.table_cache.discard(table_name)
+
+    def _record_load(self, data_format, seconds):
+        REGISTRY.inc('files_loaded_total')
+        REGISTRY.inc('rows_loaded_total', data_format.rows_loaded)
+        REGISTRY.inc('rows_rejected_total', data_format.rows_rejected)
+        REGISTRY.observe('file_load_seconds', seconds)
+
+        seconds = max(seconds, 1e-6)
+        timings = ', '.join('%s %.3fs' % (phase, data_format.timings[phase])
+                            for phase in sorted(data_format.timings))
+        LOG.info('Loaded %s in %.3fs, %.0f rows/sec, %.0f bytes/sec (%s)',
+                 data_format.path_to_file, seconds,
+                 data_format.rows_loaded / seconds,
+                 data_format.bytes_read / seconds, timings)
+
+    def is_data_file(self, path_to_file):
+        """Whether the path matches the data file patterns; reject files
+        written next to the data files do not.
+        """
+        file_name = os.path.basename(path_to_file)
+        return any(fnmatch.fnmatch(file_name, pattern)
+                   for pattern in self.patterns)
+
+    def handle_file(self, path_to_file):
+        if not self.is_data_file(path_to_file):
+            return
+        if self.pool is not None:
+            self.pool.submit(path_to_file)
+        else:
+            self.process_file(path_to_file)
 
     def on_created(self, event):
-        self.process(event)
+        if self.tail_files and get_compression(event.src_path) is not None:
+            return
+        self.handle_file(event.src_path)
+
+    def on_modified(self, event):
+        # compressed files cannot be followed, so they are left for the
+        # FileEventStabilizer to dispatch once they are fully written
+        if (self.tail_files and not event.is_directory and
+                get_compression(event.src_path) is None):
+            self.handle_file(event.src_path)
@@ -0,0 +1,289 @@
+import bz2
+import gzip
+import io
+import mmap
+import os
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# size of the read buffer used when streaming data files
+BUFFER_SIZE = 1024 * 1024
+
+# extensions of the compressed data files which are decompressed on the fly
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zst')
+
+
+def get_compression(path_to_file):
+    """
+        Return the compression extension of a data file path, ex. '.gz'
+        for 'data/fileformat1_2015-06-28.txt.gz', or None when the file is
+        not compressed
+    """
+    for extension in COMPRESSED_EXTENSIONS:
+        if path_to_file.endswith(extension):
+            return extension
+    return None
+
+
+def open_data_file(path_to_file, buffer_size=BUFFER_SIZE):
+    """
+        Open a data file for reading bytes, decompressing it while it is
+        read when its name ends in one of COMPRESSED_EXTENSIONS, so a
+        compressed file is never written out to disk in full.
+
+    Args:
+        path_to_file (str): Path to the data file
+        buffer_size (int): Size in bytes of the read buffer
+    Returns:
+        binary file object
+    Raises:
+        ImportError when the module for the file's compression is missing
+    """
+    compression = get_compression(path_to_file)
+    if compression is None:
+        return open(path_to_file, 'rb', buffer_size)
+    if compression == '.gz':
+        return gzip.open(path_to_file, 'rb')
+    if compression == '.bz2':
+        return bz2.BZ2File(path_to_file, 'rb')
+    if compression == '.xz':
+        if lzma is None:
+            raise ImportError('lzma is required to read ' + path_to_file)
+        return lzma.open(path_to_file, 'rb')
+    if zstandard is None:
+        raise ImportError('zstandard is required to read ' + path_to_file)
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+        open(path_to_file, 'rb')), buffer_size)
+
+
+def read_lines(path_to_file, buffer_size=BUFFER_SIZE):
+    """
+        Lazily yield the lines of a data file, reading it through a large
+        buffer rather than loading the whole file into memory.
+
+    Args:
+        path_to_file (str): Path to the data file
+        buffer_size (int): Size in bytes of the read buffer
+    Returns:
+        generator of lines, newline included
+    """
+    if get_compression(path_to_file) is not None:
+        for line, _ in read_lines_from(path_to_file,
+                                       buffer_size=buffer_size):
+            yield line
+        return
+
+    with open(path_to_file, 'r', buffer_size) as f:
+        for line in f:
+            yield line
+
+
+def read_batches(path_to_file, batch_size, buffer_size=BUFFER_SIZE):
+    """
+        Lazily yield lists of at most batch_size lines from a data file, so
+        peak memory is bounded by the batch size rather than the file size.
+
+    Args:
+        path_to_file (str): Path to the data file
+        batch_size (int): Maximum number of lines per batch
+        buffer_size (int): Size in bytes of the read buffer
+    Returns:
+        generator of lists of lines
+    """
+    batch = []
+    for line in read_lines(path_to_file, buffer_size):
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def split_file(path_to_file, chunk_size, start=0):
+    """
+        Cut a data file into byte ranges of roughly chunk_size bytes which
+        always end on a newline, so each range holds whole records and can
+        be parsed independently. Compressed files cannot be cut into
+        ranges without decompressing them, so they are not accepted.
+
+    Args:
+        path_to_file (str): Path to the data file
+        chunk_size (int): Approximate size in bytes of each range
+        start (int): Offset of the first line of the first range
+    Returns:
+        list of (start, end) byte offsets
+    """
+    if get_compression(path_to_file) is not None:
+        raise ValueError('Cannot split compressed file ' + path_to_file)
+
+    ranges = []
+    with open(path_to_file, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+
+        while start < file_size:
+            end = start + chunk_size
+            if end < file_size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            else:
+                end = file_size
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def read_range(path_to_file, start, end, buffer_size=BUFFER_SIZE):
+    """
+        Lazily yield the lines of a data file between two byte offsets
+        returned by split_file.
+
+    Args:
+        path_to_file (str): Path to the data file
+        start (int): Offset of the first line
+        end (int): Offset just past the last line
+        buffer_size (int): Size in bytes of the read buffer
+    Returns:
+        generator of lines, newline included
+    """
+    for line, _ in read_lines_from(path_to_file, start, end, buffer_size):
+        yield line
+
+
+def read_lines_from(path_to_file, start=0, end=None,
+                    buffer_size=BUFFER_SIZE):
+    """
+        Lazily yield the lines of a data file from a byte offset, each with
+        the offset just past it, so a load can record how far it got and
+        later resume from there. Offsets into a compressed file count its
+        decompressed bytes.
+
+    Args:
+        path_to_file (str): Path to the data file
+        start (int): Offset of the first line
+        end (int): Offset to stop at, or None to read to the end
+        buffer_size (int): Size in bytes of the read buffer
+    Returns:
+        generator of (line, offset after the line) pairs
+    """
+    with open_data_file(path_to_file, buffer_size) as f:
+        if get_compression(path_to_file) is None:
+            f.seek(start)
+        else:
+            _skip(f, start, buffer_size)
+        position = start
+        while end is None or position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            if not isinstance(line, str):
+                line = line.decode('utf-8')
+            yield line, position
+
+
+def read_batches_from(path_to_file, batch_size, start=0,
+                      buffer_size=BUFFER_SIZE, end=None):
+    """
+        Lazily yield batches of at most batch_size lines from a byte
+        offset, each with the offset just past its last line.
+
+    Args:
+        path_to_file (str): Path to the data file
+        batch_size (int): Maximum number of lines per batch
+        start (int): Offset of the first line
+        buffer_size (int): Size in bytes of the read buffer
+        end (int): Offset to stop at, or None to read to the end
+    Returns:
+        generator of (list of lines, offset after the batch) pairs
+    """
+    batch = []
+    position = start
+    for line, position in read_lines_from(path_to_file, start, end,
+                                          buffer_size):
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch, position
+            batch = []
+    if batch:
+        yield batch, position
+
+
+def find_complete_end(path_to_file, read_size=64 * 1024):
+    """
+        Find the offset just past the last newline of an uncompressed data
+        file, so a file which is still being appended to is only read up
+        to its last complete line.
+
+    Args:
+        path_to_file (str): Path to the data file
+        read_size (int): Size in bytes of the reads made backwards from
+            the end of the file
+    Returns:
+        offset (int), 0 if the file holds no complete line
+    """
+    with open(path_to_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        while end > 0:
+            start = max(end - read_size, 0)
+            f.seek(start)
+            index = f.read(end - start).rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            end = start
+    return 0
+
+
+def _skip(f, count, buffer_size):
+    """Read past the first count bytes of a stream which cannot seek."""
+    while count > 0:
+        skipped = len(f.read(min(count, buffer_size)))
+        if not skipped:
+            break
+        count -= skipped
+
+
+def map_batches_from(path_to_file, batch_size, start=0):
+    """
+        Memory map an uncompressed data file and yield blocks of at most
+        batch_size whole lines as bytes, without decoding or splitting
+        them, each with the offset just past its last line.
+
+    Args:
+        path_to_file (str): Path to the data file
+        batch_size (int): Maximum number of lines per block
+        start (int): Offset of the first line
+    Returns:
+        generator of (bytes, offset after the block) pairs
+    """
+    with open(path_to_file, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size <= start:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = start
+            while position < file_size:
+                end = position
+                for _ in range(batch_size):
+                    end = mapped.find(b'\n', end) + 1
+                    if not end:
+                        end = file_size
+                        break
+                    if end >= file_size:
+                        break
+                yield mapped[position:end], end
+                position = end
+        finally:
+            mapped.close()
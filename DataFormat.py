@@ -1,9 +1,35 @@
+from BatchParser import parse_batch
+from BytesParser import BytesRowRenderer
+from CopyStream import BytesCopyStream
+from CopyStream import CopyStream
+from CopyStream import RenderedCopyStream
+from DataFileReader import get_compression
+from DataFileReader import map_batches_from
+from DataFileReader import read_batches_from
+from DataFileReader import read_range
+from DataSink import DataSinkException
+from DataSink import PostgresSink
+from Metrics import PHASES
+from Metrics import REGISTRY
+from ParallelParser import render_file
+from RejectFile import RejectFile
+from TableCache import TableCache
+from VectorParser import VectorRowRenderer
+
+import hashlib
 import logging
 import psycopg2
+import time
 
 
 LOG = logging.getLogger(__name__)
 
+# column holding the data file's date in date partitioned tables
+PARTITION_COLUMN = 'data_date'
+
+# size of the reads render makes from the COPY stream, as psycopg2 does
+COPY_READ_SIZE = 8192
+
 
 class DataFormatException(Exception):
     pass
@@ -18,85 +44,718 @@ class DataFormat(object):
 
         Attributes:
         spec (object): The specification which corresponds to the data file
-        db (object): DB connection wrapper for executing sql queries
+        db (object): DB connection wrapper for executing sql queries, or
+            None to only write the rows to the sinks
         path_to_file (string): Path to where the data file can be found
+        bulk (bool): Load rows with a single COPY, falling back to per row
+            inserts if the COPY fails
+        rows_loaded (int): Number of rows loaded by the last run
+        rows_rejected (int): Number of rows which could not be loaded
+        batch_size (int): Number of lines read from the file at a time
+        table_cache (object): TableCache of the tables known to exist,
+            usually shared by every DataFormat in the process
+        parse_workers (int): When more than one, an uncompressed file is cut
+            into byte ranges parsed by that many processes for the bulk
+            load
+        reject_file (object): RejectFile next to the data file collecting
+            the rejected lines, or None to only log them
+        checkpoint (callable): When given, rows are committed a batch at a
+            time and checkpoint(byte_offset, next_line, rows_loaded,
+            rows_rejected) is called inside each batch's transaction
+        resume_from (dict): byte_offset, next_line, row_count and
+            rows_rejected of an interrupted load to carry on from
+        finish (callable): When given, finish(rows_loaded, rows_rejected)
+            is called once the rows are loaded; with a staging table it is
+            called inside the transaction which merges or swaps it in, so
+            the load is never recorded apart from its rows
+        end_offset (int): Offset to stop reading the file at, ex. the end
+            of the last complete line of a file still being appended to;
+            None reads to the end
+        map_file (bool): Bulk load an uncompressed file by memory mapping
+            it and rendering its lines to COPY as bytes, without decoding
+        vectorize (bool): Like map_file, but render each block of lines
+            a column at a time with numpy, for specs made mostly of small
+            numeric fields
+        data_date (str): Date of the data file, ex. '2015-06-28'; when
+            given, the spec's table is partitioned by list on a trailing
+            data_date column and the rows are loaded into the partition of
+            that date, ex. fileformat1_20150628, created on demand
+        replace_partition (bool): When the date's partition already
+            exists, load into a staging table and swap it in for the old
+            partition in one transaction, instead of appending to it
+        staging (bool): Load into an UNLOGGED staging table without
+            indexes, then merge it into the table in one transaction, so
+            readers only ever see whole files
+        sinks (list): DataSinks the rows are written to besides the table,
+            ex. a ColumnarSink; every sink gets the rows of each batch as
+            it is parsed, so the file is only read and parsed once
+        table_name (string): Table the rows are loaded into
+        timings (dict): Seconds the last run spent in each load phase
+        bytes_read (int): Number of bytes of the file the last run read,
+            after decompression
     """
 
-    def __init__(self, specification, db, path_to_file):
+    def __init__(self, specification, db, path_to_file, bulk=True,
+                 batch_size=10000, table_cache=None, parse_workers=0,
+                 write_rejects=True, checkpoint=None, resume_from=None,
+                 map_file=False, data_date=None, replace_partition=False,
+                 staging=False, sinks=None, vectorize=False,
+                 end_offset=None, finish=None):
         self.spec = specification
         self.db = db
         self.path_to_file = path_to_file
+        self.checkpoint = checkpoint
+        self.finish = finish
+        self.resume_from = resume_from or {'byte_offset': 0, 'next_line': 1,
+                                           'row_count': 0,
+                                           'rows_rejected': 0}
+        self.parse_workers = parse_workers
+        self.map_file = map_file
+        self.vectorize = vectorize
+        self.end_offset = end_offset
+        self.data_date = data_date
+        self.replace_partition = replace_partition
+        self.staging = staging
+        self.sinks = list(sinks or [])
+        self.table_name = specification.file_name
+        self.partition_name = None
+        self.staging_name = None
+        self.swap_staging = False
+        if data_date is not None:
+            self.partition_name = '%s_%s' % (specification.file_name,
+                                             data_date.replace('-', ''))
+            self.table_name = self.partition_name
+        self.reject_file = None
+        if write_rejects:
+            self.reject_file = RejectFile(path_to_file)
+        self.table_cache = table_cache
+        if self.table_cache is None:
+            self.table_cache = TableCache()
+        self.bulk = bulk
+        self.batch_size = batch_size
+        self.rows_loaded = 0
+        self.rows_rejected = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.bytes_read = 0
 
     def process_data_format(self):
+        if self.db is None:
+            start = time.time()
+            self._add_rows_to_data_format_table()
+            self._record_timings(time.time() - start)
+            return
+
         try:
-            if not self.does_data_table_exist():
+            exists = self.does_data_table_exist()
+            if not exists:
                 self._create_data_format_table()
+            if exists and self.partition_name and self.replace_partition:
+                self.swap_staging = True
+                self._create_staging_table()
+            elif self.staging:
+                self._create_staging_table()
+            start = time.time()
             self._add_rows_to_data_format_table()
+            if self.swap_staging:
+                self._swap_partition()
+            elif self.staging_name:
+                self._merge_staging_table()
+            else:
+                self._finish_load()
+            self._record_timings(time.time() - start)
         except DataFormatException as error:
             raise DataFormatException(error)
 
-    def does_data_table_exist(self):
-        does_exist = self._get_data_table()
-        return does_exist
+    def render(self):
+        """
+            Read, slice, convert and render the file in the COPY format as
+            a load would, without writing it anywhere, ex. for a dry run.
+            The time not spent reading and parsing is booked as the render
+            phase, and nothing is added to the metrics.
+
+        Returns:
+            int: Number of rows rendered
+        """
+        start = time.time()
+        stream = CopyStream(self._get_converted_rows())
+        while stream.read(COPY_READ_SIZE):
+            pass
+        self.rows_loaded = stream.rows_written
+        # nothing is written; the rest of the time went to rendering rows
+        self.timings.pop('write', None)
+        self._book_remaining_time('render', time.time() - start)
+        return self.rows_loaded
+
+    def _book_remaining_time(self, phase, seconds):
+        """Book whatever part of seconds the other phases did not take as
+        the given phase."""
+        other = sum(phase_seconds
+                    for other_phase, phase_seconds in self.timings.items()
+                    if other_phase != phase)
+        self.timings[phase] = max(seconds - other, 0.0)
+
+    def _record_timings(self, load_seconds):
+        """
+            Book whatever part of the load was not spent reading and
+            parsing as the write phase, then add the phases to the metrics
+        """
+        self._book_remaining_time('write', load_seconds)
+
+        for phase, seconds in self.timings.items():
+            REGISTRY.inc('phase_seconds_total', seconds,
+                         (('phase', phase),))
+        REGISTRY.inc('bytes_read_total', self.bytes_read)
 
-    def _get_data_table(self):
-        query_string = """SELECT * FROM {} LIMIT 1;"""
+    def summary(self):
+        """Return the outcome of the last load of the data file."""
+        summary = {'path_to_file': self.path_to_file,
+                   'table': self.partition_name or self.table_name,
+                   'rows_loaded': self.rows_loaded,
+                   'rows_rejected': self.rows_rejected,
+                   'reject_file': None,
+                   'bytes_read': self.bytes_read,
+                   'timings': dict(self.timings)}
+        if self.reject_file is not None and self.reject_file.count:
+            summary['reject_file'] = self.reject_file.path
+        return summary
+
+    def does_data_table_exist(self):
         try:
-            self.db.query_given_table(query_string, self.spec.file_name)
-            return True
-        except psycopg2.DatabaseError:
+            return self.table_cache.exists(self.db, self.table_name)
+        except psycopg2.DatabaseError as error:
+            LOG.error('does_data_table_exist ' + str(error))
             return False
 
     def _create_data_format_table(self):
-        self.spec._get_specification_id()
-        if self.spec.spec_id:
-            self.spec._get_specification_columns()
+        self.spec.load()
         if self.spec.columns:
 
-            create_string = self._get_create_sql_string_given_columns(
-                self.spec.columns)
+            if self.partition_name:
+                self._create_partition()
+                return
+
+            create_string = self.spec.get_compiled(
+                'create_string', self._get_create_sql_string_given_columns)
 
             try:
                 self.db.create(create_string, self.spec.file_name)
             except psycopg2.DatabaseError as error:
                 raise DataFormatException(error)
 
+            self.table_cache.add(self.spec.file_name)
+
         else:
             raise DataFormatException('Invalid specification; cannot add ' +
                                       'data format table')
 
+    def _create_partition(self):
+        """
+            Create the partition of the file's date, and the partitioned
+            table of the spec first if needed. The partition's data_date
+            defaults to its date, so rows are loaded straight into it
+            without a data_date value.
+        """
+        parent = self.spec.file_name
+        try:
+            with self.db.transaction():
+                if not self.table_cache.exists(self.db, parent):
+                    create_string = self.spec.get_compiled(
+                        'partitioned_create_string',
+                        self._get_partitioned_create_sql_string_given_columns)
+                    self.db.create(create_string, parent)
+                self.db.query_given_tables(
+                    'CREATE TABLE {} PARTITION OF {} FOR VALUES IN (%s); ' +
+                    'ALTER TABLE {} ALTER COLUMN ' + PARTITION_COLUMN +
+                    ' SET DEFAULT %s;',
+                    [self.partition_name, parent, self.partition_name],
+                    (self.data_date, self.data_date))
+        except psycopg2.DatabaseError as error:
+            self.table_cache.discard(parent)
+            raise DataFormatException(error)
+
+        self.table_cache.add(parent)
+        self.table_cache.add(self.partition_name)
+
+    def _get_staging_name(self):
+        """Name the staging table after the target and the data file, so
+        loads of several files into one table each get their own.
+        """
+        digest = hashlib.sha1(self.path_to_file.encode('utf-8')).hexdigest()
+        return '%s_load_%s' % (self.table_name, digest[:8])
+
+    def _create_staging_table(self):
+        """
+            Create the UNLOGGED table the file is loaded into before it is
+            merged or swapped into the target: a copy of the target's
+            columns and defaults without its indexes, so the load writes
+            neither WAL nor index entries. A staging table swapped in for
+            a partition is constrained to its date, so attaching it needs
+            no scan. A resumed load carries on with the staging table of
+            the interrupted one, unless it is gone or lost rows in a crash,
+            in which case the load starts over.
+        """
+        target = self.table_name
+        self.staging_name = self._get_staging_name()
+        self.table_name = self.staging_name
+        try:
+            if self.resume_from['byte_offset']:
+                if (self.table_cache.exists(self.db, self.staging_name) and
+                        self.db.count_rows(self.staging_name) ==
+                        self.resume_from['row_count']):
+                    return
+                LOG.warning('Staging table %s does not hold the ' +
+                            'checkpointed rows, reloading %s from the start',
+                            self.staging_name, self.path_to_file)
+                self.resume_from = {'byte_offset': 0, 'next_line': 1,
+                                    'row_count': 0, 'rows_rejected': 0}
+
+            with self.db.transaction():
+                self.db.query_given_tables('DROP TABLE IF EXISTS {};',
+                                           [self.staging_name])
+                self.db.query_given_tables(
+                    'CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS);',
+                    [self.staging_name, target])
+                if self.swap_staging:
+                    self.db.query_given_tables(
+                        'ALTER TABLE {} ADD CHECK (' + PARTITION_COLUMN +
+                        ' = %s);', [self.staging_name], (self.data_date,))
+        except psycopg2.DatabaseError as error:
+            raise DataFormatException(error)
+        self.table_cache.add(self.staging_name)
+
+    def _finish_load(self):
+        if self.finish is None:
+            return
+        try:
+            self.finish(self.rows_loaded, self.rows_rejected)
+        except psycopg2.DatabaseError as error:
+            raise DataFormatException(error)
+
+    def _merge_staging_table(self):
+        """Append the loaded staging table to the target and drop it in a
+        single transaction, which also finishes the load.
+        """
+        target = self.partition_name or self.spec.file_name
+        try:
+            with self.db.transaction():
+                self.db.query_given_tables(
+                    'INSERT INTO {} SELECT * FROM {}; DROP TABLE {};',
+                    [target, self.staging_name, self.staging_name])
+                self._finish_load()
+        except psycopg2.DatabaseError as error:
+            raise DataFormatException(error)
+
+        self.table_cache.discard(self.staging_name)
+        self.table_name = target
+        self.staging_name = None
+
+    def _swap_partition(self):
+        """
+            Replace the date's partition with the loaded staging table in a
+            single transaction, which also finishes the load, so readers
+            see either the old day or the new. The staging table is made
+            logged first, and any indexes of the partitioned table are
+            built on it as it is attached.
+        """
+        parent = self.spec.file_name
+        try:
+            self.db.query_given_tables('ALTER TABLE {} SET LOGGED;',
+                                       [self.staging_name])
+            with self.db.transaction():
+                self.db.query_given_tables(
+                    'ALTER TABLE {} DETACH PARTITION {};',
+                    [parent, self.partition_name])
+                self.db.query_given_tables('DROP TABLE {};',
+                                           [self.partition_name])
+                self.db.query_given_tables(
+                    'ALTER TABLE {} RENAME TO {};',
+                    [self.staging_name, self.partition_name])
+                self.db.query_given_tables(
+                    'ALTER TABLE {} ATTACH PARTITION {} FOR VALUES IN (%s);',
+                    [parent, self.partition_name], (self.data_date,))
+                self._finish_load()
+        except psycopg2.DatabaseError as error:
+            raise DataFormatException(error)
+
+        self.table_cache.discard(self.staging_name)
+        self.table_name = self.partition_name
+        self.staging_name = None
+
     def _add_rows_to_data_format_table(self):
-        self.spec._get_specification_id()
-        if self.spec.spec_id:
-            self.spec._get_specification_columns()
+        self.spec.load()
         if self.spec.columns:
 
-            insert_string = self._get_insert_sql_string_given_columns(
-                self.spec.columns)
-
-            # for each line, extract the values to match the columns
-            # and insert as record into table
-            with open(self.path_to_file) as f:
-                for line in f.readlines():
-                    values = []
-                    index = 0
-                    for c in range(len(self.spec.columns)):
-                        width = self.spec.columns[c][3] + index
-                        value = line[index:width]
-                        values.append(value.strip())
-                        index = width
-
-                    try:
-                        self.db.insert(insert_string, self.spec.file_name,
-                                       values)
-                    except psycopg2.DatabaseError as error:
-                        LOG.error('_add_rows_to_data_format_table ' +
-                                  str(error))
+            try:
+                self._load_rows_into_data_format_table()
+            finally:
+                if self.reject_file is not None:
+                    self.reject_file.close()
 
         else:
             raise DataFormatException('Invalid specification; cannot add ' +
                                       'data format rows')
 
+    def _load_rows_into_data_format_table(self):
+        windows = self._get_windows()
+        if (self.checkpoint is not None and not self.sinks and self.bulk and
+                windows is not None):
+            self._copy_rows_in_windows(*windows)
+            return
+        if self.checkpoint is not None or self.sinks:
+            self._load_rows_in_batches()
+            return
+
+        # the file is loaded in a single transaction, the caller's when it
+        # has one; a failed COPY only rolls back to its savepoint
+        with self.db.transaction():
+            if self.bulk:
+                self._reset_rejects()
+                self.db.query('SAVEPOINT load_file;', None)
+                try:
+                    self._copy_rows_to_data_format_table()
+                    return
+                except psycopg2.DatabaseError as error:
+                    self.db.query('ROLLBACK TO SAVEPOINT load_file;', None)
+                    LOG.warning('_add_rows_to_data_format_table bulk load ' +
+                                'failed, inserting rows one at a time ' +
+                                str(error))
+
+            self._reset_rejects()
+            self._insert_rows_to_data_format_table()
+
+    def _copy_rows_to_data_format_table(self):
+        copy_string = self.spec.get_compiled(
+            'copy_string', self._get_copy_sql_string_given_columns)
+
+        self.rows_loaded = self.resume_from['row_count']
+        windows = self._get_windows()
+        if windows is None:
+            stream = CopyStream(self._get_converted_rows())
+        else:
+            chunks, stream_class = windows
+            stream = stream_class(self._get_chunks(chunks))
+        self.db.copy(copy_string, self.table_name, stream)
+
+        self.rows_loaded += stream.rows_written
+
+    def _copy_rows_in_windows(self, windows, stream_class):
+        """
+            Copy the file a rendered window at a time, ex. a memory mapped
+            block or a byte range parsed by a worker, each in a transaction
+            committed together with its checkpoint, so checkpointed loads
+            keep the COPY fast paths. A window whose COPY fails is parsed
+            again and its rows inserted one at a time, so a bad row only
+            loses itself.
+        """
+        copy_string = self.spec.get_compiled(
+            'copy_string', self._get_copy_sql_string_given_columns)
+
+        self._reset_rejects()
+        self.rows_loaded = self.resume_from['row_count']
+        start_offset = self.resume_from['byte_offset']
+        for (text, row_count, line_number, line_count, errors,
+                end_offset) in windows:
+            with self.db.transaction():
+                self.db.query('SAVEPOINT load_window;', None)
+                try:
+                    self.db.copy(copy_string, self.table_name,
+                                 stream_class([(text, row_count)]))
+                    self._reject_rows(line_number, errors)
+                    self.rows_loaded += row_count
+                except psycopg2.DatabaseError as error:
+                    self.db.query('ROLLBACK TO SAVEPOINT load_window;', None)
+                    LOG.warning('_copy_rows_in_windows bulk load failed, ' +
+                                'inserting rows one at a time ' + str(error))
+                    self._insert_window(start_offset, end_offset,
+                                        line_number)
+                self.checkpoint(end_offset, line_number + line_count,
+                                self.rows_loaded, self.rows_rejected)
+            start_offset = end_offset
+
+    def _insert_window(self, start_offset, end_offset, line_number):
+        slicer = self.spec.get_row_slicer()
+        converter = self.spec.get_row_converter()
+
+        lines = list(read_range(self.path_to_file, start_offset, end_offset))
+        rows, errors = parse_batch(lines, slicer, converter, self.timings)
+        self._reject_rows(line_number, errors)
+        self._write_batch([self._get_postgres_sink(bulk=False)], rows,
+                          self._get_loaded_line_indexes(lines, errors),
+                          line_number, lines)
+
+    def _insert_rows_to_data_format_table(self):
+        insert_string = self.spec.get_compiled(
+            'insert_string', self._get_insert_sql_string_given_columns)
+        slicer = self.spec.get_row_slicer()
+        converter = self.spec.get_row_converter()
+
+        self.rows_loaded = self.resume_from['row_count']
+
+        # insert each row behind its own savepoint so a bad row only
+        # loses itself
+        for line_number, lines, _ in self._get_line_batches():
+            rows, errors = parse_batch(lines, slicer, converter,
+                                       self.timings)
+            self._reject_rows(line_number, errors)
+
+            indexes = self._get_loaded_line_indexes(lines, errors)
+            for index, values in zip(indexes, rows):
+                self.db.query('SAVEPOINT load_row;', None)
+                try:
+                    self.db.insert(insert_string, self.table_name,
+                                   values)
+                    self.rows_loaded += 1
+                except psycopg2.DatabaseError as error:
+                    self.db.query('ROLLBACK TO SAVEPOINT load_row;', None)
+                    self._reject_rows(line_number,
+                                      [(index, str(error).strip(),
+                                        lines[index])])
+
+    def _get_converted_rows(self):
+        slicer = self.spec.get_row_slicer()
+        converter = self.spec.get_row_converter()
+        for line_number, lines, _ in self._get_line_batches():
+            rows, errors = parse_batch(lines, slicer, converter,
+                                       self.timings)
+            self._reject_rows(line_number, errors)
+            for values in rows:
+                yield values
+
+    def _load_rows_in_batches(self):
+        """
+            Load the file a batch at a time, handing each batch's rows to
+            the table and then to every sink; a row refused by one is
+            rejected, as _write_batch describes. With a checkpoint, each
+            batch is committed together with how far the load got, so an
+            interrupted load resumes from its last committed batch, and
+            the sinks are handed the rows committed before it first.
+        """
+        slicer = self.spec.get_row_slicer()
+        converter = self.spec.get_row_converter()
+        sinks = list(self.sinks)
+        if self.db is not None:
+            sinks.insert(0, self._get_postgres_sink(self.bulk))
+        self._reset_rejects()
+        self.rows_loaded = self.resume_from['row_count']
+
+        try:
+            for sink in sinks:
+                sink.open(self)
+            if (self.sinks and self.resume_from['byte_offset'] and
+                    not self._replay_to_sinks(slicer, converter)):
+                LOG.error('Resuming %s from line %s without a reject file; ' +
+                          'not writing its sinks, which would miss the ' +
+                          'rows loaded before', self.path_to_file,
+                          self.resume_from['next_line'])
+                for sink in self.sinks:
+                    sink.abort()
+                sinks = [sink for sink in sinks if sink not in self.sinks]
+            for line_number, lines, end_offset in self._get_line_batches():
+                rows, errors = parse_batch(lines, slicer, converter,
+                                           self.timings)
+                self._reject_rows(line_number, errors)
+                indexes = self._get_loaded_line_indexes(lines, errors)
+
+                if self.db is None:
+                    self._write_batch(sinks, rows, indexes, line_number,
+                                      lines)
+                    continue
+                with self.db.transaction():
+                    self._write_batch(sinks, rows, indexes, line_number,
+                                      lines)
+                    if self.checkpoint is not None:
+                        self.checkpoint(end_offset,
+                                        line_number + len(lines),
+                                        self.rows_loaded, self.rows_rejected)
+        except Exception as error:
+            for sink in sinks:
+                sink.abort()
+            if isinstance(error, DataSinkException):
+                raise DataFormatException(error)
+            raise
+        for sink in sinks:
+            sink.close()
+
+    def _replay_to_sinks(self, slicer, converter):
+        """
+            Hand the sinks the rows a resumed load committed to the table
+            before it was interrupted, so their output holds the whole
+            file: the lines up to the resume point which parse and are not
+            in the reject file, which holds every line the table or a sink
+            refused.
+
+        Returns:
+            bool: False when there is no reject file to tell those rows
+                apart
+        """
+        if self.reject_file is None:
+            return False
+        rejected = self.reject_file.get_line_numbers()
+
+        line_number = 1
+        batches = read_batches_from(self.path_to_file, self.batch_size,
+                                    end=self.resume_from['byte_offset'])
+        for lines, _ in self._timed(batches, 'read'):
+            rows, errors = parse_batch(lines, slicer, converter,
+                                       self.timings)
+            indexes = self._get_loaded_line_indexes(lines, errors)
+            rows = [values for index, values in zip(indexes, rows)
+                    if line_number + index not in rejected]
+            for sink in self.sinks:
+                if sink.write_batch(rows):
+                    raise DataFormatException(
+                        'Sink refused rows of %s which are already loaded' %
+                        self.path_to_file)
+            line_number += len(lines)
+        return True
+
+    def _get_postgres_sink(self, bulk):
+        return PostgresSink(
+            self.db, self.table_name,
+            self.spec.get_compiled(
+                'copy_string', self._get_copy_sql_string_given_columns),
+            self.spec.get_compiled(
+                'insert_string', self._get_insert_sql_string_given_columns),
+            bulk)
+
+    def _write_batch(self, sinks, rows, indexes, line_number, lines):
+        """Hand rows, read from lines[indexes[i]], to each sink in turn.
+        The rows any sink refuses when checking the batch are rejected
+        before any sink writes, and a row a sink refuses as it writes is
+        rejected and not handed on."""
+        for sink in sinks:
+            rows, indexes = self._drop_refused(sink.check_batch(rows), rows,
+                                               indexes, line_number, lines)
+        for sink in sinks:
+            rows, indexes = self._drop_refused(sink.write_batch(rows), rows,
+                                               indexes, line_number, lines)
+        self.rows_loaded += len(rows)
+
+    def _drop_refused(self, errors, rows, indexes, line_number, lines):
+        if not errors:
+            return rows, indexes
+        refused = set(index for index, _ in errors)
+        self._reject_rows(line_number, [
+            (indexes[index], reason, lines[indexes[index]])
+            for index, reason in errors])
+        rows = [values for index, values in enumerate(rows)
+                if index not in refused]
+        indexes = [line_index for index, line_index in enumerate(indexes)
+                   if index not in refused]
+        return rows, indexes
+
+    def _get_loaded_line_indexes(self, lines, errors):
+        rejected = set(error[0] for error in errors)
+        return [index for index in range(len(lines))
+                if index not in rejected]
+
+    def _get_windows(self):
+        """
+            Pick the rendered path of the file, if it has one: byte ranges
+            parsed by parse_workers processes, or memory mapped blocks.
+            Compressed files, and files read up to an end_offset, are read
+            a line at a time instead.
+
+        Returns:
+            tuple: (generator of (text, row_count, line_number,
+                line_count, errors, end_offset) windows from where the
+                load resumes, CopyStream class the text is copied with),
+                or None
+        """
+        # only the line reader stops at end_offset
+        if (get_compression(self.path_to_file) is not None or
+                self.end_offset is not None):
+            return None
+        if self.parse_workers > 1:
+            return self._get_rendered_windows(), RenderedCopyStream
+        if self.map_file or self.vectorize:
+            return self._get_mapped_windows(), BytesCopyStream
+        return None
+
+    def _get_chunks(self, windows):
+        for text, row_count, line_number, _, errors, _ in windows:
+            self._reject_rows(line_number, errors)
+            yield text, row_count
+
+    def _get_rendered_chunks(self):
+        return self._get_chunks(self._get_rendered_windows())
+
+    def _get_mapped_chunks(self):
+        return self._get_chunks(self._get_mapped_windows())
+
+    def _get_rendered_windows(self):
+        line_number = self.resume_from['next_line']
+        chunks = render_file(self.path_to_file, self.spec.columns,
+                             self.parse_workers,
+                             start=self.resume_from['byte_offset'])
+        for text, row_count, line_count, errors, end_offset in self._timed(
+                chunks, 'parse'):
+            self.bytes_read = end_offset - self.resume_from['byte_offset']
+            yield text, row_count, line_number, line_count, errors, end_offset
+            line_number += line_count
+
+    def _get_mapped_windows(self):
+        if self.vectorize:
+            renderer = self.spec.get_compiled('vector_renderer',
+                                              VectorRowRenderer)
+        else:
+            renderer = self.spec.get_compiled('bytes_renderer',
+                                              BytesRowRenderer)
+        line_number = self.resume_from['next_line']
+        blocks = map_batches_from(self.path_to_file, self.batch_size,
+                                  self.resume_from['byte_offset'])
+        for block, end_offset in self._timed(blocks, 'read'):
+            text, row_count, line_count, errors = renderer.render_block(
+                block, self.timings)
+            self.bytes_read = end_offset - self.resume_from['byte_offset']
+            yield text, row_count, line_number, line_count, errors, end_offset
+            line_number += line_count
+
+    def _get_line_batches(self):
+        line_number = self.resume_from['next_line']
+        batches = read_batches_from(self.path_to_file, self.batch_size,
+                                    self.resume_from['byte_offset'],
+                                    end=self.end_offset)
+        for batch, end_offset in self._timed(batches, 'read'):
+            self.bytes_read = end_offset - self.resume_from['byte_offset']
+            yield line_number, batch, end_offset
+            line_number += len(batch)
+
+    def _timed(self, iterable, phase):
+        """Yield from iterable, adding the time spent waiting on it to
+        the given phase.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.timings[phase] += time.time() - start
+            yield item
+
+    def _reset_rejects(self):
+        self.rows_rejected = self.resume_from['rows_rejected']
+        if self.reject_file is None:
+            return
+        # a resumed load keeps the rejects of the lines it committed
+        if self.resume_from['byte_offset']:
+            self.reject_file.truncate(self.resume_from['next_line'])
+        else:
+            self.reject_file.reset()
+
+    def _reject_rows(self, first_line_number, errors):
+        for index, reason, line in errors:
+            self.rows_rejected += 1
+            if self.reject_file is not None:
+                self.reject_file.write(first_line_number + index, reason,
+                                       line)
+            else:
+                LOG.error('_add_rows_to_data_format_table line %s %s' %
+                          (first_line_number + index, reason))
+
     def _get_create_sql_string_given_columns(self, columns):
         """
             Puts together the intial CREATE TABLE string with
@@ -123,6 +782,30 @@ class DataFormat(object):
 
         return create_string
 
+    def _get_partitioned_create_sql_string_given_columns(self, columns):
+        """
+            Puts together the CREATE TABLE string of a table partitioned by
+            list on a data_date column following the spec's columns, with
+            the table name left blank to safely inject in later
+
+        Args:
+            columns (list): List of column tuples
+        Returns:
+            create_string, ex. 'CREATE TABLE {} (
+                                name TEXT,
+                                data_date DATE NOT NULL)
+                                PARTITION BY LIST (data_date);'
+        """
+        if any(column[2].lower() == PARTITION_COLUMN for column in columns):
+            raise DataFormatException('Specification has a %s column; ' %
+                                      PARTITION_COLUMN + 'cannot partition ' +
+                                      'by date')
+
+        create_string = self._get_create_sql_string_given_columns(columns)
+        return (create_string[:-2] + ',\n' + PARTITION_COLUMN +
+                ' DATE NOT NULL) PARTITION BY LIST (' + PARTITION_COLUMN +
+                ');')
+
     def _get_insert_sql_string_given_columns(self, columns):
         """
             Puts together the intial INSERT INTO string with
@@ -142,3 +825,18 @@ class DataFormat(object):
         insert_string += '%s);'
 
         return insert_string
+
+    def _get_copy_sql_string_given_columns(self, columns):
+        """
+            Puts together the COPY ... FROM STDIN string with the column
+            names listed in specification order, but with the table name
+            left blank to safely inject in later
+
+        Args:
+            columns (list): List of column tuples
+        Returns:
+            copy_string, ex. 'COPY {} (name, valid, count) FROM STDIN;'
+        """
+        column_names = [column[2].lower() for column in columns]
+
+        return 'COPY {} (' + ', '.join(column_names) + ') FROM STDIN;'
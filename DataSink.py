@@ -0,0 +1,113 @@
+from CopyStream import CopyStream
+
+import logging
+import psycopg2
+
+LOG = logging.getLogger(__name__)
+
+
+class DataSinkException(Exception):
+    pass
+
+
+class DataSink(object):
+    """
+        Destination of the rows of a data file. DataFormat reads and parses
+        a file once, a batch of lines at a time. Each sink first checks the
+        converted rows of a batch, and the rows any sink refuses are
+        rejected before any sink writes; the rest are then handed to each
+        sink in turn, and a row one sink refuses as it writes is rejected
+        and not handed to the sinks after it. Sinks which can tell up
+        front which rows they will refuse should do so in check_batch, so
+        a row never ends up in some outputs and not in others.
+    """
+
+    def open(self, data_format):
+        """Prepare to receive the rows of data_format's file."""
+        pass
+
+    def check_batch(self, rows):
+        """
+            Find the rows of a batch this sink would refuse, without
+            writing anything
+
+        Args:
+            rows (list): Converted values of each row
+        Returns:
+            list of (row index, reason) for the rows which would be
+                refused
+        """
+        return []
+
+    def write_batch(self, rows):
+        """
+            Write one batch of converted rows
+
+        Args:
+            rows (list): Converted values of each row
+        Returns:
+            list of (row index, reason) for the rows which were refused
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Finish the output once every batch is written."""
+        pass
+
+    def abort(self):
+        """Discard the output of a load which failed part way."""
+        pass
+
+
+class PostgresSink(DataSink):
+    """
+        Writes rows into a table, a batch at a time. Each batch is copied
+        in; if the COPY fails, its rows are inserted one at a time instead,
+        each behind a savepoint, so a bad row only loses itself. A batch is
+        written in the caller's transaction when there is one, and in its
+        own otherwise.
+
+        Attributes:
+        db (object): FilesDBWrapper to write through
+        table_name (string): Table the rows are written into
+        copy_string (string): COPY statement of the spec, table left blank
+        insert_string (string): INSERT statement of the spec, table left
+            blank
+        bulk (bool): Copy batches in, rather than only inserting rows
+    """
+
+    def __init__(self, db, table_name, copy_string, insert_string,
+                 bulk=True):
+        self.db = db
+        self.table_name = table_name
+        self.copy_string = copy_string
+        self.insert_string = insert_string
+        self.bulk = bulk
+
+    def write_batch(self, rows):
+        with self.db.transaction():
+            if self.bulk and self._copy_batch(rows):
+                return []
+            return self._insert_batch(rows)
+
+    def _copy_batch(self, rows):
+        self.db.query('SAVEPOINT load_batch;', None)
+        try:
+            self.db.copy(self.copy_string, self.table_name, CopyStream(rows))
+            return True
+        except psycopg2.DatabaseError as error:
+            self.db.query('ROLLBACK TO SAVEPOINT load_batch;', None)
+            LOG.warning('_copy_batch bulk load failed, inserting rows one ' +
+                        'at a time ' + str(error))
+            return False
+
+    def _insert_batch(self, rows):
+        errors = []
+        for index, values in enumerate(rows):
+            self.db.query('SAVEPOINT load_row;', None)
+            try:
+                self.db.insert(self.insert_string, self.table_name, values)
+            except psycopg2.DatabaseError as error:
+                self.db.query('ROLLBACK TO SAVEPOINT load_row;', None)
+                errors.append((index, str(error).strip()))
+        return errors
@@ -0,0 +1,139 @@
+from watchdog.events import FileSystemEventHandler
+
+import logging
+import os
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# number of dispatched file signatures remembered to drop repeat events
+DISPATCHED_HISTORY = 1024
+
+
+class FileEventStabilizer(FileSystemEventHandler):
+    """
+        Sits between the observer and a file handler and only dispatches a
+        file once it has finished being written.
+
+        Created and modified events are coalesced per path; a path is handed
+        to handler.handle_file once no event has arrived for it for
+        settle_seconds and its size and mtime did not change over the last
+        check. A file renamed into place is complete as soon as the rename
+        is seen, so it only waits out the settle period. A path which is
+        deleted before it settles is dropped, and a file whose size and
+        mtime match what was last dispatched for it is not dispatched again.
+
+        Attributes:
+        handler (object): Handler with a handle_file(path) method, ex. a
+            DataFileHandler or SpecificationFileHandler
+        settle_seconds (float): Quiet period before a path is dispatched
+        poll_seconds (float): How often pending paths are checked
+    """
+
+    def __init__(self, handler, settle_seconds=2.0, poll_seconds=None):
+        self.handler = handler
+        self.settle_seconds = settle_seconds
+        if poll_seconds is None:
+            poll_seconds = max(settle_seconds / 4.0, 0.01)
+        self.poll_seconds = poll_seconds
+        self._pending = {}
+        self._dispatched = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._touch(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        with self._lock:
+            self._pending.pop(event.src_path, None)
+        self._touch(event.dest_path, renamed=True)
+
+    def on_deleted(self, event):
+        with self._lock:
+            self._pending.pop(event.src_path, None)
+            self._dispatched.pop(event.src_path, None)
+
+    def _touch(self, path_to_file, renamed=False):
+        with self._lock:
+            entry = self._pending.get(path_to_file)
+            if entry is None:
+                entry = {'signature': None, 'renamed': False}
+                self._pending[path_to_file] = entry
+            entry['last_event'] = time.time()
+            entry['renamed'] = entry['renamed'] or renamed
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_seconds):
+            self.check()
+
+    def check(self):
+        """
+            Dispatch every pending path which has settled; called by the
+            stabilizer's thread every poll_seconds
+        """
+        now = time.time()
+        ready = []
+        with self._lock:
+            for path_to_file, entry in list(self._pending.items()):
+                if now - entry['last_event'] < self.settle_seconds:
+                    continue
+                signature = self._stat(path_to_file)
+                if signature is None:
+                    del self._pending[path_to_file]
+                    continue
+                if not entry['renamed'] and signature != entry['signature']:
+                    # still growing, or not yet compared; look again on
+                    # the next check
+                    entry['signature'] = signature
+                    continue
+                del self._pending[path_to_file]
+                if self._dispatched.get(path_to_file) == signature:
+                    LOG.debug('Unchanged file not dispatched again: %s',
+                              path_to_file)
+                    continue
+                self._remember(path_to_file, signature)
+                ready.append(path_to_file)
+
+        for path_to_file in ready:
+            try:
+                self.handler.handle_file(path_to_file)
+            except Exception:
+                LOG.exception('Could not process %s' % path_to_file)
+
+    def _remember(self, path_to_file, signature):
+        if len(self._dispatched) >= DISPATCHED_HISTORY:
+            self._dispatched.pop(next(iter(self._dispatched)))
+        self._dispatched[path_to_file] = signature
+
+    def _stat(self, path_to_file):
+        try:
+            stat = os.stat(path_to_file)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
@@ -1,9 +1,14 @@
 from config import get_postgres_config
+from Metrics import REGISTRY
+from contextlib import contextmanager
 from psycopg2 import connect as psycopg_connect
 from psycopg2 import DatabaseError
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 import logging
+import threading
 
 LOG = logging.getLogger(__name__)
 
@@ -22,58 +27,165 @@ class FilesDBWrapper(object):
 
     When a cursor exits the with block it is closed, releasing any resource
     eventually associated with it.
+
+    With max_connections set, the wrapper holds a pool of between
+    min_connections and max_connections connections instead of a single
+    one, and each method checks a connection out for its own transaction,
+    waiting for one to be free if they are all in use.
+    Inside a transaction() block every method called on the same thread
+    runs on the block's connection, and everything is committed together
+    when the block exits.
+    Without a pool the single connection is held by one thread at a time,
+    for a whole transaction() block or method call, so no other thread
+    can commit or roll back an open transaction on it.
     """
 
-    def __init__(self, test=False):
+    def __init__(self, test=False, min_connections=1, max_connections=0,
+                 params=None):
+        self._pool = None
+        self._local = threading.local()
+        self._connection_lock = threading.RLock()
         if not test:
-            self._connection = self._connect()
+            if params is None:
+                params = get_postgres_config()
+            if max_connections:
+                self._pool = ThreadedConnectionPool(
+                    min_connections, max_connections, **params)
+                self._slots = threading.BoundedSemaphore(max_connections)
+            else:
+                self._connection = self._connect(params)
 
     def __del__(self):
-        self._connection.close()
+        if self._pool is not None:
+            self._pool.closeall()
+        elif getattr(self, '_connection', None) is not None:
+            self._connection.close()
 
-    def _connect(self):
+    def _connect(self, params):
         try:
-            params = get_postgres_config()
             conn = psycopg_connect(**params)
             return conn
         except DatabaseError as error:
             LOG.error(error)
 
+    def _getconn(self):
+        if self._pool is None:
+            self._connection_lock.acquire()
+            return self._connection
+        self._slots.acquire()
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _putconn(self, conn):
+        if self._pool is None:
+            self._connection_lock.release()
+        else:
+            self._pool.putconn(conn)
+            self._slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """ Check a connection out for the duration of the block and run
+        every method called inside it, on this thread, in one transaction.
+        Nested blocks join the outermost transaction.
+        """
+        if getattr(self._local, 'connection', None) is not None:
+            yield self
+            return
+
+        conn = self._getconn()
+        self._local.connection = conn
+        try:
+            with conn:
+                yield self
+        finally:
+            self._local.connection = None
+            self._putconn(conn)
+
+    @contextmanager
+    def _cursor(self, operation):
+        """ Yield a cursor for one method call, recording how long the
+        call's round trip took under its operation name.
+        """
+        with REGISTRY.timer('db_round_trip_seconds',
+                            (('operation', operation),)):
+            conn = getattr(self._local, 'connection', None)
+            if conn is not None:
+                with conn.cursor() as curs:
+                    yield curs
+                return
+
+            conn = self._getconn()
+            try:
+                with conn:
+                    with conn.cursor() as curs:
+                        yield curs
+            finally:
+                self._putconn(conn)
+
     def query_and_get_id(self, query, params=None):
         id = None
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(query, params)
-                id = curs.fetchone()[0]
+        with self._cursor('query_and_get_id') as curs:
+            curs.execute(query, params)
+            row = curs.fetchone()
+            if row:
+                id = row[0]
         return id
 
     def query(self, query, params):
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(query, params)
+        with self._cursor('query') as curs:
+            curs.execute(query, params)
 
     def query_given_table(self, query_string, table_name):
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(sql.SQL(query_string).format(
-                    sql.Identifier(table_name)))
+        with self._cursor('query_given_table') as curs:
+            curs.execute(sql.SQL(query_string).format(
+                sql.Identifier(table_name)))
+
+    def query_given_tables(self, query_string, table_names, params=None):
+        """ Executes query_string with each {} replaced by the next of
+        table_names, safely quoted, and %s placeholders filled from params.
+        """
+        with self._cursor('query_given_tables') as curs:
+            curs.execute(sql.SQL(query_string).format(
+                *[sql.Identifier(name) for name in table_names]), params)
+
+    def count_rows(self, table_name):
+        with self._cursor('count_rows') as curs:
+            curs.execute(sql.SQL('SELECT COUNT(*) FROM {};').format(
+                sql.Identifier(table_name)))
+            return curs.fetchone()[0]
 
     def query_all(self, query, params):
         rows = None
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(query, params)
-                rows = curs.fetchall()
+        with self._cursor('query_all') as curs:
+            curs.execute(query, params)
+            rows = curs.fetchall()
         return rows
 
+    def insert_many(self, query, rows):
+        """ Inserts all rows with a single multi-row INSERT; query holds a
+        single %s placeholder for the VALUES list.
+        """
+        with self._cursor('insert_many') as curs:
+            execute_values(curs, query, rows, page_size=max(len(rows), 1))
+
     def insert(self, insert_string, table_name, values):
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(sql.SQL(insert_string).format(
-                    sql.Identifier(table_name)), values)
+        with self._cursor('insert') as curs:
+            curs.execute(sql.SQL(insert_string).format(
+                sql.Identifier(table_name)), values)
 
     def create(self, create_string, table_name):
-        with self._connection:
-            with self._connection.cursor() as curs:
-                curs.execute(sql.SQL(create_string).format(
-                    sql.Identifier(table_name)))
+        with self._cursor('create') as curs:
+            curs.execute(sql.SQL(create_string).format(
+                sql.Identifier(table_name)))
+
+    def copy(self, copy_string, table_name, file_obj):
+        """ Streams file_obj into table_name with COPY ... FROM STDIN in a
+        single transaction; file_obj only needs a read(size) method.
+        """
+        with self._cursor('copy') as curs:
+            curs.copy_expert(sql.SQL(copy_string).format(
+                sql.Identifier(table_name)), file_obj)
@@ -0,0 +1,312 @@
+from psycopg2 import DatabaseError
+
+import hashlib
+import logging
+import os
+
+LOG = logging.getLogger(__name__)
+
+# number of bytes hashed at each end of a data file for its fingerprint
+FINGERPRINT_BYTES = 64 * 1024
+
+LOADING = 'loading'
+LOADED = 'loaded'
+
+# seconds after which a tailed file still marked loading, with no
+# checkpoint since, is taken to be abandoned and may be claimed again
+TAIL_CLAIM_SECONDS = 600
+
+
+def fingerprint(path_to_file, file_size):
+    """
+        Cheap content hash of the first file_size bytes of a data file:
+        their count plus the first and last FINGERPRINT_BYTES of them, so
+        multi GB files are not read in full just to be recognized. Lines
+        appended to a file leave the fingerprint of its first file_size
+        bytes unchanged, so a tailed file is recognized by the part of it
+        loaded so far.
+
+    Args:
+        path_to_file (str): Path to the data file
+        file_size (int): Number of bytes of the file to hash, usually its
+            size
+    Returns:
+        hex digest (str)
+    """
+    digest = hashlib.sha1(str(file_size).encode('utf-8'))
+    with open(path_to_file, 'rb') as f:
+        digest.update(f.read(min(file_size, FINGERPRINT_BYTES)))
+        if file_size > FINGERPRINT_BYTES:
+            start = max(FINGERPRINT_BYTES, file_size - FINGERPRINT_BYTES)
+            f.seek(start)
+            digest.update(f.read(file_size - start))
+    return digest.hexdigest()
+
+
+class IngestLedgerException(Exception):
+    pass
+
+
+class IngestLedger(object):
+    """
+        Record of the data files loaded into the database, kept in the
+        file_ingest_ledger table: each file's path, size, fingerprint,
+        spec, row counts, status and the byte offset up to which its rows
+        are committed. A tailed file's entry holds the size and fingerprint
+        of the part of it committed so far.
+        Utilizes a db wrapper to execute sql queries and create/edit/get info.
+
+        Attributes:
+        db (object): DB connection wrapper for executing sql queries
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def begin(self, path_to_file, spec_name, replaces=False):
+        """
+            Decide how to load a data file. A file already loaded with the
+            same size and fingerprint is skipped, and a file whose load was
+            interrupted resumes from its last checkpoint. A file which
+            changed since rows of it were committed is not loaded again,
+            since its rows would be added a second time, unless the load
+            replaces them.
+
+        Args:
+            path_to_file (str): Path to the data file
+            spec_name (str): Name of the file's specification
+            replaces (bool): The load replaces every row earlier loads of
+                the file committed, ex. by swapping in its date partition
+        Returns:
+            entry (dict): byte_offset, next_line, row_count and
+                rows_rejected to resume from, or None to skip the file
+        """
+        file_size = os.path.getsize(path_to_file)
+        content_hash = fingerprint(path_to_file, file_size)
+
+        entry = self.get_entry(path_to_file)
+        if (entry and entry['file_size'] == file_size and
+                entry['content_hash'] == content_hash):
+            if entry['status'] == LOADED:
+                return None
+            return entry
+
+        if entry and entry['byte_offset'] and not replaces:
+            LOG.error('%s changed after %s of its lines were loaded; not ' +
+                      'loading it again, since its rows are already in the ' +
+                      'table', path_to_file, entry['next_line'] - 1)
+            return None
+        if entry:
+            LOG.warning('%s changed since it was last loaded; loading it ' +
+                        'again from the beginning', path_to_file)
+        return self._start(path_to_file, file_size, content_hash, spec_name,
+                           entry)
+
+    def begin_tail(self, path_to_file, spec_name, end_offset):
+        """
+            Claim the lines appended to a growing data file since its last
+            load. The claim is taken in the ledger, so however many workers
+            see the file change, only one loads the new lines. A file
+            which shrank or whose loaded part changed was replaced, and is
+            not loaded again once rows of it were committed, as in begin.
+
+        Args:
+            path_to_file (str): Path to the data file
+            spec_name (str): Name of the file's specification
+            end_offset (int): Offset just past the file's last complete
+                line
+        Returns:
+            entry (dict): byte_offset, next_line, row_count and
+                rows_rejected to load on from, or None if there is nothing
+                new or another worker holds the file
+        """
+        entry = self.get_entry(path_to_file)
+        if entry is None:
+            return self._start_tail(path_to_file, spec_name)
+
+        if (os.path.getsize(path_to_file) < entry['file_size'] or
+                fingerprint(path_to_file, entry['file_size']) !=
+                entry['content_hash']):
+            if entry['byte_offset']:
+                LOG.error('%s was replaced after %s of its lines were ' +
+                          'loaded; not loading it again, since its rows ' +
+                          'are already in the table', path_to_file,
+                          entry['next_line'] - 1)
+                return None
+            LOG.warning('%s was replaced since it was last loaded; ' +
+                        'loading it again from the beginning', path_to_file)
+            return self._start(path_to_file, 0, fingerprint(path_to_file, 0),
+                               spec_name, entry)
+
+        if entry['byte_offset'] >= end_offset:
+            return None
+
+        sql = """UPDATE file_ingest_ledger SET status = %s,
+                 updated_at = now() WHERE file_path = %s AND byte_offset = %s
+                 AND (status = %s OR
+                      updated_at < now() - %s * interval '1 second')
+                 RETURNING file_path;"""
+
+        claimed = self.db.query_all(sql, (LOADING, path_to_file,
+                                          entry['byte_offset'], LOADED,
+                                          TAIL_CLAIM_SECONDS))
+        if not claimed:
+            return None
+        entry['status'] = LOADING
+        return entry
+
+    def get_entry(self, path_to_file):
+        sql = """SELECT file_size, content_hash, status, byte_offset,
+                 next_line, row_count, rows_rejected FROM file_ingest_ledger
+                 WHERE file_path = %s;"""
+
+        rows = self.db.query_all(sql, (path_to_file,))
+        if not rows:
+            return None
+
+        keys = ('file_size', 'content_hash', 'status', 'byte_offset',
+                'next_line', 'row_count', 'rows_rejected')
+        return dict(zip(keys, rows[0]))
+
+    def checkpointer(self, path_to_file, entry):
+        """
+            Build the checkpoint callable of a load starting from entry, as
+            returned by begin, for DataFormat
+
+        Args:
+            path_to_file (str): Path to the data file
+            entry (dict): Entry the load starts from
+        Returns:
+            callable taking (byte_offset, next_line, row_count,
+                rows_rejected)
+        """
+        committed = [entry['byte_offset']]
+
+        def checkpoint(byte_offset, next_line, row_count, rows_rejected):
+            self.checkpoint(path_to_file, committed[0], byte_offset,
+                            next_line, row_count, rows_rejected)
+            committed[0] = byte_offset
+
+        return checkpoint
+
+    def checkpoint(self, path_to_file, from_offset, byte_offset, next_line,
+                   row_count, rows_rejected):
+        """
+            Record how far the load has committed; meant to run inside the
+            transaction which commits the rows. The entry only moves on
+            from from_offset, where the load's last checkpoint left it, so
+            when another load of the file committed the same lines first
+            the batch is rolled back rather than added twice.
+
+        Raises:
+            IngestLedgerException when the entry is no longer at
+                from_offset
+        """
+        sql = """UPDATE file_ingest_ledger SET byte_offset = %s,
+                 next_line = %s, row_count = %s, rows_rejected = %s,
+                 updated_at = now() WHERE file_path = %s AND byte_offset = %s
+                 RETURNING file_path;"""
+
+        if not self.db.query_all(sql, (byte_offset, next_line, row_count,
+                                       rows_rejected, path_to_file,
+                                       from_offset)):
+            raise IngestLedgerException(
+                '%s was loaded past byte %s by another load' %
+                (path_to_file, from_offset))
+
+    def checkpoint_tail(self, path_to_file, byte_offset, next_line,
+                        row_count, rows_rejected):
+        """Record how far the load of a tailed file has committed, with
+        the size and fingerprint of the committed part; meant to run
+        inside the transaction which commits the rows.
+        """
+        sql = """UPDATE file_ingest_ledger SET byte_offset = %s,
+                 next_line = %s, row_count = %s, rows_rejected = %s,
+                 file_size = %s, content_hash = %s, updated_at = now()
+                 WHERE file_path = %s;"""
+
+        self.db.query(sql, (byte_offset, next_line, row_count,
+                            rows_rejected, byte_offset,
+                            fingerprint(path_to_file, byte_offset),
+                            path_to_file))
+
+    def release(self, path_to_file):
+        """Give up the claim on a tailed file after a failed load, keeping
+        what it committed, so the next change to the file retries."""
+        sql = """UPDATE file_ingest_ledger SET status = %s,
+                 updated_at = now() WHERE file_path = %s;"""
+
+        try:
+            self.db.query(sql, (LOADED, path_to_file))
+        except DatabaseError as error:
+            LOG.error('release ' + str(error))
+
+    def finisher(self, path_to_file):
+        """
+            Build the finish callable of a load for DataFormat, taking
+            (row_count, rows_rejected). Unlike finish it raises on a
+            database error, since it runs inside the transaction which
+            makes the load's rows visible, ex. its staging table's merge,
+            and must roll back with it.
+        """
+        def finish(row_count, rows_rejected):
+            self._mark_loaded(path_to_file, row_count, rows_rejected)
+
+        return finish
+
+    def finish(self, path_to_file, row_count, rows_rejected):
+        try:
+            self._mark_loaded(path_to_file, row_count, rows_rejected)
+        except DatabaseError as error:
+            LOG.error('finish ' + str(error))
+
+    def _mark_loaded(self, path_to_file, row_count, rows_rejected):
+        sql = """UPDATE file_ingest_ledger SET status = %s, row_count = %s,
+                 rows_rejected = %s, updated_at = now()
+                 WHERE file_path = %s;"""
+
+        self.db.query(sql, (LOADED, row_count, rows_rejected, path_to_file))
+
+    def _start(self, path_to_file, file_size, content_hash, spec_name,
+               entry=None):
+        """Start the entry of a load from the beginning of the file, over
+        the entry read before if there is one. Returns None when another
+        load started or moved the entry on in the meantime."""
+        if entry is None:
+            sql = """INSERT INTO file_ingest_ledger(file_path, file_size,
+                     content_hash, spec_name, status)
+                     VALUES (%s, %s, %s, %s, %s)
+                     ON CONFLICT (file_path) DO NOTHING RETURNING file_path;"""
+            params = (path_to_file, file_size, content_hash, spec_name,
+                      LOADING)
+        else:
+            sql = """UPDATE file_ingest_ledger SET file_size = %s,
+                     content_hash = %s, spec_name = %s, status = %s,
+                     byte_offset = 0, next_line = 1, row_count = 0,
+                     rows_rejected = 0, updated_at = now()
+                     WHERE file_path = %s AND content_hash = %s
+                     AND byte_offset = %s RETURNING file_path;"""
+            params = (file_size, content_hash, spec_name, LOADING,
+                      path_to_file, entry['content_hash'],
+                      entry['byte_offset'])
+
+        if not self.db.query_all(sql, params):
+            LOG.info('%s is being loaded by another load', path_to_file)
+            return None
+        return {'file_size': file_size, 'content_hash': content_hash,
+                'status': LOADING, 'byte_offset': 0, 'next_line': 1,
+                'row_count': 0, 'rows_rejected': 0}
+
+    def _start_tail(self, path_to_file, spec_name):
+        sql = """INSERT INTO file_ingest_ledger(file_path, file_size,
+                 content_hash, spec_name, status) VALUES (%s, 0, %s, %s, %s)
+                 ON CONFLICT (file_path) DO NOTHING RETURNING file_path;"""
+
+        content_hash = fingerprint(path_to_file, 0)
+        if not self.db.query_all(sql, (path_to_file, content_hash,
+                                       spec_name, LOADING)):
+            # another worker saw the file first
+            return None
+        return {'file_size': 0, 'content_hash': content_hash,
+                'status': LOADING, 'byte_offset': 0, 'next_line': 1,
+                'row_count': 0, 'rows_rejected': 0}
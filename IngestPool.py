@@ -0,0 +1,135 @@
+from DataFileHandler import DataFileHandler
+from FilesDBWrapper import FilesDBWrapper
+from Metrics import REGISTRY
+from SpecificationCache import SpecificationCache
+
+import logging
+import multiprocessing
+import threading
+import time
+import zlib
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+LOG = logging.getLogger(__name__)
+
+POOL_KINDS = ('thread', 'process')
+
+
+def _run_worker(work_queue, db_factory, handler_factory, spec_cache):
+    """
+        Worker loop: opens the worker's own db connection, then processes
+        (data file path, submit time) items from its queue until it
+        receives None, recording how long each file waited
+    """
+    db = db_factory()
+    if spec_cache is None:
+        spec_cache = SpecificationCache()
+    handler = handler_factory(db, spec_cache)
+
+    while True:
+        item = work_queue.get()
+        path_to_file = None
+        try:
+            if item is None:
+                return
+            path_to_file, submitted_at = item
+            REGISTRY.observe('queue_lag_seconds', time.time() - submitted_at)
+            handler.process_file(path_to_file)
+        except Exception:
+            LOG.exception('Could not process %s' % path_to_file)
+        finally:
+            work_queue.task_done()
+
+
+class IngestPool(object):
+    """
+        Pool of workers which load data files off the watchdog observer
+        thread, each worker with its own db connection.
+        Every worker has its own queue and files are routed to a worker by
+        target table, so loads into the same table are serialized while
+        loads into different tables run concurrently.
+
+        Attributes:
+        worker_count (int): Number of workers
+        kind (string): 'thread' or 'process'
+        db_factory (callable): Builds the db wrapper of each worker
+        handler_factory (callable): Builds the handler of each worker from
+            its db wrapper and a SpecificationCache
+        spec_cache (object): SpecificationCache shared by thread workers;
+            process workers each build their own
+    """
+
+    def __init__(self, worker_count=4, kind='thread',
+                 db_factory=FilesDBWrapper, handler_factory=DataFileHandler,
+                 spec_cache=None):
+        if kind not in POOL_KINDS:
+            raise ValueError('Unknown pool kind %s' % kind)
+
+        self.worker_count = worker_count
+        self.kind = kind
+        self.db_factory = db_factory
+        self.handler_factory = handler_factory
+        self.spec_cache = spec_cache
+        self._queues = []
+        self._workers = []
+
+    def start(self):
+        for index in range(self.worker_count):
+            if self.kind == 'thread':
+                work_queue = Queue()
+                worker = threading.Thread(
+                    target=_run_worker,
+                    args=(work_queue, self.db_factory, self.handler_factory,
+                          self.spec_cache or SpecificationCache()))
+            else:
+                work_queue = multiprocessing.JoinableQueue()
+                worker = multiprocessing.Process(
+                    target=_run_worker,
+                    args=(work_queue, self.db_factory, self.handler_factory,
+                          None))
+            # process workers must not be daemonic so they can start their
+            # own parse processes; stop() shuts them down
+            worker.daemon = self.kind == 'thread'
+            worker.start()
+            self._queues.append(work_queue)
+            self._workers.append(worker)
+
+    def submit(self, path_to_file):
+        table_name = DataFileHandler.parse_file_name(path_to_file)[0]
+        self._queues[self._get_worker_index(table_name)].put(
+            (path_to_file, time.time()))
+
+    def queue_depths(self):
+        """Return the number of files waiting on each worker's queue, or
+        None where the platform cannot report it.
+        """
+        depths = []
+        for work_queue in self._queues:
+            try:
+                depths.append(work_queue.qsize())
+            except NotImplementedError:
+                depths.append(None)
+        return depths
+
+    def queue_depth(self):
+        return sum(depth for depth in self.queue_depths() if depth)
+
+    def wait(self):
+        """Block until every submitted file has been processed."""
+        for work_queue in self._queues:
+            work_queue.join()
+
+    def stop(self):
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._queues = []
+        self._workers = []
+
+    def _get_worker_index(self, table_name):
+        return zlib.crc32(table_name.encode('utf-8')) % self.worker_count
@@ -0,0 +1,237 @@
+from contextlib import contextmanager
+
+import bisect
+import logging
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+
+LOG = logging.getLogger(__name__)
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0,
+                   120.0)
+
+# phases a data file load is split into; parse is the time spent waiting
+# on parallel parse workers, which read, slice and convert out of process
+PHASES = ('read', 'slice', 'convert', 'parse', 'write')
+
+
+class Histogram(object):
+    """
+        Cumulative latency histogram in the prometheus style
+
+        Attributes:
+        buckets (tuple): Upper bound of each bucket, in seconds
+        counts (list): Number of observations per bucket, plus one for
+            those above the last bound
+        total (float): Sum of all observations
+        count (int): Number of observations
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry(object):
+    """
+        Process wide counters, latency histograms and gauges describing the
+        loader, rendered in the prometheus text format or as a single log
+        line. Metrics are keyed by name and an optional tuple of
+        (label, value) pairs. Gauges are read from a callable when the
+        metrics are rendered, ex. the spec cache hit rate.
+
+        Process pool workers keep their own registry, so only the metrics
+        of the main process and its threads are reported.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, labels=()):
+        """Observe the time spent in the block into a histogram."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, labels)
+
+    def register_gauge(self, name, read_value):
+        with self._lock:
+            self._gauges[name] = read_value
+
+    def get_counter(self, name, labels=()):
+        return self._counters.get((name, tuple(labels)), 0)
+
+    def get_histogram(self, name, labels=()):
+        return self._histograms.get((name, tuple(labels)))
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    def render(self):
+        """
+            Render every metric in the prometheus text exposition format
+
+        Returns:
+            text, ex. 'file_parser_rows_loaded_total 3\\n...'
+        """
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append('%s%s %s' % (_metric_name(name),
+                                          _format_labels(labels), value))
+            for (name, labels), histogram in sorted(
+                    self._histograms.items()):
+                metric_name = _metric_name(name)
+                cumulative = 0
+                bounds = list(histogram.buckets) + ['+Inf']
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append('%s_bucket%s %s' % (
+                        metric_name,
+                        _format_labels(labels + (('le', bound),)),
+                        cumulative))
+                lines.append('%s_sum%s %s' % (
+                    metric_name, _format_labels(labels), histogram.total))
+                lines.append('%s_count%s %s' % (
+                    metric_name, _format_labels(labels), histogram.count))
+            gauges = sorted(self._gauges.items())
+        for name, read_value in gauges:
+            lines.append('%s %s' % (_metric_name(name), _read_gauge(
+                name, read_value)))
+        return '\n'.join(lines) + '\n'
+
+    def summary_line(self):
+        """
+            Summarize the loader in one line for the periodic log, ex.
+            'files=2 rows=3 rejected=1 read=0.01s slice=0.00s ...'
+        """
+        phases = ' '.join('%s=%.2fs' % (phase, self.get_counter(
+            'phase_seconds_total', (('phase', phase),))) for phase in PHASES)
+        with self._lock:
+            round_trips = sum(histogram.count for (name, _), histogram
+                              in self._histograms.items()
+                              if name == 'db_round_trip_seconds')
+            lag = self._histograms.get(('queue_lag_seconds', ()))
+            gauges = sorted(self._gauges.items())
+        parts = ['files=%s' % self.get_counter('files_loaded_total'),
+                 'rows=%s' % self.get_counter('rows_loaded_total'),
+                 'rejected=%s' % self.get_counter('rows_rejected_total'),
+                 'bytes=%s' % self.get_counter('bytes_read_total'),
+                 phases,
+                 'db_round_trips=%s' % round_trips]
+        if lag is not None and lag.count:
+            parts.append('queue_lag_avg=%.2fs' % (lag.total / lag.count))
+        for name, read_value in gauges:
+            parts.append('%s=%s' % (name, _read_gauge(name, read_value)))
+        return ' '.join(parts)
+
+
+def _metric_name(name):
+    return 'file_parser_' + name
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (label, value)
+                          for label, value in labels) + '}'
+
+
+def _read_gauge(name, read_value):
+    try:
+        return read_value()
+    except Exception:
+        LOG.exception('Could not read gauge %s' % name)
+        return 'NaN'
+
+
+class MetricsServer(object):
+    """
+        Serves the registry in the prometheus text format on
+        http://<host>:<port>/metrics from a daemon thread
+
+        Attributes:
+        registry (object): MetricsRegistry to serve
+        port (int): Port to listen on, 0 picks a free one
+        host (str): Address to listen on, local only by default
+    """
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                LOG.debug(format, *args)
+
+        self._server = HTTPServer((self.host, self.port),
+                                  MetricsRequestHandler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,75 @@
+from BatchParser import parse_batch
+from collections import deque
+from CopyStream import CopyStream
+from DataFileReader import read_range
+from DataFileReader import split_file
+from itertools import islice
+from RowSlicer import RowSlicer
+from ValueConverter import RowConverter
+
+import multiprocessing
+
+# size of the byte range handed to a worker at a time
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def render_range(task):
+    """
+        Parse and convert one byte range of a data file and render its
+        rows in the COPY text format. Runs in a worker process.
+
+    Args:
+        task (tuple): (path_to_file, start, end, columns)
+    Returns:
+        tuple: (COPY text, row count, line count, list of (line index
+            within the range, reason, line) for the lines which were
+            rejected)
+    """
+    path_to_file, start, end, columns = task
+    slicer = RowSlicer.from_columns(columns)
+    converter = RowConverter(columns)
+
+    lines = list(read_range(path_to_file, start, end))
+    rows, errors = parse_batch(lines, slicer, converter)
+
+    stream = CopyStream(rows)
+    text = stream.read()
+    return text, stream.rows_written, len(lines), errors
+
+
+def render_file(path_to_file, columns, workers, chunk_size=CHUNK_SIZE,
+                start=0):
+    """
+        Cut a data file into newline aligned byte ranges and parse them in
+        a pool of worker processes, yielding the rendered ranges in file
+        order. At most two ranges per worker are in flight at a time, so
+        memory stays bounded when the consumer is slower than the parsers.
+
+    Args:
+        path_to_file (str): Path to the data file
+        columns (list): Column tuples of the file's specification
+        workers (int): Number of worker processes
+        chunk_size (int): Approximate size in bytes of each range
+        start (int): Offset to start from, ex. to resume a load
+    Returns:
+        generator of render_range results, each followed by the offset
+            just past its range
+    """
+    tasks = iter([(path_to_file, range_start, end, columns)
+                  for range_start, end in split_file(path_to_file,
+                                                     chunk_size, start)])
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = deque((task, pool.apply_async(render_range, (task,)))
+                        for task in islice(tasks, workers * 2))
+        while pending:
+            task, result = pending.popleft()
+            result = result.get()
+            for next_task in islice(tasks, 1):
+                pending.append((next_task, pool.apply_async(render_range,
+                                                            (next_task,))))
+            yield result + (task[2],)
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,88 @@
+from CopyStream import ESCAPES
+
+import os
+
+
+def escape(reason):
+    """Escape the characters which would split a reject record, as COPY
+    text escapes them."""
+    for character, escaped in ESCAPES:
+        if character in reason:
+            reason = reason.replace(character, escaped)
+    return reason
+
+
+class RejectFile(object):
+    """
+        Sidecar file next to a data file which collects the lines that
+        could not be loaded, one per line as the line number, the reason
+        and the original record, tab separated. Backslashes, tabs and line
+        breaks in the reason are escaped as in COPY text, so every record
+        stays on its own line.
+        The file is only created once there is something to reject.
+
+        Attributes:
+        path (string): Path of the reject file, the data file path plus
+            SUFFIX
+        count (int): Number of lines written
+    """
+    SUFFIX = '.rejects'
+
+    def __init__(self, path_to_data_file):
+        self.path = path_to_data_file + self.SUFFIX
+        self.count = 0
+        self._file = None
+
+    def reset(self):
+        """Close the file and remove any reject file left by a previous
+        load of the same data file.
+        """
+        self.close()
+        self.count = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def truncate(self, next_line):
+        """Drop the lines rejected from next_line on, which a load that
+        was interrupted before committing them may have written, so the
+        load resuming from next_line does not write them twice.
+        """
+        self.close()
+        self.count = 0
+        if not os.path.exists(self.path):
+            return
+
+        kept = []
+        with open(self.path) as f:
+            for line in f:
+                if int(line.split('\t', 1)[0]) < next_line:
+                    kept.append(line)
+        self.count = len(kept)
+
+        if not kept:
+            os.remove(self.path)
+            return
+        with open(self.path, 'w') as f:
+            f.writelines(kept)
+
+    def get_line_numbers(self):
+        """Return the set of the line numbers in the reject file."""
+        line_numbers = set()
+        if not os.path.exists(self.path):
+            return line_numbers
+        with open(self.path) as f:
+            for line in f:
+                line_numbers.add(int(line.split('\t', 1)[0]))
+        return line_numbers
+
+    def write(self, line_number, reason, line):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write('%s\t%s\t%s\n' % (line_number, escape(reason),
+                                           line.rstrip('\r\n')))
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,51 @@
+from operator import itemgetter
+
+
+class RowSlicer(object):
+    """
+        Splits fixed width lines into their stripped column values.
+        The column offsets are worked out once from the specification's
+        column widths, so each line is split with a single itemgetter call
+        instead of walking the columns again.
+
+        Attributes:
+        widths (list): Column widths in specification order
+        offsets (list): (start, end) offset of each column within a line
+        record_width (int): Total width of a record, excluding the newline
+    """
+
+    def __init__(self, widths):
+        self.widths = list(widths)
+        self.offsets = []
+
+        index = 0
+        for width in self.widths:
+            self.offsets.append((index, index + width))
+            index += width
+        self.record_width = index
+
+        slices = [slice(start, end) for start, end in self.offsets]
+        if len(slices) == 1:
+            # itemgetter with a single item returns the value, not a tuple
+            self._getter = lambda line, s=slices[0]: (line[s],)
+        else:
+            self._getter = itemgetter(*slices)
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls([column[3] for column in columns])
+
+    def fields(self, line):
+        """Split a line, str or bytes, into its unstripped column values."""
+        return self._getter(line)
+
+    def slice(self, line):
+        """
+            Split a line into its stripped column values
+
+        Args:
+            line (str): One fixed width record
+        Returns:
+            values (list): ex. ['Foonyor', '1', '1']
+        """
+        return list(map(str.strip, self._getter(line)))
@@ -1,4 +1,6 @@
 from psycopg2 import DatabaseError
+from RowSlicer import RowSlicer
+from ValueConverter import RowConverter
 
 import logging
 
@@ -21,43 +23,116 @@ class Specification(object):
         spec_id: The id of the specification in the specification_formats table
         columns (list): The list of columns as tuples that specify how a data
             file of that format should be parsed
+        cache (object): Optional SpecificationCache shared between
+            specifications of the same process
+        compiled (dict): Artifacts built from the columns, such as SQL
+            strings and the row slicer, shared through the cache
     """
 
-    def __init__(self, file_name, db):
+    def __init__(self, file_name, db, cache=None):
         self.file_name = file_name
         self.db = db
+        self.cache = cache
         self.spec_id = None
         self.columns = None
+        self.compiled = {}
 
     def process_specification(self, lines):
-        self._insert_specification_format()
-        if self.spec_id:
-            self.add_specification_columns(lines)
-        else:
-            raise SpecificationException('Could not add specification')
+        """Register the specification and all of its columns in a single
+        transaction, so a failure never leaves a partial specification.
+        """
+        columns = self._parse_specification_lines(lines)
+        try:
+            with self.db.transaction():
+                self._insert_specification_format()
+                if not self.spec_id:
+                    raise SpecificationException('Could not add specification')
+                self._insert_specification_columns(columns)
+        except DatabaseError as error:
+            self.spec_id = None
+            raise SpecificationException(error)
 
     def does_specification_exist(self):
-        self._get_specification_id()
+        self.load()
         if self.spec_id:
             return True
         return False
 
+    def load(self):
+        """Populate spec_id and columns, from the cache when possible and
+        from the database otherwise. Does nothing once columns are loaded.
+        """
+        if self.columns:
+            return
+
+        if self.cache is not None:
+            entry = self.cache.get(self.file_name)
+            if entry is not None:
+                self.spec_id = entry['spec_id']
+                self.columns = entry['columns']
+                self.compiled = entry['compiled']
+                return
+
+        self._get_specification_id()
+        if self.spec_id:
+            self._get_specification_columns()
+
+        if self.cache is not None and self.columns:
+            self.cache.put(self.file_name, self.spec_id, self.columns,
+                           self.compiled)
+
+    def load_from_lines(self, lines):
+        """Populate columns from the lines of a specification file without
+        touching the database, ex. to parse a data file in a dry run.
+        """
+        self.columns = [(index + 1, None, name, int(width), data_type)
+                        for index, (name, width, data_type) in enumerate(
+                            self._parse_specification_lines(lines))]
+        self.compiled = {}
+
+    def get_compiled(self, key, build):
+        """Return the artifact stored under key, building it from the
+        columns with build(columns) the first time it is needed.
+        """
+        value = self.compiled.get(key)
+        if value is None and self.columns:
+            value = self.compiled[key] = build(self.columns)
+        return value
+
+    def get_row_slicer(self):
+        return self.get_compiled('row_slicer', RowSlicer.from_columns)
+
+    def get_row_converter(self):
+        return self.get_compiled('row_converter', RowConverter)
+
     def add_specification_columns(self, lines):
         if self.spec_id:
-            for index in range(1, len(lines)):
-                try:
-                    column_name, width, data_type = lines[index].split(',')
-                    self._insert_specification_column(column_name,
-                                                      width,
-                                                      data_type)
-                except ValueError:
-                    LOG.error('Invalid specification column at line %s' %
-                              index)
-                    continue
+            columns = self._parse_specification_lines(lines)
+            try:
+                self._insert_specification_columns(columns)
+            except DatabaseError as error:
+                LOG.error('add_specification_columns ' + str(error))
 
         else:
             LOG.error('Cannot add columns; spec format does not exist.')
 
+    def _parse_specification_lines(self, lines):
+        """Split the lines of a specification file, skipping the header.
+        Args:
+            lines (list): Lines of the specification file
+        Returns:
+            list: (column_name, width, data_type) tuples of the valid lines
+        """
+        columns = []
+        for index in range(1, len(lines)):
+            try:
+                column_name, width, data_type = lines[index].split(',')
+                columns.append((column_name, width, data_type))
+            except ValueError:
+                LOG.error('Invalid specification column at line %s' %
+                          index)
+        return columns
+
     def _get_specification_id(self):
         sql = """SELECT spec_id FROM specification_formats WHERE
                  spec_name = %s;"""
@@ -68,9 +143,10 @@ class Specification(object):
 
     def _get_specification_columns(self):
         sql = """SELECT * FROM specification_format_columns WHERE
-                 spec_id = %s;"""
+                 spec_id = %s ORDER BY column_id;"""
         try:
             self.columns = self.db.query_all(sql, (self.spec_id,))
+            self.compiled = {}
         except DatabaseError as error:
             LOG.error('_get_specification_columns ' + str(error))
 
@@ -91,3 +167,11 @@ class Specification(object):
             self.db.query(sql, (self.spec_id, name, width, data_type))
         except DatabaseError as error:
             LOG.error('_insert_specification_column ' + str(error))
+
+    def _insert_specification_columns(self, columns):
+        sql = """INSERT INTO specification_format_columns(spec_id, column_name,
+                 column_width, column_data_type) VALUES %s;"""
+
+        if columns:
+            self.db.insert_many(sql, [(self.spec_id,) + tuple(column)
+                                      for column in columns])
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+import threading
+
+
+class SpecificationCache(object):
+    """
+        In-process LRU cache of loaded specifications keyed by spec name.
+        Each entry holds the spec id, its column layout and a dict of
+        compiled artifacts (SQL strings, row slicer) built from those
+        columns, so a data file for a known spec needs no spec queries.
+
+        Entries are dropped with invalidate() when a specification file is
+        registered or changed.
+
+        Attributes:
+        max_size (int): Maximum number of specs kept before evicting the
+            least recently used one
+        hits (int): Number of lookups answered from the cache
+        misses (int): Number of lookups which were not cached
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, spec_name):
+        with self._lock:
+            entry = self._entries.pop(spec_name, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[spec_name] = entry
+            self.hits += 1
+            return entry
+
+    def put(self, spec_name, spec_id, columns, compiled):
+        with self._lock:
+            self._entries.pop(spec_name, None)
+            self._entries[spec_name] = {'spec_id': spec_id,
+                                        'columns': columns,
+                                        'compiled': compiled}
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, spec_name):
+        with self._lock:
+            self._entries.pop(spec_name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
@@ -2,7 +2,9 @@ from Specification import Specification
 from Specification import SpecificationException
 from watchdog.events import FileSystemEventHandler
 
+import fnmatch
 import logging
+import os
 
 LOG = logging.getLogger(__name__)
 
@@ -16,12 +18,33 @@ class SpecificationFileHandler(FileSystemEventHandler):
     """
     patterns = ["*.csv"]
 
-    def __init__(self, db):
+    def __init__(self, db, spec_cache=None):
         self.db = db
+        self.spec_cache = spec_cache
+
+    @staticmethod
+    def parse_file_name(path_to_file):
+        """Return the spec name of a specification file path.
+        Args:
+            path_to_file (str): ex. 'specs/fileformat1.csv'
+        Returns:
+            str: ex. 'fileformat1'
+        """
+        return os.path.splitext(os.path.basename(path_to_file))[0]
+
+    def is_spec_file(self, path_to_file):
+        file_name = os.path.basename(path_to_file)
+        return any(fnmatch.fnmatch(file_name, pattern)
+                   for pattern in self.patterns)
 
     def process(self, event):
-        full_file_name = event.src_path.split('/')[1]
-        file_name = full_file_name[:-4]
+        self.process_file(event.src_path)
+
+    def process_file(self, path_to_file):
+        file_name = self.parse_file_name(path_to_file)
+
+        # anything cached for this spec name is stale once its file changes
+        self._invalidate_cached_specification(file_name)
 
         spec = Specification(file_name, self.db)
 
@@ -29,16 +52,25 @@ class SpecificationFileHandler(FileSystemEventHandler):
             LOG.error('Specification already exists')
             return
 
-        lines = self.read_file(event.src_path)
+        lines = self.read_file(path_to_file)
 
         try:
             spec.process_specification(lines)
+            self._invalidate_cached_specification(file_name)
             LOG.info('Specification successfully added')
         except SpecificationException as error:
             LOG.error(error)
 
+    def handle_file(self, path_to_file):
+        if self.is_spec_file(path_to_file):
+            self.process_file(path_to_file)
+
     def on_created(self, event):
-        self.process(event)
+        self.handle_file(event.src_path)
+
+    def _invalidate_cached_specification(self, file_name):
+        if self.spec_cache is not None:
+            self.spec_cache.invalidate(file_name)
 
     def read_file(self, path_to_file):
         """Open specified file and return list of lines stripped of whitespace.
@@ -48,5 +80,5 @@ class SpecificationFileHandler(FileSystemEventHandler):
             list: list of lines stripped of whitespace
         """
         with open(path_to_file) as f:
-            lines = [line.rstrip('\n') for line in f.readlines()]
+            lines = [line.rstrip('\n') for line in f]
         return lines
@@ -0,0 +1,43 @@
+import threading
+
+TABLES_QUERY = """SELECT c.relname FROM pg_catalog.pg_class c
+                  WHERE c.relname = ANY(%s) AND c.relkind IN ('r', 'p')
+                  AND pg_catalog.pg_table_is_visible(c.oid);"""
+
+
+class TableCache(object):
+    """
+        Process lifetime memo of the data tables known to exist.
+        Unknown tables are looked up in pg_catalog, several at a time if
+        needed, so each table is checked once rather than once per file.
+        Only tables which exist are remembered, since a missing table can
+        be created by another process at any time.
+    """
+
+    def __init__(self):
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, table_name):
+        return table_name in self._tables
+
+    def exists(self, db, table_name):
+        if table_name not in self._tables:
+            self.refresh(db, [table_name])
+        return table_name in self._tables
+
+    def refresh(self, db, table_names):
+        """Look up table_names in the catalog with a single query and
+        remember the ones which exist.
+        """
+        rows = db.query_all(TABLES_QUERY, (list(table_names),))
+        with self._lock:
+            self._tables.update(row[0] for row in rows)
+
+    def add(self, table_name):
+        with self._lock:
+            self._tables.add(table_name)
+
+    def discard(self, table_name):
+        with self._lock:
+            self._tables.discard(table_name)
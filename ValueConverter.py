@@ -0,0 +1,195 @@
+from datetime import datetime
+from decimal import Decimal
+from decimal import InvalidOperation
+
+import re
+
+TRUE_VALUES = frozenset(['t', 'true', 'y', 'yes', 'on', '1'])
+FALSE_VALUES = frozenset(['f', 'false', 'n', 'no', 'off', '0'])
+
+
+def to_boolean(value):
+    if not value:
+        return None
+    lowered = value.lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValueError('invalid BOOLEAN %r' % value)
+
+
+# what postgres reads as an integer in any version: ascii digits with an
+# optional sign, ex. not '1_000' or other digits int() accepts
+INTEGER_PATTERN = re.compile(r'[ \t\n\r\f\v]*[+-]?[0-9]+[ \t\n\r\f\v]*\Z')
+
+
+def integer_converter(bits, type_name):
+    """Build a converter for a signed integer type of the given size"""
+    low = -2 ** (bits - 1)
+    high = 2 ** (bits - 1) - 1
+
+    def to_integer(value):
+        if not value:
+            return None
+        if not INTEGER_PATTERN.match(value):
+            raise ValueError('invalid %s %r' % (type_name, value))
+        number = int(value)
+        if not low <= number <= high:
+            raise ValueError('%s out of range %r' % (type_name, value))
+        return number
+
+    return to_integer
+
+
+def to_numeric(value):
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError('invalid NUMERIC %r' % value)
+
+
+def to_float(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError('invalid DOUBLE PRECISION %r' % value)
+
+
+def to_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('invalid DATE %r' % value)
+
+
+# column_data_type to converter; types which are not listed, like TEXT,
+# are passed through as strings for postgres to cast
+CONVERTERS = {
+    'BOOLEAN': to_boolean,
+    'BOOL': to_boolean,
+    'SMALLINT': integer_converter(16, 'SMALLINT'),
+    'INT2': integer_converter(16, 'SMALLINT'),
+    'INTEGER': integer_converter(32, 'INTEGER'),
+    'INT': integer_converter(32, 'INTEGER'),
+    'INT4': integer_converter(32, 'INTEGER'),
+    'BIGINT': integer_converter(64, 'BIGINT'),
+    'INT8': integer_converter(64, 'BIGINT'),
+    'NUMERIC': to_numeric,
+    'DECIMAL': to_numeric,
+    'REAL': to_float,
+    'FLOAT4': to_float,
+    'FLOAT8': to_float,
+    'DOUBLE PRECISION': to_float,
+    'DATE': to_date,
+}
+
+
+def get_base_type(data_type):
+    """Upper case column_data_type without its modifier, ex.
+    'numeric(10, 2)' -> 'NUMERIC'
+    """
+    return data_type.split('(')[0].strip().upper()
+
+
+def get_converter(data_type):
+    """
+        Find the converter for a declared column_data_type, ignoring case
+        and any type modifier, ex. 'numeric(10, 2)' -> to_numeric
+
+    Args:
+        data_type (str): column_data_type from the specification
+    Returns:
+        converter function, or None for types passed through as text
+    """
+    return CONVERTERS.get(get_base_type(data_type))
+
+
+class RowConverter(object):
+    """
+        Converts sliced rows from strings to python values according to
+        the column_data_type of each specification column, so bad values
+        are caught client side instead of failing the load in postgres.
+        Blank fields of non text columns become NULL.
+
+        Attributes:
+        column_names (list): Column names in specification order
+        converters (list): Converter of each column, None for text columns
+    """
+
+    def __init__(self, columns):
+        self.column_names = [column[2] for column in columns]
+        self.converters = [get_converter(column[4]) for column in columns]
+
+    def convert(self, values):
+        """
+            Convert a single row
+
+        Args:
+            values (list): Sliced string values of one row
+        Returns:
+            converted values (list)
+        Raises:
+            ValueError naming the first bad column
+        """
+        converted = list(values)
+        for index, converter in enumerate(self.converters):
+            if converter is not None and index < len(converted):
+                try:
+                    converted[index] = converter(converted[index])
+                except ValueError as error:
+                    raise ValueError('%s: %s' % (self.column_names[index],
+                                                 error))
+        return converted
+
+    def convert_batch(self, rows):
+        """
+            Convert a batch of rows a column at a time, only falling back to
+            row by row conversion for a column which holds a bad value
+
+        Args:
+            rows (list): Sliced rows, each a list of string values
+        Returns:
+            tuple: (converted rows, list of (row index, reason) for the
+                rows which could not be converted)
+        """
+        if not rows:
+            return [], []
+
+        columns = [list(column) for column in zip(*rows)]
+        reasons = {}
+
+        for index, converter in enumerate(self.converters):
+            if converter is None or index >= len(columns):
+                continue
+            try:
+                columns[index] = list(map(converter, columns[index]))
+            except ValueError:
+                columns[index] = self._convert_column_values(
+                    index, converter, columns[index], reasons)
+
+        converted = [list(row) for row in zip(*columns)]
+        if not reasons:
+            return converted, []
+
+        good_rows = [row for row_index, row in enumerate(converted)
+                     if row_index not in reasons]
+        errors = sorted(reasons.items())
+        return good_rows, errors
+
+    def _convert_column_values(self, index, converter, values, reasons):
+        converted = []
+        for row_index, value in enumerate(values):
+            try:
+                converted.append(converter(value))
+            except ValueError as error:
+                converted.append(None)
+                reasons.setdefault(row_index, '%s: %s' % (
+                    self.column_names[index], error))
+        return converted
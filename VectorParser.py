@@ -0,0 +1,264 @@
+from BytesParser import BOOLEAN_TYPES
+from BytesParser import BytesRowRenderer
+from BytesParser import FALSE_BYTES
+from BytesParser import INTEGER_BITS
+from BytesParser import NULL_VALUE
+from BytesParser import TRUE_BYTES
+from ValueConverter import get_base_type
+
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# digits an int64 always holds; longer integers are checked one at a time
+MAX_VECTOR_DIGITS = 18
+
+SPACE, MINUS, PLUS, ZERO, NINE, TAB, NEWLINE, BACKSLASH = (
+    ord(character) for character in ' -+09\t\n\\')
+
+
+def _strings():
+    # numpy 2 has fast string ufuncs in numpy.strings; older releases only
+    # have the numpy.char helpers
+    return getattr(numpy, 'strings', None) or numpy.char
+
+
+def _column_bytes(matrix):
+    """View an (rows, width) uint8 matrix as one S<width> value per row."""
+    width = matrix.shape[1]
+    return numpy.ascontiguousarray(matrix).view('S%d' % width).ravel()
+
+
+def check_integers(matrix, bits):
+    """
+        Validate a column of fixed width integer fields a whole column at
+        a time
+
+    Args:
+        matrix (numpy.ndarray): (rows, width) uint8 bytes of the column
+        bits (int): Size of the column's signed integer type
+    Returns:
+        tuple: (blank, bad) boolean arrays; blank fields are NULL, and bad
+            ones need checking one at a time, since they are either
+            invalid or too long to parse here
+    """
+    rows = matrix.shape[0]
+    value = numpy.zeros(rows, dtype=numpy.int64)
+    digits = numpy.zeros(rows, dtype=numpy.int64)
+    started = numpy.zeros(rows, dtype=bool)
+    ended = numpy.zeros(rows, dtype=bool)
+    negative = numpy.zeros(rows, dtype=bool)
+    bad = numpy.zeros(rows, dtype=bool)
+
+    # walk the field a character position at a time over every line,
+    # through leading spaces, an optional sign, digits and trailing spaces
+    for characters in numpy.ascontiguousarray(matrix.T):
+        space = characters == SPACE
+        number = characters - ZERO
+        digit = number < 10
+        leading = ~started & ~space
+        bad |= ~space & (ended | (started & ~digit) |
+                         (leading & ~digit & (characters != MINUS) &
+                          (characters != PLUS)))
+        negative |= leading & (characters == MINUS)
+        value = numpy.where(digit, value * 10 + number, value)
+        digits += digit
+        ended |= started & space
+        started |= leading
+
+    value = numpy.where(negative, -value, value)
+    bad |= ((digits == 0) | (digits > MAX_VECTOR_DIGITS) |
+            (value < -2 ** (bits - 1)) | (value > 2 ** (bits - 1) - 1))
+    return ~started, bad & started
+
+
+class VectorRowRenderer(object):
+    """
+        Renders blocks of fixed width lines to the COPY text format a
+        column at a time with numpy, for specs made mostly of small
+        numeric fields. A block is viewed as a (lines, line width) array
+        over its bytes; INTEGER columns are parsed and range checked with
+        array arithmetic, BOOLEAN and other typed columns are checked once
+        per distinct value, and the rendered columns are joined into rows
+        in bulk. A line any of them flags is rendered on its own by the
+        BytesRowRenderer, so values are accepted and rejected exactly as
+        on the other paths.
+
+        Blocks where the fast path does not apply, with lines of other
+        widths or bytes which need escaping or decoding, are rendered
+        whole by the BytesRowRenderer. Needs the optional numpy package.
+
+        Attributes:
+        fallback (object): BytesRowRenderer of the specification
+        offsets (list): (start, end) offset of each column within a line
+        record_width (int): Total width of a record, excluding the newline
+        kinds (list): How each column is checked: 'text', 'integer',
+            'boolean' or 'other'
+    """
+
+    def __init__(self, columns):
+        if numpy is None:
+            raise ImportError('numpy is required to vectorize parsing')
+        self.fallback = BytesRowRenderer(columns)
+        self.offsets = self.fallback.slicer.offsets
+        self.record_width = self.fallback.slicer.record_width
+        self.bits = []
+        self.kinds = []
+        for column, converter in zip(columns,
+                                     self.fallback.converter.converters):
+            base_type = get_base_type(column[4])
+            self.bits.append(INTEGER_BITS.get(base_type))
+            if converter is None:
+                self.kinds.append('text')
+            elif base_type in INTEGER_BITS:
+                self.kinds.append('integer')
+            elif base_type in BOOLEAN_TYPES:
+                self.kinds.append('boolean')
+            else:
+                self.kinds.append('other')
+
+    def render_block(self, block, timings=None):
+        """
+            Render a block of whole lines, as BytesRowRenderer.render_block
+            does
+
+        Args:
+            block (bytes): Lines of the data file, newlines included
+            timings (dict): When given, the seconds spent are added to its
+                'slice' and 'convert' entries
+        Returns:
+            tuple: (COPY text as bytes, row count, line count, list of
+                (line index, reason, line) for the lines which were
+                rejected)
+        """
+        start = time.time()
+        matrix = self._get_matrix(block)
+        if matrix is None:
+            return self.fallback.render_block(block, timings)
+        line_count = matrix.shape[0]
+        sliced_at = time.time()
+
+        strings = _strings()
+        bad = numpy.zeros(line_count, dtype=bool)
+        fields = []
+        for index, (begin, end) in enumerate(self.offsets):
+            column, column_bad = self._render_column(
+                matrix[:, begin:end], index, strings)
+            bad |= column_bad
+            fields.append(column.view(numpy.uint8).reshape(line_count, -1))
+
+        # lay the fields out tab separated in one array, padded with the
+        # NULs of their S dtypes, then drop the padding in one pass
+        width = sum(field.shape[1] + 1 for field in fields)
+        rendered = numpy.zeros((line_count, width), dtype=numpy.uint8)
+        position = 0
+        for field in fields:
+            rendered[:, position:position + field.shape[1]] = field
+            position += field.shape[1]
+            rendered[:, position] = TAB
+            position += 1
+        rendered[:, -1] = NEWLINE
+        rendered[bad] = 0
+        kept = rendered != 0
+        text = rendered[kept].tobytes()
+
+        row_count = line_count
+        errors = []
+        if bad.any():
+            ends = numpy.cumsum(kept.sum(axis=1)).tolist()
+            pieces = []
+            done = 0
+            for index in numpy.flatnonzero(bad).tolist():
+                pieces.append(text[done:ends[index]])
+                done = ends[index]
+                line = self._render_line(block, index, errors)
+                if line is None:
+                    row_count -= 1
+                else:
+                    pieces.append(line)
+            pieces.append(text[done:])
+            text = b''.join(pieces)
+
+        if timings is not None:
+            timings['slice'] += sliced_at - start
+            timings['convert'] += time.time() - sliced_at
+        return text, row_count, line_count, errors
+
+    def _get_matrix(self, block):
+        """View block as a (lines, line width) uint8 array, or return None
+        if its lines are not all record_width long or hold bytes which
+        need escaping or decoding."""
+        if not block.endswith(b'\n'):
+            block += b'\n'
+        line_width = self.record_width + 1
+        if len(block) % line_width:
+            return None
+        matrix = numpy.frombuffer(block, dtype=numpy.uint8).reshape(
+            -1, line_width)
+        records = matrix[:, :self.record_width]
+        if ((matrix[:, self.record_width] != NEWLINE).any() or
+                (records < SPACE).any() or (records > 126).any() or
+                (records == BACKSLASH).any()):
+            return None
+        return records
+
+    def _render_column(self, matrix, index, strings):
+        """Return the COPY text of one column's values, as an S array, and
+        which lines it flags."""
+        values = strings.strip(_column_bytes(matrix), b' ')
+        kind = self.kinds[index]
+        if kind == 'text':
+            return values, numpy.zeros(len(values), dtype=bool)
+
+        if kind == 'integer':
+            blank, bad = check_integers(matrix, self.bits[index])
+        else:
+            blank = values == b''
+            values, bad = self._check_distinct(values, index)
+        return numpy.where(blank, NULL_VALUE, values), bad
+
+    def _check_distinct(self, values, index):
+        """
+            Check each distinct value of a column once, the way
+            BytesRowRenderer would, flagging the lines whose value it
+            refuses. Boolean values are rendered as t or f.
+        """
+        converter = self.fallback.converter.converters[index]
+        boolean = self.kinds[index] == 'boolean'
+        distinct, inverse = numpy.unique(values, return_inverse=True)
+        refused = numpy.zeros(len(distinct), dtype=bool)
+        rendered = distinct.copy() if not boolean else numpy.zeros(
+            len(distinct), dtype='S1')
+        for position, value in enumerate(distinct.tolist()):
+            if not value:
+                continue
+            if boolean:
+                lowered = value.lower()
+                if lowered in TRUE_BYTES:
+                    rendered[position] = b't'
+                elif lowered in FALSE_BYTES:
+                    rendered[position] = b'f'
+                else:
+                    refused[position] = True
+                continue
+            try:
+                converter(value.decode('ascii'))
+            except ValueError:
+                refused[position] = True
+        inverse = inverse.ravel()
+        return rendered[inverse], refused[inverse]
+
+    def _render_line(self, block, index, errors):
+        """Render one flagged line with the BytesRowRenderer, recording
+        its error if it is rejected."""
+        line_width = self.record_width + 1
+        line = block[index * line_width:(index + 1) * line_width]
+        text, row_count, _, line_errors = self.fallback.render_block(line)
+        for _, reason, rejected in line_errors:
+            errors.append((index, reason, rejected))
+        if row_count:
+            return text
+        return None
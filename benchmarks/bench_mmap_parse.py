@@ -0,0 +1,114 @@
+"""
+    Benchmark of the memory mapped bytes parse path against the decoded
+    line loop DataFormat uses by default: both read, slice, validate and
+    render a synthetic file in the COPY format, without a database.
+    With --load both are also timed loading the file end to end into a
+    throwaway testing.postgresql database.
+
+    Run from the project root:
+        python -m benchmarks.bench_mmap_parse --columns 40 --lines 500000
+"""
+from benchmarks.generators import make_spec_columns
+from benchmarks.generators import make_spec_lines
+from benchmarks.generators import write_data_file
+from CopyStream import BytesCopyStream
+from CopyStream import CopyStream
+from DataFormat import DataFormat
+from Specification import Specification
+
+import argparse
+import os
+import tempfile
+import time
+
+# size of the reads made from the COPY streams, as psycopg2 does
+COPY_READ_SIZE = 8192
+
+
+def drain(stream):
+    while stream.read(COPY_READ_SIZE):
+        pass
+    return stream.rows_written
+
+
+def parse_decoded(spec, path_to_file):
+    data_format = DataFormat(spec, None, path_to_file, write_rejects=False)
+    return drain(CopyStream(data_format._get_converted_rows()))
+
+
+def parse_mapped(spec, path_to_file):
+    data_format = DataFormat(spec, None, path_to_file, write_rejects=False)
+    return drain(BytesCopyStream(data_format._get_mapped_chunks()))
+
+
+def load(spec_lines, path_to_file, map_file):
+    import psycopg2
+    import testing.postgresql
+    from create_tables import create_tables
+    from FilesDBWrapper import FilesDBWrapper
+
+    postgresql = testing.postgresql.Postgresql()
+    try:
+        create_tables(postgresql.dsn())
+        db = FilesDBWrapper(test=True)
+        db._connection = psycopg2.connect(**postgresql.dsn())
+        spec_name = os.path.basename(path_to_file).rsplit('_', 1)[0]
+        Specification(spec_name, db).process_specification(spec_lines)
+
+        data_format = DataFormat(Specification(spec_name, db), db,
+                                 path_to_file, write_rejects=False,
+                                 map_file=map_file)
+        data_format.process_data_format()
+        return data_format.rows_loaded
+    finally:
+        postgresql.stop()
+
+
+def report(name, seconds, rows, megabytes):
+    print('%-16s %8.3fs  %10.0f lines/s  %7.1f MB/s' % (
+        name, seconds, rows / seconds, megabytes / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--types', default='TEXT,INTEGER,BOOLEAN',
+                        help='Column types to generate')
+    parser.add_argument('--load', action='store_true',
+                        help='Also time end to end loads into postgres')
+    args = parser.parse_args()
+
+    columns = make_spec_columns(args.columns, args.types.split(','))
+    spec = Specification('bench_mmap', None)
+    spec.columns = columns
+
+    directory = tempfile.mkdtemp()
+    path_to_file = os.path.join(directory, 'bench_mmap_2015-06-28.txt')
+    try:
+        size = write_data_file(path_to_file, columns, args.lines)
+        megabytes = size / (1024.0 * 1024.0)
+        print('%s lines, %s columns, %.1f MB' % (args.lines, args.columns,
+                                                 megabytes))
+
+        runs = [('decoded lines', lambda: parse_decoded(spec, path_to_file)),
+                ('mmap bytes', lambda: parse_mapped(spec, path_to_file))]
+        if args.load:
+            spec_lines = make_spec_lines(columns)
+            runs += [('load decoded',
+                      lambda: load(spec_lines, path_to_file, False)),
+                     ('load mmap',
+                      lambda: load(spec_lines, path_to_file, True))]
+
+        for name, run in runs:
+            start = time.time()
+            rows = run()
+            report(name, time.time() - start, rows, megabytes)
+    finally:
+        for file_name in os.listdir(directory):
+            os.remove(os.path.join(directory, file_name))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+    Scaling benchmark for parsing one large data file in parallel byte
+    ranges: throughput of ParallelParser.render_file against the number of
+    worker processes, next to the single process parse.
+
+    Run from the project root:
+        python -m benchmarks.bench_parallel_parse --lines 500000
+"""
+from benchmarks.bench_row_slicer import make_columns
+from benchmarks.bench_row_slicer import make_lines
+from CopyStream import CopyStream
+from DataFileReader import read_lines
+from ParallelParser import render_file
+from RowSlicer import RowSlicer
+
+import argparse
+import os
+import tempfile
+import time
+
+
+def parse_sequentially(path_to_file, columns):
+    slicer = RowSlicer.from_columns(columns)
+    stream = CopyStream(slicer.slice(line)
+                        for line in read_lines(path_to_file))
+    while stream.read(65536):
+        pass
+    return stream.rows_written
+
+
+def parse_in_parallel(path_to_file, columns, workers, chunk_size):
+    rows = 0
+    for _, row_count, _, _, _ in render_file(path_to_file, columns,
+                                             workers, chunk_size):
+        rows += row_count
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--chunk-size', type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    columns = make_columns(args.columns)
+    # repeat a block of generated lines, generating every line is slow
+    block = make_lines(columns, min(args.lines, 10000))
+
+    handle, path_to_file = tempfile.mkstemp(suffix='.txt')
+    try:
+        with os.fdopen(handle, 'w') as f:
+            for index in range(args.lines):
+                f.write(block[index % len(block)])
+        megabytes = os.path.getsize(path_to_file) / (1024.0 * 1024.0)
+        print('%s lines, %.1f MB' % (args.lines, megabytes))
+
+        start = time.time()
+        rows = parse_sequentially(path_to_file, columns)
+        elapsed = time.time() - start
+        print('%-12s %8.3fs  %10.0f lines/s  %7.1f MB/s' % (
+            'sequential', elapsed, rows / elapsed, megabytes / elapsed))
+
+        for workers in [int(w) for w in args.workers.split(',')]:
+            start = time.time()
+            rows = parse_in_parallel(path_to_file, columns, workers,
+                                     args.chunk_size)
+            elapsed = time.time() - start
+            print('%-12s %8.3fs  %10.0f lines/s  %7.1f MB/s' % (
+                '%s workers' % workers, elapsed, rows / elapsed,
+                megabytes / elapsed))
+    finally:
+        os.remove(path_to_file)
+
+
+if __name__ == '__main__':
+    main()
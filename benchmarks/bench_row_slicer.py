@@ -0,0 +1,74 @@
+"""
+    Microbenchmark comparing the per-line column walk that DataFormat used
+    to do with the precompiled RowSlicer.
+
+    Run from the project root:
+        python -m benchmarks.bench_row_slicer --columns 120 --lines 20000
+"""
+from RowSlicer import RowSlicer
+
+import argparse
+import random
+import string
+import timeit
+
+
+def make_columns(column_count, seed=0):
+    rng = random.Random(seed)
+    return [(c, 1, 'column_%s' % c, rng.randint(1, 12), 'TEXT')
+            for c in range(column_count)]
+
+
+def make_lines(columns, line_count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(line_count):
+        fields = [''.join(rng.choice(string.ascii_letters)
+                          for _ in range(rng.randint(0, column[3]))
+                          ).ljust(column[3]) for column in columns]
+        lines.append(''.join(fields) + '\n')
+    return lines
+
+
+def slice_with_column_walk(columns, lines):
+    rows = []
+    for line in lines:
+        values = []
+        index = 0
+        for c in range(len(columns)):
+            width = columns[c][3] + index
+            value = line[index:width]
+            values.append(value.strip())
+            index = width
+        rows.append(values)
+    return rows
+
+
+def slice_with_row_slicer(columns, lines):
+    slicer = RowSlicer.from_columns(columns)
+    return [slicer.slice(line) for line in lines]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--columns', type=int, default=120)
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = make_columns(args.columns)
+    lines = make_lines(columns, args.lines)
+
+    assert (slice_with_column_walk(columns, lines) ==
+            slice_with_row_slicer(columns, lines))
+
+    for name, func in (('column walk', slice_with_column_walk),
+                       ('row slicer', slice_with_row_slicer)):
+        best = min(timeit.repeat(lambda: func(columns, lines),
+                                 number=1, repeat=args.repeat))
+        print('%-12s %8.3fs  %10.0f lines/s' % (name, best,
+                                                args.lines / best))
+
+
+if __name__ == '__main__':
+    main()
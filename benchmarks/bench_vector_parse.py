@@ -0,0 +1,71 @@
+"""
+    Benchmark of the numpy column at a time parse path on numeric heavy
+    specs, against the row at a time loop DataFormat loads files with by
+    default and the memory mapped bytes path. Each reads, slices,
+    validates and renders a synthetic file in the COPY format, without a
+    database.
+
+    Run from the project root:
+        python -m benchmarks.bench_vector_parse --columns 40 --lines 500000
+        python -m benchmarks.bench_vector_parse --types INTEGER,BOOLEAN,TEXT
+"""
+from benchmarks.bench_mmap_parse import drain
+from benchmarks.bench_mmap_parse import parse_decoded
+from benchmarks.bench_mmap_parse import parse_mapped
+from benchmarks.bench_mmap_parse import report
+from benchmarks.generators import make_spec_columns
+from benchmarks.generators import write_data_file
+from CopyStream import BytesCopyStream
+from DataFormat import DataFormat
+from Specification import Specification
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+
+def parse_vectorized(spec, path_to_file):
+    data_format = DataFormat(spec, None, path_to_file, write_rejects=False,
+                             vectorize=True)
+    return drain(BytesCopyStream(data_format._get_mapped_chunks()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--types', default='INTEGER,BOOLEAN',
+                        help='Column types to generate')
+    args = parser.parse_args()
+
+    columns = make_spec_columns(args.columns, args.types.split(','))
+    spec = Specification('bench_vector', None)
+    spec.columns = columns
+
+    directory = tempfile.mkdtemp()
+    path_to_file = os.path.join(directory, 'bench_vector_2015-06-28.txt')
+    try:
+        size = write_data_file(path_to_file, columns, args.lines)
+        megabytes = size / (1024.0 * 1024.0)
+        print('%s lines, %s columns of %s, %.1f MB' % (
+            args.lines, args.columns, args.types, megabytes))
+
+        runs = [('row at a time', parse_decoded),
+                ('mmap bytes', parse_mapped),
+                ('vectorized', parse_vectorized)]
+        baseline = None
+        for name, run in runs:
+            start = time.time()
+            rows = run(spec, path_to_file)
+            seconds = time.time() - start
+            report(name, seconds, rows, megabytes)
+            baseline = baseline or seconds
+            print('%-16s %8.1fx' % ('', baseline / seconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
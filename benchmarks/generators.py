@@ -0,0 +1,112 @@
+"""
+    Generators of synthetic specifications and fixed width data files for
+    the benchmarks. Everything is seeded, so the same arguments always
+    produce the same spec and the same file.
+"""
+import datetime
+import random
+import string
+
+# column_data_type to the range of widths generated for it
+COLUMN_TYPES = (('TEXT', 1, 20), ('INTEGER', 4, 10), ('BOOLEAN', 1, 1),
+                ('DATE', 10, 10), ('NUMERIC', 6, 12))
+
+SPEC_HEADER = '"column name",width,datatype'
+
+# number of distinct lines generated before a data file repeats them;
+# generating every line of a 10M line file would take longer than loading it
+BLOCK_LINES = 10000
+
+
+def make_spec_columns(column_count, types=None, seed=0):
+    """
+        Build the column tuples of a synthetic specification, in the
+        shape Specification.load returns them
+
+    Args:
+        column_count (int): Number of columns
+        types (list): column_data_type names to draw from, defaults to
+            every type in COLUMN_TYPES
+        seed (int): Random seed
+    Returns:
+        list of (column_id, spec_id, name, width, data_type) tuples
+    """
+    rng = random.Random(seed)
+    choices = [column_type for column_type in COLUMN_TYPES
+               if types is None or column_type[0] in types]
+    columns = []
+    for index in range(column_count):
+        data_type, low, high = rng.choice(choices)
+        columns.append((index + 1, 1, 'column_%s' % index,
+                        rng.randint(low, high), data_type))
+    return columns
+
+
+def make_spec_lines(columns):
+    """
+        Render columns as the lines of a specification csv file, ready for
+        Specification.process_specification
+    """
+    return [SPEC_HEADER] + ['%s,%s,%s' % (column[2], column[3], column[4])
+                            for column in columns]
+
+
+def write_spec_file(path_to_file, columns):
+    with open(path_to_file, 'w') as f:
+        for line in make_spec_lines(columns):
+            f.write(line + '\n')
+
+
+def make_value(rng, data_type, width):
+    if data_type == 'INTEGER':
+        return str(rng.randint(-10 ** min(width - 1, 9) + 1,
+                               10 ** min(width - 1, 9) - 1))
+    if data_type == 'BOOLEAN':
+        return rng.choice('01')
+    if data_type == 'DATE':
+        day = datetime.date(2015, 1, 1) + datetime.timedelta(
+            rng.randint(0, 3650))
+        return day.isoformat()
+    if data_type == 'NUMERIC':
+        digits = width - 3
+        return '%d.%02d' % (rng.randint(0, 10 ** digits - 1),
+                            rng.randint(0, 99))
+    return ''.join(rng.choice(string.ascii_letters)
+                   for _ in range(rng.randint(0, width)))
+
+
+def make_data_lines(columns, line_count, seed=0):
+    """
+        Generate fixed width data lines matching the columns, every field
+        padded to its column width
+
+    Returns:
+        list of lines, newline included
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(line_count):
+        fields = [make_value(rng, column[4], column[3]).ljust(column[3])
+                  for column in columns]
+        lines.append(''.join(fields) + '\n')
+    return lines
+
+
+def write_data_file(path_to_file, columns, line_count, seed=0):
+    """
+        Write a data file of line_count lines for the columns, repeating
+        a block of BLOCK_LINES generated lines so files of millions of lines
+        are quick to produce
+
+    Returns:
+        size of the file in bytes
+    """
+    block = make_data_lines(columns, min(line_count, BLOCK_LINES), seed)
+    size = 0
+    with open(path_to_file, 'w') as f:
+        for start in range(0, line_count, len(block)):
+            lines = block[:line_count - start]
+            text = ''.join(lines)
+            f.write(text)
+            size += len(text)
+    return size
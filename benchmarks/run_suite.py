@@ -0,0 +1,241 @@
+"""
+    Benchmark suite over synthetic specs and data files, writing its
+    results as JSON so runs can be compared.
+
+    Suites:
+        spec     registering a specification of each column count
+        slice    slicing and converting lines with parse_batch
+        load     loading a data file end to end with DataFormat into a
+                 throwaway testing.postgresql instance
+
+    Run from the project root:
+        python -m benchmarks.run_suite --lines 1000,100000 \\
+            --columns 10,100 --output results.json
+        python -m benchmarks.run_suite --compare results.json
+"""
+from BatchParser import parse_batch
+from benchmarks.generators import make_data_lines
+from benchmarks.generators import make_spec_columns
+from benchmarks.generators import make_spec_lines
+from benchmarks.generators import write_data_file
+from create_tables import create_tables
+from DataFormat import DataFormat
+from FilesDBWrapper import FilesDBWrapper
+from RowSlicer import RowSlicer
+from Specification import Specification
+from ValueConverter import RowConverter
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import psycopg2
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SUITES = ('spec', 'slice', 'load')
+
+# a rate this much below the compared run is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def best_of(repeat, func):
+    """Run func repeat times and return the fastest time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def connect(postgresql):
+    db = FilesDBWrapper(test=True)
+    db._connection = psycopg2.connect(**postgresql.dsn())
+    return db
+
+
+def bench_spec(postgresql, column_counts, repeat):
+    db = connect(postgresql)
+    results = []
+    for column_count in column_counts:
+        lines = make_spec_lines(make_spec_columns(column_count))
+        names = iter('bench_spec_%s_%s' % (column_count, index)
+                     for index in range(repeat))
+
+        def register():
+            Specification(next(names), db).process_specification(lines)
+
+        seconds = best_of(repeat, register)
+        results.append({'suite': 'spec',
+                        'params': {'columns': column_count},
+                        'seconds': seconds,
+                        'rate': column_count / seconds,
+                        'unit': 'columns/s'})
+    return results
+
+
+def bench_slice(column_counts, line_counts, repeat):
+    results = []
+    for column_count in column_counts:
+        columns = make_spec_columns(column_count)
+        slicer = RowSlicer.from_columns(columns)
+        converter = RowConverter(columns)
+        for line_count in line_counts:
+            lines = make_data_lines(columns, min(line_count, 100000))
+            seconds = best_of(repeat, lambda: parse_batch(lines, slicer,
+                                                          converter))
+            results.append({'suite': 'slice',
+                            'params': {'columns': column_count,
+                                       'lines': len(lines)},
+                            'seconds': seconds,
+                            'rate': len(lines) / seconds,
+                            'unit': 'lines/s'})
+    return results
+
+
+def bench_load(postgresql, column_counts, line_counts, directory,
+               parse_workers):
+    db = connect(postgresql)
+    results = []
+    for column_count in column_counts:
+        columns = make_spec_columns(column_count)
+        for line_count in line_counts:
+            spec_name = 'bench_load_%s_%s' % (column_count, line_count)
+            Specification(spec_name, db).process_specification(
+                make_spec_lines(columns))
+            path_to_file = os.path.join(directory,
+                                        spec_name + '_2015-06-28.txt')
+            size = write_data_file(path_to_file, columns, line_count)
+
+            data_format = DataFormat(Specification(spec_name, db), db,
+                                     path_to_file,
+                                     parse_workers=parse_workers)
+            start = time.time()
+            data_format.process_data_format()
+            seconds = time.time() - start
+            os.remove(path_to_file)
+
+            results.append({'suite': 'load',
+                            'params': {'columns': column_count,
+                                       'lines': line_count,
+                                       'parse_workers': parse_workers},
+                            'seconds': seconds,
+                            'rate': data_format.rows_loaded / seconds,
+                            'unit': 'rows/s',
+                            'rows_rejected': data_format.rows_rejected,
+                            'megabytes_per_second':
+                                size / (1024.0 * 1024.0) / seconds,
+                            'timings': data_format.timings})
+    return results
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return (result['suite'],
+            tuple(sorted(result['params'].items())))
+
+
+def compare(results, previous_results):
+    """
+        Print the change in rate of every result against a previous run
+        and return the results which regressed by more than
+        REGRESSION_THRESHOLD
+    """
+    previous = dict((result_key(result), result)
+                    for result in previous_results)
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        change = result['rate'] / before['rate'] - 1
+        print('%-6s %-55s %+7.1f%%' % (result['suite'],
+                                       json.dumps(result['params'],
+                                                  sort_keys=True),
+                                       change * 100))
+        if change < -REGRESSION_THRESHOLD:
+            regressions.append(result)
+    return regressions
+
+
+def parse_counts(value):
+    return [int(count) for count in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--suites', default=','.join(SUITES))
+    parser.add_argument('--columns', type=parse_counts, default=[10, 100])
+    parser.add_argument('--lines', type=parse_counts, default=[1000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--parse-workers', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write results to')
+    parser.add_argument('--compare',
+                        help='JSON results of a previous run; exits 1 if '
+                             'any rate regressed by more than %d%%' %
+                             (REGRESSION_THRESHOLD * 100))
+    args = parser.parse_args()
+
+    suites = args.suites.split(',')
+    results = []
+    directory = tempfile.mkdtemp()
+    postgresql = None
+    try:
+        if 'slice' in suites:
+            results.extend(bench_slice(args.columns, args.lines,
+                                       args.repeat))
+        if 'spec' in suites or 'load' in suites:
+            import testing.postgresql
+            postgresql = testing.postgresql.Postgresql()
+            create_tables(postgresql.dsn())
+        if 'spec' in suites:
+            results.extend(bench_spec(postgresql, args.columns,
+                                      args.repeat))
+        if 'load' in suites:
+            results.extend(bench_load(postgresql, args.columns, args.lines,
+                                      directory, args.parse_workers))
+    finally:
+        if postgresql is not None:
+            postgresql.stop()
+        shutil.rmtree(directory)
+
+    for result in results:
+        print('%-6s %-55s %8.3fs %12.0f %s' % (
+            result['suite'], json.dumps(result['params'], sort_keys=True),
+            result['seconds'], result['rate'], result['unit']))
+
+    run = {'created': datetime.datetime.utcnow().isoformat() + 'Z',
+           'revision': get_revision(),
+           'python': platform.python_version(),
+           'platform': platform.platform(),
+           'arguments': vars(args),
+           'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous_run = json.load(f)
+        if compare(results, previous_run['results']):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,3 +26,39 @@ def get_postgres_config(filename='database.ini', section='postgresql'):
             section, filename))
 
     return postgres_config
+
+
+INGEST_DEFAULTS = {'workers': '4', 'pool_kind': 'thread',
+                   'report_interval': '60', 'parse_workers': '0',
+                   'db_pool_min': '1', 'db_pool_max': '0',
+                   'engine': 'pool', 'settle_seconds': '2',
+                   'metrics_port': '0', 'map_files': '0',
+                   'partition_by_date': '0', 'replace_partitions': '0',
+                   'staging_load': '0', 'columnar_dir': '',
+                   'columnar_format': 'parquet',
+                   'columnar_compression': 'zstd', 'vectorize_files': '0',
+                   'tail_files': '0', 'tail_batch_size': '1000'}
+
+
+def get_ingest_config(filename='database.ini', section='ingest'):
+    """
+        Parse the ingestion settings from formatted ini file, falling back
+        to INGEST_DEFAULTS for anything the file does not set
+        Args:
+            filename (str): Name of ini file to parse, defaults to
+                'database.ini'
+            section (str): Section name of file to parse as ingest config,
+                defaults to 'ingest'
+        Returns:
+            ingest_config (dict): param key to param value
+    """
+
+    parser = ConfigParser()
+    parser.read(filename)
+
+    ingest_config = dict(INGEST_DEFAULTS)
+    if parser.has_section(section):
+        for param in parser.items(section):
+            ingest_config[param[0]] = param[1]
+
+    return ingest_config
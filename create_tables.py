@@ -3,41 +3,60 @@ from psycopg2 import connect as psycopg_connect
 from psycopg2 import DatabaseError
 
 
-def create_tables():
+TABLE_COMMANDS = (
+    """
+    CREATE TABLE specification_formats (
+        spec_id SERIAL PRIMARY KEY,
+        spec_name VARCHAR(255) NOT NULL
+    )
+    """,
+    """ CREATE TABLE specification_format_columns (
+            column_id SERIAL PRIMARY KEY,
+            spec_id INTEGER NOT NULL,
+            column_name VARCHAR(255) NOT NULL,
+            column_width INTEGER NOT NULL,
+            column_data_type VARCHAR(255) NOT NULL,
+            FOREIGN KEY (spec_id)
+            REFERENCES specification_formats (spec_id)
+            ON DELETE CASCADE
+            )
+    """,
+    """ CREATE TABLE file_ingest_ledger (
+            file_path VARCHAR(1024) PRIMARY KEY,
+            file_size BIGINT NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            spec_name VARCHAR(255) NOT NULL,
+            status VARCHAR(32) NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            next_line BIGINT NOT NULL DEFAULT 1,
+            row_count BIGINT NOT NULL DEFAULT 0,
+            rows_rejected BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+    """)
+
+
+def create_tables(params=None):
     """ Create tables in the Postgres database necessary
         for the file parser to run
+        Args:
+            params (dict): Connection parameters, defaults to the
+                postgresql section of database.ini
     """
-    commands = (
-        """
-        CREATE TABLE specification_formats (
-            spec_id SERIAL PRIMARY KEY,
-            spec_name VARCHAR(255) NOT NULL
-        )
-        """,
-        """ CREATE TABLE specification_format_columns (
-                column_id SERIAL PRIMARY KEY,
-                spec_id INTEGER NOT NULL,
-                column_name VARCHAR(255) NOT NULL,
-                column_width INTEGER NOT NULL,
-                column_data_type VARCHAR(255) NOT NULL,
-                FOREIGN KEY (spec_id)
-                REFERENCES specification_formats (spec_id)
-                ON DELETE CASCADE
-                )
-        """)
     conn = None
     try:
-        params = get_postgres_config()
+        if params is None:
+            params = get_postgres_config()
         conn = psycopg_connect(**params)
         cur = conn.cursor()
 
-        for command in commands:
+        for command in TABLE_COMMANDS:
             cur.execute(command)
 
         cur.close()
         conn.commit()
     except DatabaseError as error:
-        print error
+        print(error)
     finally:
         if conn is not None:
             conn.close()
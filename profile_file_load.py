@@ -0,0 +1,184 @@
+"""
+    Load a single data file once, optionally under cProfile and/or
+    tracemalloc, to find out where a slow feed spends its time.
+
+    Run from the project root:
+        python profile_file_load.py data/fileformat1_2015-06-28.txt
+        python profile_file_load.py data/fileformat1_2015-06-28.txt \\
+            --profile cpu,memory --output fileformat1 --top 30
+        python profile_file_load.py data/fileformat1_2015-06-28.txt \\
+            --dry-run --spec-file specs/fileformat1.csv
+
+    Without --dry-run the file is loaded into the database on every run,
+    ignoring the ingest ledger, so its rows are appended to its table
+    again each time; profile against a throwaway database or table.
+
+    With --dry-run the file is read, sliced, converted and rendered in the
+    COPY format exactly as for a load, but nothing is written to the
+    database and the specification is read from its csv file, so the
+    parsing cost can be told apart from the database cost.
+"""
+from DataFileHandler import DataFileHandler
+from DataFormat import DataFormat
+from FilesDBWrapper import FilesDBWrapper
+from Metrics import REGISTRY
+from Specification import Specification
+from SpecificationFileHandler import SpecificationFileHandler
+from watchdog.events import FileCreatedEvent
+
+import argparse
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import sys
+import time
+
+LOG = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cpu', 'memory')
+
+
+def dry_run(path_to_file, path_to_spec_file):
+    """
+        Parse a data file as a load would, without a database
+
+    Args:
+        path_to_file (str): Path to the data file
+        path_to_spec_file (str): Path to the specification csv file
+    Returns:
+        the DataFormat of the run, with its row counts and timings
+    """
+    spec_name = DataFileHandler.parse_file_name(path_to_file)[0]
+    spec = Specification(spec_name, None)
+    spec.load_from_lines(
+        SpecificationFileHandler(None).read_file(path_to_spec_file))
+
+    # a dry run leaves the reject file of the real load alone, and only
+    # logs the lines it would reject
+    data_format = DataFormat(spec, None, path_to_file, write_rejects=False)
+    data_format.render()
+    return data_format
+
+
+def load(path_to_file, path_to_spec_file=None):
+    """
+        Load a data file with DataFileHandler.process, registering its
+        specification first when a csv file is given. The handler logs the
+        load's rows/sec and phase timings. The ingest ledger is not used,
+        so every run appends the file's rows to its table again.
+    """
+    db = FilesDBWrapper()
+    if path_to_spec_file:
+        SpecificationFileHandler(db).process_file(path_to_spec_file)
+    DataFileHandler(db).process(FileCreatedEvent(path_to_file))
+
+
+def run_profiled(func, modes, output, top):
+    """
+        Run func under the requested profilers, writing each profile to a
+        file named after output and printing its top entries
+
+    Args:
+        func (callable): Work to profile
+        modes (list): Any of PROFILE_MODES
+        output (str): Prefix of the profile files, ex. 'fileformat1' for
+            fileformat1.prof and fileformat1.tracemalloc
+        top (int): Number of functions and lines listed in the summaries
+    Returns:
+        the return value of func
+    """
+    profiler = None
+    if 'memory' in modes:
+        import tracemalloc
+        tracemalloc.start(25)
+    if 'cpu' in modes:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        result = func()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if 'memory' in modes:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    if profiler is not None:
+        profiler.dump_stats(output + '.prof')
+        stats = pstats.Stats(profiler, stream=sys.stdout)
+        print('Top %s functions by own time (%s.prof):' % (top, output))
+        stats.sort_stats('tottime').print_stats(top)
+        print('Top %s functions by cumulative time:' % top)
+        stats.sort_stats('cumulative').print_stats(top)
+
+    if 'memory' in modes:
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)])
+        snapshot.dump(output + '.tracemalloc')
+        print('Peak traced memory %.1f MB; top %s allocation sites '
+              '(%s.tracemalloc):' % (peak / (1024.0 * 1024.0), top, output))
+        for statistic in snapshot.statistics('lineno')[:top]:
+            print(statistic)
+
+    return result
+
+
+def print_summary(data_format, seconds):
+    summary = data_format.summary()
+    print('%s: %s rows, %s rejected, %s bytes in %.3fs' % (
+        summary['path_to_file'], summary['rows_loaded'],
+        summary['rows_rejected'], summary['bytes_read'], seconds))
+    for phase, phase_seconds in sorted(summary['timings'].items()):
+        print('  %-8s %8.3fs' % (phase, phase_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('path_to_file', help='Data file to load')
+    parser.add_argument('--spec-file',
+                        help='Specification csv file, defaults to '
+                             'specs/<spec name>.csv for a dry run')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Parse the file without writing to the '
+                             'database')
+    parser.add_argument('--profile', default='',
+                        help='Comma separated profilers to run: cpu, '
+                             'memory')
+    parser.add_argument('--output', default='profile',
+                        help='Prefix of the profile files written')
+    parser.add_argument('--top', type=int, default=20,
+                        help='Number of entries in the profile summaries')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    modes = [mode for mode in args.profile.split(',') if mode]
+    for mode in modes:
+        if mode not in PROFILE_MODES:
+            parser.error('Unknown profile mode %s' % mode)
+
+    if args.dry_run:
+        spec_file = args.spec_file or os.path.join(
+            'specs', DataFileHandler.parse_file_name(args.path_to_file)[0] +
+            '.csv')
+        work = functools.partial(dry_run, args.path_to_file, spec_file)
+    else:
+        work = functools.partial(load, args.path_to_file, args.spec_file)
+
+    start = time.time()
+    result = run_profiled(work, modes, args.output, args.top)
+    seconds = time.time() - start
+
+    if result is not None:
+        print_summary(result, seconds)
+    else:
+        print('%s processed in %.3fs: %s' % (args.path_to_file, seconds,
+                                             REGISTRY.summary_line()))
+
+
+if __name__ == '__main__':
+    main()
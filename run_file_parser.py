@@ -1,8 +1,20 @@
+from Backfill import backfill
+from Backfill import find_new_data_files
+from Backfill import find_new_spec_files
+from ColumnarSink import ColumnarSink
+from config import get_ingest_config
+from config import get_postgres_config
 from DataFileHandler import DataFileHandler
+from FileEventStabilizer import FileEventStabilizer
 from FilesDBWrapper import FilesDBWrapper
+from IngestPool import IngestPool
+from Metrics import MetricsServer
+from Metrics import REGISTRY
+from SpecificationCache import SpecificationCache
 from SpecificationFileHandler import SpecificationFileHandler
 from watchdog.observers import Observer
 
+import functools
 import time
 import logging
 
@@ -11,22 +23,134 @@ logging.basicConfig(level=logging.INFO)
 
 if __name__ == '__main__':
 
-    filesDB = FilesDBWrapper()
+    ingest_config = get_ingest_config()
+    workers = int(ingest_config['workers'])
+    report_interval = int(ingest_config['report_interval'])
+    parse_workers = int(ingest_config['parse_workers'])
+    db_pool_max = int(ingest_config['db_pool_max'])
+    settle_seconds = float(ingest_config['settle_seconds'])
+    metrics_port = int(ingest_config['metrics_port'])
+    enabled = ('1', 'true', 'yes', 'on')
+    load_options = dict(
+        (option, ingest_config[option] in enabled)
+        for option in ('map_files', 'partition_by_date',
+                       'replace_partitions', 'staging_load',
+                       'vectorize_files', 'tail_files'))
+    load_options['tail_batch_size'] = int(ingest_config['tail_batch_size'])
 
+    # the asyncio engine loads each file whole into its spec's table, so
+    # it cannot honour the options which change how or where a file loads
+    if ingest_config['engine'] == 'asyncio':
+        unsupported = [option for option in sorted(load_options)
+                       if load_options[option] is True]
+        if ingest_config['columnar_dir']:
+            unsupported.append('columnar_dir')
+        if parse_workers > 1:
+            unsupported.append('parse_workers')
+        if unsupported:
+            raise Exception('engine=asyncio does not support {0}; unset '
+                            'them or use engine=pool'.format(
+                                ', '.join(unsupported)))
+
+    # with columnar_dir set, every data file is also written to a parquet
+    # or arrow file there, in the same pass as its load
+    if ingest_config['columnar_dir']:
+        load_options['sink_factory'] = functools.partial(
+            ColumnarSink, ingest_config['columnar_dir'],
+            ingest_config['columnar_format'],
+            ingest_config['columnar_compression'] or None)
+
+    # with db_pool_max set, the handlers share one pool of connections
+    # rather than one connection
+    filesDB = FilesDBWrapper(min_connections=int(ingest_config['db_pool_min']),
+                             max_connections=db_pool_max)
+    spec_cache = SpecificationCache()
+
+    # data files are loaded by the pool's workers, each with its own
+    # connection, or by the asyncio engine; with no workers they load on
+    # the observer thread
+    pool = None
+    if ingest_config['engine'] == 'asyncio':
+        from AsyncIngestEngine import AsyncIngestEngine
+        pool = AsyncIngestEngine(get_postgres_config(), max(workers, 1),
+                                 spec_cache=spec_cache)
+        pool.start()
+    elif workers > 0:
+        handler_factory = functools.partial(DataFileHandler,
+                                            parse_workers=parse_workers,
+                                            track_ingest=True,
+                                            **load_options)
+        if db_pool_max and ingest_config['pool_kind'] == 'thread':
+            def db_factory():
+                return filesDB
+        else:
+            db_factory = FilesDBWrapper
+        pool = IngestPool(workers, ingest_config['pool_kind'],
+                          db_factory=db_factory,
+                          handler_factory=handler_factory,
+                          spec_cache=spec_cache)
+        pool.start()
+
+    REGISTRY.register_gauge('spec_cache_hit_rate', spec_cache.hit_rate)
+    if pool:
+        REGISTRY.register_gauge('queue_depth', pool.queue_depth)
+
+    # with metrics_port set, the metrics are also served for prometheus
+    metrics_server = None
+    if metrics_port:
+        metrics_server = MetricsServer(REGISTRY, metrics_port)
+        metrics_server.start()
+
+    spec_handler = SpecificationFileHandler(filesDB, spec_cache)
+    data_handler = DataFileHandler(filesDB, spec_cache, pool=pool,
+                                   parse_workers=parse_workers,
+                                   track_ingest=True, **load_options)
+
+    # files are only handed to the handlers once they are fully written
+    spec_stabilizer = FileEventStabilizer(spec_handler, settle_seconds)
+    data_stabilizer = FileEventStabilizer(data_handler, settle_seconds)
+    spec_stabilizer.start()
+    data_stabilizer.start()
+
+    # catch up on files which landed while the parser was down, specs
+    # first. Each observer starts before its directory is listed, so a
+    # file landing in between is not missed; it may then be both
+    # backfilled and seen by the observer, and the second one skips it,
+    # as the spec is registered or the ledger has the file
     spec_observer = Observer()
-    spec_observer.schedule(SpecificationFileHandler(filesDB), path='specs')
+    spec_observer.schedule(spec_stabilizer, path='specs')
     spec_observer.start()
 
+    backfill(spec_handler, find_new_spec_files(spec_handler))
+
     data_observer = Observer()
-    data_observer.schedule(DataFileHandler(filesDB), path='data')
+    # with tail_files, growing data files are loaded as they are appended
+    # to rather than once they settle; compressed files, which cannot be
+    # followed, still wait for the stabilizer, which also picks up any
+    # lines of a tailed file whose last change was missed
+    if load_options['tail_files']:
+        data_observer.schedule(data_handler, path='data')
+    data_observer.schedule(data_stabilizer, path='data')
     data_observer.start()
 
+    backfill(data_handler, find_new_data_files(data_handler))
+
     try:
+        last_report = time.time()
         while True:
             time.sleep(1)
+            if time.time() - last_report >= report_interval:
+                LOG.info('Ingest metrics: %s', REGISTRY.summary_line())
+                last_report = time.time()
     except KeyboardInterrupt:
         spec_observer.stop()
         data_observer.stop()
 
     spec_observer.join()
     data_observer.join()
+    spec_stabilizer.stop()
+    data_stabilizer.stop()
+    if pool:
+        pool.stop()
+    if metrics_server:
+        metrics_server.stop()
@@ -0,0 +1,198 @@
+from create_tables import create_tables
+from DataFormat import DataFormat
+from FilesDBWrapper import FilesDBWrapper
+from IngestLedger import IngestLedger
+from Specification import Specification
+
+import asyncio
+import os
+import psycopg2
+import shutil
+import sys
+import tempfile
+import testing.postgresql
+import unittest
+
+# the engine is written with async/await, which python 2 cannot import
+asyncpg = None
+if sys.version_info >= (3, 5):
+    from AsyncIngestEngine import AsyncIngestEngine
+    from AsyncIngestEngine import asyncpg
+
+
+def handler(postgresql):
+    """
+        Creates the required tables in the test DB
+    """
+    create_tables(postgresql.dsn())
+
+
+# Generates Postgresql class which shares the generated database
+Postgresql = testing.postgresql.PostgresqlFactory(cache_initialized_db=True,
+                                                  on_initialized=handler)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'requires python 3.5')
+@unittest.skipIf(asyncpg is None, 'asyncpg is not available')
+class AsyncIngestEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.postgresql = Postgresql()
+        self.db = FilesDBWrapper(test=True)
+        self.db._connection = psycopg2.connect(**self.postgresql.dsn())
+
+        self.engine = AsyncIngestEngine(self.postgresql.dsn(), 2,
+                                        batch_size=2)
+        self.engine.start()
+
+    def tearDown(self):
+        self.engine.stop()
+        self.postgresql.stop()
+
+    def count_rows(self):
+        return self.db.query_and_get_id('SELECT COUNT(*) FROM fileformat1;')
+
+    def register_spec(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        Specification('fileformat1', self.db).process_specification(lines)
+
+    def test_load_files(self):
+        self.register_spec()
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+
+        self.engine.submit(path_to_file)
+        self.engine.wait()
+        self.engine.submit(path_to_file)
+        self.engine.wait()
+
+        self.assertEqual(self.count_rows(), 3)
+        self.assertEqual(self.engine.queue_depth(), 0)
+        self.assertEqual(self.engine.spec_cache.hits, 1)
+        entry = IngestLedger(self.db).get_entry(path_to_file)
+        self.assertEqual((entry['status'], entry['byte_offset'],
+                          entry['next_line'], entry['row_count']),
+                         ('loaded', os.path.getsize(path_to_file), 4, 3))
+
+    def test_load_text_typed_columns_rejecting_bad_rows(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'seen,19,TIMESTAMP']
+        Specification('fileformat2', self.db).process_specification(lines)
+        directory = tempfile.mkdtemp()
+        path_to_file = os.path.join(directory, 'fileformat2_2015-06-28.txt')
+        with open(path_to_file, 'w') as f:
+            f.write('Foonyor   2015-06-28 10:00:00\n' +
+                    'Quuxitude 2015-06-28 11:00:00\n' +
+                    'Barzane   2015-06-28 12:00:00\n')
+
+        try:
+            self.engine.submit(path_to_file)
+            self.engine.wait()
+            with open(path_to_file + '.rejects') as f:
+                reject_lines = f.read().splitlines()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(self.db.query_all(
+            'SELECT name, seen::text FROM fileformat2 ORDER BY seen;', None),
+            [('Foonyor', '2015-06-28 10:00:00'),
+             ('Barzane', '2015-06-28 12:00:00')])
+        self.assertEqual(len(reject_lines), 1)
+        self.assertTrue(reject_lines[0].startswith('2\t'))
+        entry = IngestLedger(self.db).get_entry(path_to_file)
+        self.assertEqual((entry['row_count'], entry['rows_rejected']),
+                         (2, 1))
+
+    def test_files_waiting_for_table_hold_no_connection(self):
+        self.register_spec()
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        engine = self.engine
+
+        async def hold_table():
+            lock = engine._table_locks.setdefault('fileformat1',
+                                                  asyncio.Lock())
+            await lock.acquire()
+            return lock
+
+        async def acquire_pool():
+            # both workers are now waiting on the table
+            await asyncio.sleep(0.5)
+            connections = [await engine._db_pool.acquire(timeout=2)
+                           for _ in range(engine.concurrency)]
+            for conn in connections:
+                await engine._db_pool.release(conn)
+
+        async def release_table(lock):
+            lock.release()
+
+        lock = engine._call(hold_table())
+        engine.submit(path_to_file)
+        engine.submit(path_to_file)
+        try:
+            engine._call(acquire_pool())
+        finally:
+            engine._call(release_table(lock))
+        engine.wait()
+
+        self.assertEqual(self.count_rows(), 3)
+
+    def test_lost_claim_leaves_reject_file_alone(self):
+        self.register_spec()
+        directory = tempfile.mkdtemp()
+        path_to_file = os.path.join(directory, 'fileformat1_2015-06-28.txt')
+        with open(path_to_file, 'w') as f:
+            f.write('Foonyor   x  1\n')
+        with open(path_to_file + '.rejects', 'w') as f:
+            f.write('1\tother load\tFoonyor   x  1\n')
+        # another load has moved the entry on since this one read it
+        self.db.query('INSERT INTO file_ingest_ledger(file_path, ' +
+                      'file_size, content_hash, spec_name, status, ' +
+                      'byte_offset, next_line, row_count, rows_rejected) ' +
+                      'VALUES (%s, 15, %s, %s, %s, 15, 2, 0, 1);',
+                      (path_to_file, 'hash', 'fileformat1', 'loading'))
+        entry = {'file_size': 15, 'content_hash': 'hash',
+                 'spec_name': 'fileformat1', 'byte_offset': 0,
+                 'next_line': 1, 'row_count': 0, 'rows_rejected': 0}
+        engine = self.engine
+
+        async def copy_file():
+            spec = await engine._load_specification('fileformat1')
+            data_format = DataFormat(spec, None, path_to_file,
+                                     resume_from=entry)
+            async with engine._db_pool.acquire() as conn:
+                await engine._create_table(conn, data_format)
+                return await engine._copy_file(conn, data_format)
+
+        try:
+            claimed = engine._call(copy_file())
+            with open(path_to_file + '.rejects') as f:
+                rejects = f.read()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertFalse(claimed)
+        self.assertEqual(rejects, '1\tother load\tFoonyor   x  1\n')
+
+    def test_unreadable_file_fails_without_hanging(self):
+        self.register_spec()
+        directory = tempfile.mkdtemp()
+        path_to_file = os.path.join(directory, 'fileformat1_2015-06-28.txt')
+        with open(path_to_file, 'wb') as f:
+            f.write(b'Foonyor   1  1\n' * 4 + b'Barzane   \xff-12\n')
+
+        try:
+            self.engine.submit(path_to_file)
+            self.engine.wait()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(self.count_rows(), 0)
+        self.assertIsNone(IngestLedger(self.db).get_entry(path_to_file))
+
+    def test_no_spec(self):
+        self.engine.submit('test/fileformat1_2015-06-28.txt')
+        self.engine.wait()
+
+        self.assertEqual(self.db.query_all(
+            "SELECT 1 FROM pg_class WHERE relname = 'fileformat1';", None),
+            [])
@@ -0,0 +1,71 @@
+from Backfill import backfill
+from Backfill import find_new_data_files
+from Backfill import find_new_spec_files
+from create_tables import create_tables
+from DataFileHandler import DataFileHandler
+from FilesDBWrapper import FilesDBWrapper
+from SpecificationFileHandler import SpecificationFileHandler
+
+import os
+import psycopg2
+import shutil
+import tempfile
+import testing.postgresql
+import unittest
+
+
+def handler(postgresql):
+    """
+        Creates the required tables in the test DB
+    """
+    create_tables(postgresql.dsn())
+
+
+# Generates Postgresql class which shares the generated database
+Postgresql = testing.postgresql.PostgresqlFactory(cache_initialized_db=True,
+                                                  on_initialized=handler)
+
+
+class BackfillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.postgresql = Postgresql()
+        self.db = FilesDBWrapper(test=True)
+        self.db._connection = psycopg2.connect(**self.postgresql.dsn())
+
+        self.directory = tempfile.mkdtemp()
+        self.spec_dir = os.path.join(self.directory, 'specs')
+        self.data_dir = os.path.join(self.directory, 'data')
+        os.mkdir(self.spec_dir)
+        os.mkdir(self.data_dir)
+        shutil.copy('test/fileformat1.csv', self.spec_dir)
+        for day in ('2015-06-28', '2015-06-29'):
+            shutil.copy('test/fileformat1_2015-06-28.txt', os.path.join(
+                self.data_dir, 'fileformat1_%s.txt' % day))
+
+        self.spec_handler = SpecificationFileHandler(self.db)
+        self.data_handler = DataFileHandler(self.db, track_ingest=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.postgresql.stop()
+
+    def test_backfill_loads_files_once(self):
+        spec_files = find_new_spec_files(self.spec_handler, self.spec_dir)
+        self.assertEqual(spec_files,
+                         [os.path.join(self.spec_dir, 'fileformat1.csv')])
+        backfill(self.spec_handler, spec_files)
+        self.assertEqual(
+            find_new_spec_files(self.spec_handler, self.spec_dir), [])
+
+        data_files = find_new_data_files(self.data_handler, self.data_dir)
+        self.assertEqual(len(data_files), 2)
+        self.assertEqual(backfill(self.data_handler, data_files[:1]), 1)
+        # the observer may see a file which was backfilled as well
+        self.data_handler.handle_file(data_files[0])
+
+        self.assertEqual(
+            find_new_data_files(self.data_handler, self.data_dir),
+            data_files[1:])
+        self.assertEqual(self.db.query_and_get_id(
+            'SELECT COUNT(*) FROM fileformat1;'), 3)
@@ -0,0 +1,85 @@
+from BatchParser import parse_batch
+from BytesParser import BytesRowRenderer
+from CopyStream import CopyStream
+from RowSlicer import RowSlicer
+from ValueConverter import RowConverter
+
+import unittest
+
+COLUMNS = [(1, 1, 'name', 10, 'TEXT'), (2, 1, 'valid', 1, 'BOOLEAN'),
+           (3, 1, 'count', 3, 'INTEGER'), (4, 1, 'day', 10, 'DATE')]
+
+
+def render_decoded(block):
+    lines = block.decode('utf-8').splitlines(True)
+    rows, errors = parse_batch(lines, RowSlicer.from_columns(COLUMNS),
+                               RowConverter(COLUMNS))
+    return CopyStream(rows).read().encode('utf-8'), errors
+
+
+class BytesRowRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = BytesRowRenderer(COLUMNS)
+
+    def test_matches_decoded_parse(self):
+        block = (b'Foonyor   1  12015-06-28\n'
+                 b'Barzane   0-122015-06-29\n'
+                 b'Quuxitude 1103          \n')
+
+        text, row_count, line_count, errors = self.renderer.render_block(
+            block)
+
+        self.assertEqual((text, errors), render_decoded(block))
+        self.assertEqual(text, b'Foonyor\tt\t1\t2015-06-28\n'
+                               b'Barzane\tf\t-12\t2015-06-29\n'
+                               b'Quuxitude\tt\t103\t\\N\n')
+        self.assertEqual((row_count, line_count), (3, 3))
+
+    def test_rejects(self):
+        block = (b'Foonyor   x  12015-06-28\n'
+                 b'Barzane   0abc2015-06-29\n'
+                 b'Quuxitude 11032015-06-30 extra\n'
+                 b'Foonyor   1  12015-02-30\n'
+                 b'Foonyor   1  12015-06-28\n')
+
+        text, row_count, line_count, errors = self.renderer.render_block(
+            block)
+
+        self.assertEqual((text, errors), render_decoded(block))
+        self.assertEqual([error[0] for error in errors], [0, 1, 2, 3])
+        self.assertEqual((row_count, line_count), (1, 5))
+
+    def test_rejects_integers_postgres_cannot_read(self):
+        block = (b'Foonyor   11_02015-06-28\n'
+                 b'Barzane   1+122015-06-29\n')
+
+        text, row_count, line_count, errors = self.renderer.render_block(
+            block)
+
+        self.assertEqual(errors, render_decoded(block)[1])
+        self.assertEqual([error[0] for error in errors], [0])
+        self.assertEqual(text, b'Barzane\tt\t+12\t2015-06-29\n')
+
+    def test_escapes_and_crlf(self):
+        block = b'Foo\\bar\tx 1  12015-06-28\r\n'
+
+        text, _, _, errors = self.renderer.render_block(block)
+
+        self.assertEqual((text, errors), render_decoded(block))
+        self.assertEqual(text, b'Foo\\\\bar\\tx\tt\t1\t2015-06-28\n')
+
+    def test_non_ascii_block_is_decoded(self):
+        block = u'F\xf6\xf6nyor   1  12015-06-28\n'.encode('utf-8')
+
+        text, row_count, _, errors = self.renderer.render_block(block)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(row_count, 1)
+        self.assertEqual(text, u'F\xf6\xf6nyor\tt\t1\t2015-06-28\n'.encode(
+            'utf-8'))
+
+    def test_timings(self):
+        timings = {'slice': 0.0, 'convert': 0.0}
+        self.renderer.render_block(b'Foonyor   1  12015-06-28\n', timings)
+        self.assertGreater(timings['slice'], 0)
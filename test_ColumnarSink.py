@@ -0,0 +1,148 @@
+from ColumnarSink import ColumnarSink
+from ColumnarSink import get_arrow_type
+from DataFormat import DataFormat
+from DataFormat import DataFormatException
+from DataSink import DataSinkException
+from decimal import Decimal
+from mock import patch
+from Specification import Specification
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not available')
+class ColumnarSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = Specification('fileformat1', None)
+        self.spec.load_from_lines(['"column name",width,datatype',
+                                   'name,10,TEXT', 'valid,1,BOOLEAN',
+                                   'count,3,INTEGER'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self, sink, path_to_file='test/fileformat1_2015-06-28.txt',
+             spec=None):
+        data_format = DataFormat(spec or self.spec, None, path_to_file,
+                                 write_rejects=False, sinks=[sink])
+        data_format.process_data_format()
+        return data_format
+
+    def test_get_arrow_type(self):
+        self.assertEqual(get_arrow_type('integer'), pyarrow.int32())
+        self.assertEqual(get_arrow_type('BOOLEAN'), pyarrow.bool_())
+        self.assertEqual(get_arrow_type('numeric(10, 2)'),
+                         pyarrow.decimal128(10, 2))
+        self.assertEqual(get_arrow_type('numeric(40, 2)'),
+                         pyarrow.decimal256(40, 2))
+        self.assertEqual(get_arrow_type('NUMERIC(80)'), pyarrow.string())
+        self.assertEqual(get_arrow_type('NUMERIC'), pyarrow.string())
+        self.assertEqual(get_arrow_type('VARCHAR(7)'), pyarrow.string())
+
+    def test_decimals_round_half_up(self):
+        spec = Specification('prices', None)
+        spec.load_from_lines(['"column name",width,datatype',
+                              'price,4,NUMERIC(4)'])
+        path_to_file = os.path.join(self.directory, 'prices_2015-06-28.txt')
+        with open(path_to_file, 'w') as f:
+            f.write('0.5 \n2.5 \n-2.5\n')
+        sink = ColumnarSink(self.directory)
+        self.load(sink, path_to_file, spec)
+
+        self.assertEqual(
+            pyarrow.parquet.read_table(sink.path).column('price').to_pylist(),
+            [Decimal('1'), Decimal('3'), Decimal('-3')])
+
+    def test_write_wide_decimals(self):
+        spec = Specification('prices', None)
+        spec.load_from_lines(['"column name",width,datatype',
+                              'price,40,NUMERIC(40)'])
+        path_to_file = os.path.join(self.directory, 'prices_2015-06-28.txt')
+        with open(path_to_file, 'w') as f:
+            f.write('9' * 40 + '\n')
+        sink = ColumnarSink(self.directory)
+        data_format = self.load(sink, path_to_file, spec)
+
+        self.assertEqual(data_format.rows_loaded, 1)
+        self.assertEqual(
+            pyarrow.parquet.read_table(sink.path).column('price').to_pylist(),
+            [Decimal('9' * 40)])
+
+    def test_unknown_format(self):
+        with self.assertRaises(DataSinkException):
+            ColumnarSink(self.directory, 'csv')
+
+    def test_write_parquet(self):
+        sink = ColumnarSink(self.directory, row_group_size=2)
+        data_format = self.load(sink)
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(sink.path, os.path.join(
+            self.directory, 'fileformat1_2015-06-28.parquet'))
+        self.assertEqual(os.listdir(self.directory),
+                         ['fileformat1_2015-06-28.parquet'])
+
+        parquet_file = pyarrow.parquet.ParquetFile(sink.path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        self.assertEqual(parquet_file.schema_arrow.field('count').type,
+                         pyarrow.int32())
+        self.assertEqual(parquet_file.read().to_pydict(),
+                         {'name': ['Foonyor', 'Barzane', 'Quuxitude'],
+                          'valid': [True, False, True],
+                          'count': [1, -12, 103]})
+
+    def test_write_arrow(self):
+        sink = ColumnarSink(self.directory, 'arrow', 'lz4')
+        self.load(sink)
+
+        with pyarrow.ipc.open_file(sink.path) as reader:
+            table = reader.read_all()
+        self.assertEqual(table.column('count').to_pylist(), [1, -12, 103])
+
+    def test_rows_which_do_not_fit_are_rejected(self):
+        spec = Specification('fileformat1', None)
+        spec.load_from_lines(['"column name",width,datatype',
+                              'name,10,TEXT', 'valid,1,BOOLEAN',
+                              'count,3,NUMERIC(2)'])
+        sink = ColumnarSink(self.directory)
+        data_format = self.load(sink, spec=spec)
+
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 1)
+        self.assertEqual(
+            pyarrow.parquet.read_table(sink.path).column('name').to_pylist(),
+            ['Foonyor', 'Barzane'])
+
+    def test_sink_which_cannot_open_fails_the_load(self):
+        sink = ColumnarSink(os.path.join(self.directory, 'missing'))
+        with self.assertRaises(DataFormatException):
+            self.load(sink)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_missing_pyarrow_fails_the_load(self):
+        sink = ColumnarSink(self.directory)
+        with patch('ColumnarSink.pyarrow', None):
+            with self.assertRaises(DataFormatException):
+                self.load(sink)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failed_load_leaves_no_file(self):
+        sink = ColumnarSink(self.directory)
+        with self.assertRaises(IOError):
+            self.load(sink, 'test/fileformat1_2015-06-30.txt')
+
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,30 @@
+from CopyStream import CopyStream
+
+import unittest
+
+
+class CopyStreamTest(unittest.TestCase):
+
+    def test_read_all(self):
+        stream = CopyStream([['Foonyor', '1', '1'], ['Barzane', '0', '-12']])
+
+        self.assertEqual(stream.read(), 'Foonyor\t1\t1\nBarzane\t0\t-12\n')
+        self.assertEqual(stream.rows_written, 2)
+        self.assertEqual(stream.read(), '')
+
+    def test_read_in_chunks(self):
+        stream = CopyStream([['Foonyor', '1', '1'], ['Barzane', '0', '-12']])
+
+        chunks = []
+        chunk = stream.read(5)
+        while chunk:
+            self.assertTrue(len(chunk) <= 5)
+            chunks.append(chunk)
+            chunk = stream.read(5)
+
+        self.assertEqual(''.join(chunks), 'Foonyor\t1\t1\nBarzane\t0\t-12\n')
+
+    def test_escapes_special_characters_and_nulls(self):
+        stream = CopyStream([['a\tb', 'c\\d', None]])
+
+        self.assertEqual(stream.read(), 'a\\tb\tc\\\\d\t\\N\n')
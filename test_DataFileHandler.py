@@ -0,0 +1,145 @@
+from DataFileHandler import DataFileHandler
+from FilesDBWrapper import FilesDBWrapper
+from IngestLedger import IngestLedger
+from Specification import Specification
+from test_DataFormat import handler
+from watchdog.events import FileCreatedEvent
+from watchdog.events import FileModifiedEvent
+
+import gzip
+import os
+import psycopg2
+import shutil
+import tempfile
+import testing.postgresql
+import unittest
+
+# Generates Postgresql class which shares the generated database
+Postgresql = testing.postgresql.PostgresqlFactory(cache_initialized_db=True,
+                                                  on_initialized=handler)
+
+
+class DataFileHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = DataFileHandler(None)
+
+    def test_parse_file_name(self):
+        self.assertEqual(
+            DataFileHandler.parse_file_name('data/fileformat1_2015-06-28.txt'),
+            ('fileformat1', '2015-06-28.txt'))
+
+    def test_parse_compressed_file_name(self):
+        for extension in ('.gz', '.bz2', '.xz', '.zst'):
+            self.assertEqual(DataFileHandler.parse_file_name(
+                'data/file_format1_2015-06-28.txt' + extension),
+                ('file_format1', '2015-06-28.txt'))
+
+    def test_is_data_file(self):
+        self.assertTrue(self.handler.is_data_file(
+            'data/fileformat1_2015-06-28.txt'))
+        self.assertTrue(self.handler.is_data_file(
+            'data/fileformat1_2015-06-28.txt.zst'))
+        self.assertFalse(self.handler.is_data_file(
+            'data/fileformat1_2015-06-28.txt.gz.rejects'))
+        self.assertFalse(self.handler.is_data_file(
+            'data/fileformat1_2015-06-28.csv.gz'))
+
+    def test_parse_data_date(self):
+        self.assertEqual(DataFileHandler.parse_data_date('2015-06-28.txt'),
+                         '2015-06-28')
+        with self.assertRaises(ValueError):
+            DataFileHandler.parse_data_date('20150628.txt')
+
+
+class TailTest(unittest.TestCase):
+
+    def setUp(self):
+        self.postgresql = Postgresql()
+        self.db = FilesDBWrapper(test=True)
+        self.db._connection = psycopg2.connect(**self.postgresql.dsn())
+        Specification('fileformat1', self.db).process_specification(
+            ['"column name",width,datatype', 'name,10,TEXT',
+             'valid,1,BOOLEAN', 'count,3,INTEGER'])
+
+        self.directory = tempfile.mkdtemp()
+        self.path_to_file = os.path.join(self.directory,
+                                         'fileformat1_2015-06-28.txt')
+        self.handler = DataFileHandler(self.db, tail_files=True,
+                                       tail_batch_size=2)
+        self.ledger = IngestLedger(self.db)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.postgresql.stop()
+
+    def append(self, text):
+        with open(self.path_to_file, 'a') as f:
+            f.write(text)
+        self.handler.process_file(self.path_to_file)
+
+    def count_rows(self):
+        return self.db.count_rows('fileformat1')
+
+    def test_loads_appended_lines_once(self):
+        self.append('Foonyor   1  1\nBarzane   0-12\nQuux')
+        self.assertEqual(self.count_rows(), 2)
+        self.assertEqual(self.ledger.get_entry(
+            self.path_to_file)['byte_offset'], 30)
+
+        self.append('itude 1103\nFoonyor   x  5\nBarzane   0  7\n')
+        self.assertEqual(self.count_rows(), 4)
+
+        self.handler.process_file(self.path_to_file)
+        self.assertEqual(self.count_rows(), 4)
+
+        entry = self.ledger.get_entry(self.path_to_file)
+        self.assertEqual((entry['status'], entry['byte_offset'],
+                          entry['next_line'], entry['row_count'],
+                          entry['rows_rejected']), ('loaded', 75, 6, 4, 1))
+        self.assertEqual(entry['file_size'],
+                         os.path.getsize(self.path_to_file))
+
+    def test_loaded_file_only_loads_appended_lines(self):
+        with open(self.path_to_file, 'w') as f:
+            f.write('Foonyor   1  1\nBarzane   0-12\n')
+        DataFileHandler(self.db, track_ingest=True).process_file(
+            self.path_to_file)
+
+        self.append('Quuxitude 1103\n')
+
+        self.assertEqual(self.count_rows(), 3)
+        entry = self.ledger.get_entry(self.path_to_file)
+        self.assertEqual((entry['byte_offset'], entry['row_count']), (45, 3))
+
+    def test_replaced_file_is_not_loaded_again(self):
+        self.append('Foonyor   1  1\nBarzane   0-12\n')
+        os.remove(self.path_to_file)
+        self.append('Quuxitude 1103\n')
+
+        self.assertEqual(self.count_rows(), 2)
+        entry = self.ledger.get_entry(self.path_to_file)
+        self.assertEqual((entry['byte_offset'], entry['row_count']), (30, 2))
+
+    def test_compressed_file_events_are_left_to_stabilizer(self):
+        path_to_file = self.path_to_file + '.gz'
+        with gzip.open(path_to_file, 'wb') as f:
+            f.write(b'Foonyor   1  1\n')
+
+        self.handler.on_created(FileCreatedEvent(path_to_file))
+        self.handler.on_modified(FileModifiedEvent(path_to_file))
+
+        self.assertIsNone(self.ledger.get_entry(path_to_file))
+        self.handler.handle_file(path_to_file)
+        self.assertEqual(self.count_rows(), 1)
+
+    def test_file_held_by_another_worker_is_left_alone(self):
+        self.append('Foonyor   1  1\n')
+        self.db.query('UPDATE file_ingest_ledger SET status = %s;',
+                      ('loading',))
+
+        self.append('Barzane   0-12\n')
+
+        self.assertEqual(self.count_rows(), 1)
+        self.assertIsNone(self.ledger.begin_tail(self.path_to_file,
+                                                 'fileformat1', 30))
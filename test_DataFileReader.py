@@ -0,0 +1,157 @@
+from DataFileReader import find_complete_end
+from DataFileReader import get_compression
+from DataFileReader import read_batches
+from DataFileReader import read_lines
+from DataFileReader import read_batches_from
+from DataFileReader import read_lines_from
+from DataFileReader import read_range
+from DataFileReader import split_file
+
+import bz2
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class DataFileReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path_to_file = os.path.join(self.directory,
+                                         'fileformat1_2015-06-28.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_lines(self, count):
+        with open(self.path_to_file, 'w') as f:
+            for index in range(count):
+                f.write('Foonyor   1%3d\n' % (index % 1000))
+
+    def test_read_lines(self):
+        self.write_lines(3)
+
+        lines = list(read_lines(self.path_to_file))
+
+        self.assertEqual(lines, ['Foonyor   1  0\n', 'Foonyor   1  1\n',
+                                 'Foonyor   1  2\n'])
+
+    def test_read_batches(self):
+        self.write_lines(5)
+
+        batches = list(read_batches(self.path_to_file, 2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+
+    def test_find_complete_end(self):
+        with open(self.path_to_file, 'w') as f:
+            f.write('Foonyor   1  1\nBarzane   0-12\nQuux')
+
+        self.assertEqual(find_complete_end(self.path_to_file), 30)
+        self.assertEqual(find_complete_end(self.path_to_file, read_size=3),
+                         30)
+
+        with open(self.path_to_file, 'w') as f:
+            f.write('Quux')
+        self.assertEqual(find_complete_end(self.path_to_file), 0)
+
+    def test_read_batches_to_end_offset(self):
+        self.write_lines(5)
+
+        batches = list(read_batches_from(self.path_to_file, 2, 15, end=60))
+
+        self.assertEqual([len(batch) for batch, _ in batches], [2, 1])
+        self.assertEqual(batches[-1][1], 60)
+
+    def test_split_file_ranges_end_on_newlines(self):
+        self.write_lines(100)
+
+        ranges = split_file(self.path_to_file, 100)
+
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.path_to_file))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(end % 15, 0)
+
+        lines = []
+        for start, end in ranges:
+            lines.extend(read_range(self.path_to_file, start, end))
+        self.assertEqual(lines, list(read_lines(self.path_to_file)))
+
+    def compress(self, extension, compress):
+        with open(self.path_to_file, 'rb') as f:
+            data = f.read()
+        path_to_file = self.path_to_file + extension
+        with open(path_to_file, 'wb') as f:
+            f.write(compress(data))
+        return path_to_file
+
+    def check_compressed(self, extension, compress):
+        self.write_lines(100)
+        path_to_file = self.compress(extension, compress)
+        plain = list(read_lines_from(self.path_to_file))
+
+        self.assertEqual(get_compression(path_to_file), extension)
+        self.assertEqual(list(read_lines_from(path_to_file)), plain)
+        self.assertEqual(list(read_lines(path_to_file)),
+                         list(read_lines(self.path_to_file)))
+        # resuming counts decompressed bytes
+        self.assertEqual(list(read_lines_from(path_to_file, plain[9][1])),
+                         plain[10:])
+        with self.assertRaises(ValueError):
+            split_file(path_to_file, 100)
+
+    def test_gzip(self):
+        self.check_compressed('.gz', gzip.compress)
+
+    def test_bzip2(self):
+        self.check_compressed('.bz2', bz2.compress)
+
+    @unittest.skipIf(lzma is None, 'lzma is not available')
+    def test_xz(self):
+        self.check_compressed('.xz', lzma.compress)
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not available')
+    def test_zstandard(self):
+        self.check_compressed('.zst', zstandard.ZstdCompressor().compress)
+
+    def test_uncompressed(self):
+        self.assertIsNone(get_compression(self.path_to_file))
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc is not available')
+    def test_read_batches_memory_is_bounded_by_batch_size(self):
+        # ~15MB file, read 1000 lines at a time through a 64KB buffer
+        self.write_lines(1000000)
+        file_size = os.path.getsize(self.path_to_file)
+
+        tracemalloc.start()
+        try:
+            line_count = 0
+            for batch in read_batches(self.path_to_file, 1000,
+                                      buffer_size=64 * 1024):
+                line_count += len(batch)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(line_count, 1000000)
+        self.assertLess(peak, 2 * 1024 * 1024)
+        self.assertLess(peak, file_size / 10)
@@ -1,9 +1,16 @@
 from DataFormat import DataFormat
 from DataFormat import DataFormatException
+from DataSink import DataSink
 from FilesDBWrapper import FilesDBWrapper
+from IngestLedger import IngestLedger
+from IngestLedger import IngestLedgerException
+from mock import patch
 from Specification import Specification
 
+import gzip
+import os
 import psycopg2
+import tempfile
 import testing.postgresql
 import unittest
 
@@ -31,6 +38,19 @@ def handler(postgresql):
                 REFERENCES specification_formats (spec_id)
                 ON DELETE CASCADE
                 )
+        """,
+        """ CREATE TABLE file_ingest_ledger (
+                file_path VARCHAR(1024) PRIMARY KEY,
+                file_size BIGINT NOT NULL,
+                content_hash VARCHAR(64) NOT NULL,
+                spec_name VARCHAR(255) NOT NULL,
+                status VARCHAR(32) NOT NULL,
+                byte_offset BIGINT NOT NULL DEFAULT 0,
+                next_line BIGINT NOT NULL DEFAULT 1,
+                row_count BIGINT NOT NULL DEFAULT 0,
+                rows_rejected BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT now()
+                )
         """)
     for command in commands:
         cursor.execute(command)
@@ -75,6 +95,15 @@ class SpecificationTest(unittest.TestCase):
 
         self.assertEqual(string, 'INSERT INTO {} VALUES (%s, %s, %s);')
 
+    def test_get_copy_sql_string_given_columns(self):
+        columns = [(1, 1, 'name', 10, 'TEXT'), (2, 1, 'valid', 1, 'BOOLEAN'),
+                   (3, 1, 'count', 3, 'INTEGER')]
+
+        string = self.data_format._get_copy_sql_string_given_columns(columns)
+
+        self.assertEqual(string,
+                         'COPY {} (name, valid, count) FROM STDIN;')
+
     def test_create_data_format_table_no_spec(self):
         with self.assertRaises(DataFormatException):
             self.data_format._create_data_format_table()
@@ -91,6 +120,18 @@ class SpecificationTest(unittest.TestCase):
         value = self.data_format.does_data_table_exist()
         self.assertTrue(value)
 
+    def test_does_data_table_exist_is_remembered(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        self.data_format._create_data_format_table()
+
+        data_format = DataFormat(self.spec, self.db, 'test/fileformat1.txt',
+                                 table_cache=self.data_format.table_cache)
+        with patch.object(self.db, 'query_all') as query_all:
+            self.assertTrue(data_format.does_data_table_exist())
+            self.assertFalse(query_all.called)
+
     def test_add_rows_to_data_format_table_no_spec(self):
         with self.assertRaises(DataFormatException):
             self.data_format._add_rows_to_data_format_table()
@@ -106,3 +147,563 @@ class SpecificationTest(unittest.TestCase):
 
         value = self.data_format.does_data_table_exist()
         self.assertTrue(value)
+
+        self.assertEqual(self.data_format.rows_loaded, 3)
+        self.assertEqual(self.data_format.rows_rejected, 0)
+
+    def test_process_data_format_records_timings(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        self.data_format.process_data_format()
+
+        summary = self.data_format.summary()
+        self.assertEqual(summary['bytes_read'], os.path.getsize(
+            'test/fileformat1_2015-06-28.txt'))
+        self.assertEqual(sorted(summary['timings']),
+                         ['convert', 'parse', 'read', 'slice', 'write'])
+        self.assertTrue(all(seconds >= 0
+                            for seconds in summary['timings'].values()))
+
+    def test_process_data_format_gzip(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        directory = tempfile.mkdtemp()
+        path_to_file = os.path.join(directory,
+                                    'fileformat1_2015-06-28.txt.gz')
+        try:
+            with open('test/fileformat1_2015-06-28.txt', 'rb') as f:
+                with gzip.open(path_to_file, 'wb') as compressed:
+                    compressed.write(f.read())
+            data_format = DataFormat(self.spec, self.db, path_to_file,
+                                     parse_workers=2)
+            data_format.process_data_format()
+        finally:
+            for file_name in os.listdir(directory):
+                os.remove(os.path.join(directory, file_name))
+            os.rmdir(directory)
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(data_format.bytes_read, os.path.getsize(
+            'test/fileformat1_2015-06-28.txt'))
+
+    def test_process_data_format_parallel_parse(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            for index in range(1000):
+                f.write('Foonyor   1%3d\n' % index)
+            f.flush()
+            data_format = DataFormat(self.spec, self.db, f.name,
+                                     parse_workers=2)
+            data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 1000)
+        self.assertEqual(data_format.rows_rejected, 0)
+
+    def test_process_data_format_rejects_bad_values(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('Foonyor   1  1\nBarzane   x-12\nQuuxitude 1103\n' +
+                    'Quuxitude 1103 extra\n')
+            f.flush()
+            data_format = DataFormat(self.spec, self.db, f.name)
+            data_format.process_data_format()
+
+            summary = data_format.summary()
+            with open(summary['reject_file']) as rejects:
+                reject_lines = rejects.read().splitlines()
+            os.remove(summary['reject_file'])
+
+        self.assertEqual(summary['rows_loaded'], 2)
+        self.assertEqual(summary['rows_rejected'], 2)
+        self.assertEqual(len(reject_lines), 2)
+        self.assertTrue(reject_lines[0].startswith('2\tvalid: '))
+        self.assertTrue(reject_lines[0].endswith('\tBarzane   x-12'))
+        self.assertTrue(reject_lines[1].startswith('4\trecord is 20 '))
+
+    def test_process_data_format_map_file(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('Foonyor   1  1\nBarzane   x-12\nQuuxitude 1103\n' +
+                    'Quuxitude 1103 extra\n')
+            f.flush()
+            data_format = DataFormat(self.spec, self.db, f.name,
+                                     batch_size=2, map_file=True)
+            data_format.process_data_format()
+            os.remove(data_format.reject_file.path)
+
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 2)
+        self.assertEqual(self.db.query_all(
+            'SELECT name, valid, count FROM fileformat1;', None),
+            [('Foonyor', True, 1), ('Quuxitude', True, 103)])
+
+    def test_process_data_format_vectorize(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False, vectorize=True)
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(self.db.query_all(
+            'SELECT name, valid, count FROM fileformat1;', None),
+            [('Foonyor', True, 1), ('Barzane', False, -12),
+             ('Quuxitude', True, 103)])
+
+    def test_process_data_format_falls_back_to_row_inserts(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False)
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 1)
+        self.assertIsNone(data_format.summary()['reject_file'])
+
+    def test_process_data_format_joins_callers_transaction(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        self.data_format.reject_file = None
+
+        with self.assertRaises(KeyboardInterrupt):
+            with self.db.transaction():
+                self.data_format.process_data_format()
+                raise KeyboardInterrupt()
+
+        self.assertEqual(self.data_format.rows_loaded, 2)
+        self.assertEqual(self.db.query_all(
+            "SELECT 1 FROM pg_class WHERE relname = 'fileformat1';", None),
+            [])
+
+    def test_process_data_format_with_checkpoints(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, batch_size=1,
+            checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry)
+        data_format.process_data_format()
+        ledger.finish(path_to_file, data_format.rows_loaded,
+                      data_format.rows_rejected)
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(ledger.get_entry(path_to_file)['next_line'], 4)
+        self.assertIsNone(ledger.begin(path_to_file, 'fileformat1'))
+
+    def test_interrupted_load_resumes_from_checkpoint(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        checkpoint = ledger.checkpointer(path_to_file, entry)
+
+        def crash_after_first_batch(byte_offset, next_line, rows_loaded,
+                                    rows_rejected):
+            if next_line > 2:
+                raise KeyboardInterrupt()
+            checkpoint(byte_offset, next_line, rows_loaded, rows_rejected)
+
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, batch_size=1,
+            checkpoint=crash_after_first_batch, resume_from=entry)
+        with self.assertRaises(KeyboardInterrupt):
+            data_format.process_data_format()
+
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        self.assertEqual(entry['byte_offset'], 15)
+        self.assertEqual(entry['row_count'], 1)
+
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, batch_size=1,
+            checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry)
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(self.db.query_and_get_id(
+            'SELECT COUNT(*) FROM fileformat1;'), 3)
+
+    def test_checkpointed_map_file_load_copies_each_block(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        checkpoint = ledger.checkpointer(path_to_file, entry)
+
+        def crash_after_first_block(byte_offset, next_line, rows_loaded,
+                                    rows_rejected):
+            if next_line > 3:
+                raise KeyboardInterrupt()
+            checkpoint(byte_offset, next_line, rows_loaded, rows_rejected)
+
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, batch_size=2,
+            write_rejects=False, map_file=True,
+            checkpoint=crash_after_first_block, resume_from=entry)
+        with self.assertRaises(KeyboardInterrupt):
+            data_format.process_data_format()
+        self.assertEqual(self.db.count_rows('fileformat1'), 2)
+
+        copy = self.db.copy
+        streams = []
+
+        def record_copy(copy_string, table_name, file_obj):
+            streams.append(type(file_obj).__name__)
+            copy(copy_string, table_name, file_obj)
+
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, batch_size=2,
+            write_rejects=False, map_file=True,
+            checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry)
+        with patch.object(self.db, 'copy', record_copy):
+            data_format.process_data_format()
+
+        self.assertEqual(streams, ['BytesCopyStream'])
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(self.db.count_rows('fileformat1'), 3)
+        self.assertEqual(ledger.get_entry(path_to_file)['next_line'], 4)
+
+    def test_checkpointed_parallel_load_falls_back_per_window(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, write_rejects=False,
+            parse_workers=2,
+            checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry)
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 1)
+        self.assertEqual(ledger.get_entry(path_to_file)['byte_offset'],
+                         os.path.getsize(path_to_file))
+
+    def test_resumed_load_does_not_repeat_rejects(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        ledger = IngestLedger(self.db)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('Foonyor   x  1\nBarzane   x-12\nQuuxitude 1103\n')
+            f.flush()
+            entry = ledger.begin(f.name, 'fileformat1')
+            checkpoint = ledger.checkpointer(f.name, entry)
+
+            def crash_in_second_batch(byte_offset, next_line, rows_loaded,
+                                      rows_rejected):
+                if next_line > 2:
+                    raise KeyboardInterrupt()
+                checkpoint(byte_offset, next_line, rows_loaded,
+                           rows_rejected)
+
+            data_format = DataFormat(self.spec, self.db, f.name,
+                                     batch_size=1,
+                                     checkpoint=crash_in_second_batch,
+                                     resume_from=entry)
+            with self.assertRaises(KeyboardInterrupt):
+                data_format.process_data_format()
+
+            entry = ledger.begin(f.name, 'fileformat1')
+            data_format = DataFormat(
+                self.spec, self.db, f.name, batch_size=1,
+                checkpoint=ledger.checkpointer(f.name, entry),
+                resume_from=entry)
+            data_format.process_data_format()
+
+            with open(data_format.reject_file.path) as rejects:
+                reject_lines = rejects.read().splitlines()
+            os.remove(data_format.reject_file.path)
+
+        self.assertEqual(data_format.rows_rejected, 2)
+        self.assertEqual([line.split('\t')[0] for line in reject_lines],
+                         ['1', '2'])
+
+    def test_changed_file_is_not_loaded_again(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        ledger = IngestLedger(self.db)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('Foonyor   1  1\n')
+            f.flush()
+            entry = ledger.begin(f.name, 'fileformat1')
+            data_format = DataFormat(
+                self.spec, self.db, f.name, write_rejects=False,
+                checkpoint=ledger.checkpointer(f.name, entry),
+                resume_from=entry)
+            data_format.process_data_format()
+            ledger.finish(f.name, 1, 0)
+
+            f.write('Barzane   0-12\n')
+            f.flush()
+            self.assertIsNone(ledger.begin(f.name, 'fileformat1'))
+            self.assertEqual(ledger.get_entry(f.name)['row_count'], 1)
+
+            entry = ledger.begin(f.name, 'fileformat1', replaces=True)
+
+        self.assertEqual((entry['byte_offset'], entry['row_count']), (0, 0))
+
+    def test_second_load_of_the_same_lines_is_rolled_back(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+
+        # a second load sees the first one's unfinished entry
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        self.assertEqual(ledger.begin(path_to_file, 'fileformat1'), entry)
+        first, second = [
+            DataFormat(self.spec, self.db, path_to_file, write_rejects=False,
+                       checkpoint=ledger.checkpointer(path_to_file, entry),
+                       resume_from=entry)
+            for _ in range(2)]
+
+        first.process_data_format()
+        with self.assertRaises(IngestLedgerException):
+            second.process_data_format()
+
+        self.assertEqual(self.db.count_rows('fileformat1'), 3)
+
+    def test_process_data_format_into_date_partition(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False, data_date='2015-06-28')
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(data_format.summary()['table'],
+                         'fileformat1_20150628')
+        self.assertEqual(self.db.query_all(
+            'SELECT DISTINCT data_date::text FROM fileformat1_20150628;',
+            None), [('2015-06-28',)])
+        self.assertEqual(self.db.query_and_get_id(
+            'SELECT COUNT(*) FROM fileformat1;'), 3)
+
+    def test_process_data_format_replaces_date_partition(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        for _ in range(2):
+            data_format = DataFormat(self.spec, self.db,
+                                     'test/fileformat1_2015-06-28.txt',
+                                     write_rejects=False,
+                                     data_date='2015-06-28',
+                                     replace_partition=True)
+            data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(self.db.query_and_get_id(
+            'SELECT COUNT(*) FROM fileformat1;'), 3)
+        self.assertEqual(self.db.query_and_get_id(
+            "SELECT COUNT(*) FROM pg_tables WHERE tablename LIKE '%_load_%';"),
+            0)
+
+    def test_partitioned_create_rejects_data_date_column(self):
+        columns = [(1, 1, 'name', 10, 'TEXT'),
+                   (2, 1, 'data_date', 10, 'DATE')]
+
+        with self.assertRaises(DataFormatException):
+            self.data_format._get_partitioned_create_sql_string_given_columns(
+                columns)
+
+    def test_process_data_format_through_staging_table(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        self.data_format.process_data_format()
+
+        copy = self.db.copy
+        seen = []
+
+        def copy_into_staging(copy_string, table_name, file_obj):
+            copy(copy_string, table_name, file_obj)
+            seen.append((table_name, self.db.query_and_get_id(
+                'SELECT relpersistence FROM pg_class WHERE relname = %s;',
+                (table_name,)), self.db.count_rows('fileformat1')))
+
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False, staging=True)
+        with patch.object(self.db, 'copy', copy_into_staging):
+            data_format.process_data_format()
+
+        self.assertEqual(len(seen), 1)
+        self.assertTrue(seen[0][0].startswith('fileformat1_load_'))
+        self.assertEqual(seen[0][1:], ('u', 3))
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(data_format.summary()['table'], 'fileformat1')
+        self.assertEqual(self.db.count_rows('fileformat1'), 6)
+        self.assertEqual(self.db.query_and_get_id(
+            "SELECT COUNT(*) FROM pg_tables WHERE tablename LIKE '%_load_%';"),
+            0)
+
+    def test_staging_merge_commits_with_the_ledger_finish(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        path_to_file = 'test/fileformat1_2015-06-28.txt'
+        ledger = IngestLedger(self.db)
+        entry = ledger.begin(path_to_file, 'fileformat1')
+
+        def crash_on_finish(rows_loaded, rows_rejected):
+            raise KeyboardInterrupt()
+
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, write_rejects=False,
+            staging=True, checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry, finish=crash_on_finish)
+        with self.assertRaises(KeyboardInterrupt):
+            data_format.process_data_format()
+        self.assertEqual(self.db.count_rows('fileformat1'), 0)
+
+        entry = ledger.begin(path_to_file, 'fileformat1')
+        data_format = DataFormat(
+            self.spec, self.db, path_to_file, write_rejects=False,
+            staging=True, checkpoint=ledger.checkpointer(path_to_file, entry),
+            resume_from=entry, finish=ledger.finisher(path_to_file))
+        data_format.process_data_format()
+
+        self.assertEqual(self.db.count_rows('fileformat1'), 3)
+        self.assertIsNone(ledger.begin(path_to_file, 'fileformat1'))
+
+    def test_process_data_format_fans_out_to_sinks(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        class ListSink(DataSink):
+            rows = []
+
+            def write_batch(self, rows):
+                self.rows.extend(rows)
+                return []
+
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False, sinks=[ListSink()])
+        data_format.process_data_format()
+
+        # the row postgres refuses is not handed on to the other sinks
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 1)
+        self.assertEqual(ListSink.rows, [['Foonyor', True, 1],
+                                         ['Barzane', False, -12]])
+
+    def test_row_a_sink_refuses_is_not_loaded_into_the_table(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        class NegativeCountSink(DataSink):
+            def check_batch(self, rows):
+                return [(index, 'negative count')
+                        for index, values in enumerate(rows)
+                        if values[2] < 0]
+
+            def write_batch(self, rows):
+                return []
+
+        data_format = DataFormat(self.spec, self.db,
+                                 'test/fileformat1_2015-06-28.txt',
+                                 write_rejects=False,
+                                 sinks=[NegativeCountSink()])
+        data_format.process_data_format()
+
+        self.assertEqual(data_format.rows_loaded, 2)
+        self.assertEqual(data_format.rows_rejected, 1)
+        self.assertEqual(self.db.query_all(
+            'SELECT name FROM fileformat1;', None),
+            [('Foonyor',), ('Quuxitude',)])
+
+    def test_resumed_load_writes_sinks_from_the_start(self):
+        lines = ['"column name",width,datatype', 'name,10,VARCHAR(7)',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+        ledger = IngestLedger(self.db)
+
+        class ListSink(DataSink):
+            def __init__(self):
+                self.rows = []
+                self.closed = False
+
+            def write_batch(self, rows):
+                self.rows.extend(rows)
+                return []
+
+            def close(self):
+                self.closed = True
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('Quuxitude 1103\nBarzane   0-12\nFoonyor   1  1\n')
+            f.flush()
+            entry = ledger.begin(f.name, 'fileformat1')
+            checkpoint = ledger.checkpointer(f.name, entry)
+
+            def crash_in_third_batch(byte_offset, next_line, rows_loaded,
+                                     rows_rejected):
+                if next_line > 3:
+                    raise KeyboardInterrupt()
+                checkpoint(byte_offset, next_line, rows_loaded,
+                           rows_rejected)
+
+            data_format = DataFormat(self.spec, self.db, f.name,
+                                     batch_size=1,
+                                     checkpoint=crash_in_third_batch,
+                                     resume_from=entry, sinks=[ListSink()])
+            with self.assertRaises(KeyboardInterrupt):
+                data_format.process_data_format()
+
+            entry = ledger.begin(f.name, 'fileformat1')
+            sink = ListSink()
+            data_format = DataFormat(
+                self.spec, self.db, f.name, batch_size=1,
+                checkpoint=ledger.checkpointer(f.name, entry),
+                resume_from=entry, sinks=[sink])
+            data_format.process_data_format()
+            os.remove(data_format.reject_file.path)
+
+        self.assertTrue(sink.closed)
+        self.assertEqual(sink.rows, [['Barzane', False, -12],
+                                     ['Foonyor', True, 1]])
+        self.assertEqual(self.db.count_rows('fileformat1'), 2)
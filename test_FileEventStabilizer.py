@@ -0,0 +1,111 @@
+from FileEventStabilizer import FileEventStabilizer
+from watchdog.events import FileCreatedEvent
+from watchdog.events import FileDeletedEvent
+from watchdog.events import FileModifiedEvent
+from watchdog.events import FileMovedEvent
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class RecordingHandler(object):
+
+    def __init__(self):
+        self.handled = []
+
+    def handle_file(self, path_to_file):
+        self.handled.append(path_to_file)
+
+
+class FileEventStabilizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fileformat1_2015-06-28.txt')
+        self.handler = RecordingHandler()
+        self.stabilizer = FileEventStabilizer(self.handler, settle_seconds=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text, path=None):
+        with open(path or self.path, 'a') as f:
+            f.write(text)
+
+    def test_coalesces_events(self):
+        self.write('Foonyor   1  1\n')
+        self.stabilizer.on_created(FileCreatedEvent(self.path))
+        self.stabilizer.on_modified(FileModifiedEvent(self.path))
+        self.stabilizer.on_modified(FileModifiedEvent(self.path))
+
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [])
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [self.path])
+        self.assertEqual(self.stabilizer.pending_count(), 0)
+
+    def test_waits_while_file_grows(self):
+        self.write('Foonyor   1  1\n')
+        self.stabilizer.on_created(FileCreatedEvent(self.path))
+        self.stabilizer.check()
+
+        self.write('Barzane   0-12\n')
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [])
+
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [self.path])
+
+    def test_settle_period(self):
+        self.stabilizer.settle_seconds = 60
+        self.write('Foonyor   1  1\n')
+        self.stabilizer.on_created(FileCreatedEvent(self.path))
+        self.stabilizer.check()
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [])
+        self.assertEqual(self.stabilizer.pending_count(), 1)
+
+    def test_rename_into_place(self):
+        partial = self.path + '.part'
+        self.write('Foonyor   1  1\n', partial)
+        self.stabilizer.on_created(FileCreatedEvent(partial))
+        os.rename(partial, self.path)
+        self.stabilizer.on_moved(FileMovedEvent(partial, self.path))
+
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [self.path])
+
+    def test_deleted_before_settling(self):
+        self.write('Foonyor   1  1\n')
+        self.stabilizer.on_created(FileCreatedEvent(self.path))
+        os.remove(self.path)
+        self.stabilizer.on_deleted(FileDeletedEvent(self.path))
+
+        self.stabilizer.check()
+        self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [])
+
+    def test_unchanged_file_not_dispatched_again(self):
+        self.write('Foonyor   1  1\n')
+        for _ in range(2):
+            self.stabilizer.on_modified(FileModifiedEvent(self.path))
+            self.stabilizer.check()
+            self.stabilizer.check()
+        self.assertEqual(self.handler.handled, [self.path])
+
+    def test_thread_dispatches(self):
+        self.stabilizer = FileEventStabilizer(self.handler,
+                                              settle_seconds=0.05)
+        self.stabilizer.start()
+        try:
+            self.write('Foonyor   1  1\n')
+            self.stabilizer.on_created(FileCreatedEvent(self.path))
+            deadline = time.time() + 5
+            while not self.handler.handled and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.stabilizer.stop()
+        self.assertEqual(self.handler.handled, [self.path])
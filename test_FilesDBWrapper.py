@@ -0,0 +1,86 @@
+from FilesDBWrapper import FilesDBWrapper
+
+import testing.postgresql
+import threading
+import unittest
+
+# Generates Postgresql class which shares the generated database
+Postgresql = testing.postgresql.PostgresqlFactory(cache_initialized_db=True)
+
+
+class FilesDBWrapperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.postgresql = Postgresql()
+        self.db = FilesDBWrapper(max_connections=2,
+                                 params=self.postgresql.dsn())
+        self.db.create('CREATE TABLE {} (value INTEGER);', 'numbers')
+
+    def tearDown(self):
+        del self.db
+        self.postgresql.stop()
+
+    def count_numbers(self):
+        return self.db.query_and_get_id('SELECT COUNT(*) FROM numbers;')
+
+    def test_transaction_commits_together(self):
+        with self.db.transaction():
+            self.db.query('INSERT INTO numbers VALUES (%s);', (1,))
+            with self.db.transaction():
+                self.db.query('INSERT INTO numbers VALUES (%s);', (2,))
+            self.assertEqual(self.count_numbers(), 2)
+
+        self.assertEqual(self.count_numbers(), 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.query('INSERT INTO numbers VALUES (%s);', (1,))
+                raise ValueError('bad load')
+
+        self.assertEqual(self.count_numbers(), 0)
+
+    def test_concurrent_queries_share_the_pool(self):
+        errors = []
+
+        def insert(value):
+            try:
+                with self.db.transaction():
+                    self.db.query('INSERT INTO numbers VALUES (%s);',
+                                  (value,))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=insert, args=(value,))
+                   for value in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.count_numbers(), 8)
+
+    def test_single_connection_is_held_for_a_transaction(self):
+        db = FilesDBWrapper(params=self.postgresql.dsn())
+        db.create('CREATE TABLE {} (value INTEGER);', 'letters')
+        inserted = threading.Event()
+
+        def insert_other():
+            inserted.wait()
+            db.query('INSERT INTO letters VALUES (%s);', (2,))
+
+        thread = threading.Thread(target=insert_other)
+        thread.start()
+        with self.assertRaises(ValueError):
+            with db.transaction():
+                db.query('INSERT INTO letters VALUES (%s);', (1,))
+                inserted.set()
+                # the other thread's query would commit this row if it
+                # ran on the connection before the rollback
+                thread.join(0.5)
+                raise ValueError('bad load')
+        thread.join()
+
+        self.assertEqual(db.query_all('SELECT value FROM letters;', None),
+                         [(2,)])
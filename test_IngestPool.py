@@ -0,0 +1,55 @@
+from IngestPool import IngestPool
+
+import threading
+import unittest
+
+
+class RecordingHandler(object):
+    processed = []
+    lock = threading.Lock()
+
+    def __init__(self, db, spec_cache):
+        self.db = db
+
+    def process_file(self, path_to_file):
+        with self.lock:
+            self.processed.append((threading.current_thread().name,
+                                   path_to_file))
+
+
+class IngestPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        RecordingHandler.processed = []
+        self.pool = IngestPool(3, 'thread', db_factory=object,
+                               handler_factory=RecordingHandler)
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.stop()
+
+    def test_processes_every_file(self):
+        paths = ['data/fileformat%s_2015-06-28.txt' % index
+                 for index in range(10)]
+        for path in paths:
+            self.pool.submit(path)
+        self.pool.wait()
+
+        processed = sorted(path for _, path in RecordingHandler.processed)
+        self.assertEqual(processed, sorted(paths))
+        self.assertEqual(self.pool.queue_depth(), 0)
+
+    def test_same_table_goes_to_same_worker(self):
+        for day in range(1, 10):
+            self.pool.submit('data/fileformat1_2015-06-0%s.txt' % day)
+        self.pool.wait()
+
+        workers = set(worker for worker, _ in RecordingHandler.processed)
+        self.assertEqual(len(workers), 1)
+        self.assertEqual([path for _, path in RecordingHandler.processed],
+                         ['data/fileformat1_2015-06-0%s.txt' % day
+                          for day in range(1, 10)])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            IngestPool(1, 'fiber')
@@ -0,0 +1,64 @@
+from Metrics import MetricsRegistry
+from Metrics import MetricsServer
+
+import unittest
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counters(self):
+        self.registry.inc('rows_loaded_total', 3)
+        self.registry.inc('rows_loaded_total', 2)
+        self.registry.inc('phase_seconds_total', 0.5, (('phase', 'read'),))
+
+        self.assertEqual(self.registry.get_counter('rows_loaded_total'), 5)
+        self.assertEqual(self.registry.get_counter(
+            'phase_seconds_total', (('phase', 'read'),)), 0.5)
+        self.assertEqual(self.registry.get_counter('files_loaded_total'), 0)
+
+    def test_histogram_render(self):
+        labels = (('operation', 'copy'),)
+        self.registry.observe('db_round_trip_seconds', 0.002, labels)
+        self.registry.observe('db_round_trip_seconds', 200, labels)
+
+        lines = self.registry.render().splitlines()
+
+        name = 'file_parser_db_round_trip_seconds'
+        self.assertIn(name + '_bucket{operation="copy",le="0.001"} 0', lines)
+        self.assertIn(name + '_bucket{operation="copy",le="0.005"} 1', lines)
+        self.assertIn(name + '_bucket{operation="copy",le="+Inf"} 2', lines)
+        self.assertIn(name + '_count{operation="copy"} 2', lines)
+
+    def test_timer(self):
+        with self.registry.timer('file_load_seconds'):
+            pass
+        self.assertEqual(
+            self.registry.get_histogram('file_load_seconds').count, 1)
+
+    def test_summary_line_reads_gauges(self):
+        self.registry.inc('files_loaded_total')
+        self.registry.register_gauge('spec_cache_hit_rate', lambda: 0.5)
+
+        line = self.registry.summary_line()
+
+        self.assertIn('files=1', line)
+        self.assertIn('spec_cache_hit_rate=0.5', line)
+
+    def test_server(self):
+        self.registry.inc('files_loaded_total')
+        server = MetricsServer(self.registry, 0)
+        server.start()
+        try:
+            body = urlopen('http://127.0.0.1:%s/metrics' %
+                           server.port).read().decode('utf-8')
+        finally:
+            server.stop()
+        self.assertIn('file_parser_files_loaded_total 1', body)
@@ -0,0 +1,44 @@
+from RejectFile import RejectFile
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class RejectFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.reject_file = RejectFile(
+            os.path.join(self.directory, 'fileformat1_2015-06-28.txt'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_lines(self):
+        with open(self.reject_file.path) as f:
+            return f.read().splitlines()
+
+    def test_escapes_multiline_reasons(self):
+        self.reject_file.write(2, 'value too long\nDETAIL:\tsee c:\\data',
+                               'Quuxitude 1103\n')
+        self.reject_file.write(4, 'record is 20 characters', 'Foonyor\n')
+        self.reject_file.close()
+
+        self.assertEqual(self.read_lines(), [
+            '2\tvalue too long\\nDETAIL:\\tsee c:\\\\data\tQuuxitude 1103',
+            '4\trecord is 20 characters\tFoonyor'])
+        self.assertEqual(self.reject_file.get_line_numbers(), set([2, 4]))
+
+    def test_truncate_drops_lines_from_next_line_on(self):
+        self.reject_file.write(2, 'value too long\nDETAIL: 11', 'Quuxitude')
+        self.reject_file.write(5, 'value too long\nDETAIL: 11', 'Barzane')
+
+        self.reject_file.truncate(3)
+
+        self.assertEqual(self.reject_file.count, 1)
+        self.assertEqual(self.read_lines(),
+                         ['2\tvalue too long\\nDETAIL: 11\tQuuxitude'])
+        self.reject_file.truncate(1)
+        self.assertFalse(os.path.exists(self.reject_file.path))
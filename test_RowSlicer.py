@@ -0,0 +1,30 @@
+from RowSlicer import RowSlicer
+
+import unittest
+
+
+class RowSlicerTest(unittest.TestCase):
+
+    def test_offsets(self):
+        slicer = RowSlicer([10, 1, 3])
+
+        self.assertEqual(slicer.offsets, [(0, 10), (10, 11), (11, 14)])
+        self.assertEqual(slicer.record_width, 14)
+
+    def test_slice(self):
+        slicer = RowSlicer([10, 1, 3])
+
+        self.assertEqual(slicer.slice('Foonyor   1  1\n'),
+                         ['Foonyor', '1', '1'])
+        self.assertEqual(slicer.slice('Quuxitude 1103'),
+                         ['Quuxitude', '1', '103'])
+
+    def test_slice_short_line(self):
+        slicer = RowSlicer([10, 1, 3])
+
+        self.assertEqual(slicer.slice('Foonyor\n'), ['Foonyor', '', ''])
+
+    def test_slice_single_column(self):
+        slicer = RowSlicer.from_columns([(1, 1, 'name', 10, 'TEXT')])
+
+        self.assertEqual(slicer.slice('Foonyor   \n'), ['Foonyor'])
@@ -2,6 +2,7 @@ from FilesDBWrapper import FilesDBWrapper
 from mock import patch
 from Specification import Specification
 from Specification import SpecificationException
+from SpecificationCache import SpecificationCache
 
 import psycopg2
 import testing.postgresql
@@ -125,3 +126,31 @@ class SpecificationTest(unittest.TestCase):
         with self.assertRaises(SpecificationException):
             with patch.object(self.spec, '_insert_specification_format'):
                     self.spec.process_specification([])
+
+    def test_load_uses_cache(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,3,INTEGER']
+        self.spec.process_specification(lines)
+
+        cache = SpecificationCache()
+        Specification('fileformat1', self.db, cache).load()
+
+        spec = Specification('fileformat1', self.db, cache)
+        with patch.object(self.db, 'query_all') as query_all:
+            self.assertTrue(spec.does_specification_exist())
+            self.assertFalse(query_all.called)
+
+        self.assertEqual(spec.spec_id, 1)
+        self.assertEqual(len(spec.columns), 3)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_process_specification_is_atomic(self):
+        lines = ['"column name",width,datatype', 'name,10,TEXT',
+                 'valid,1,BOOLEAN', 'count,NaN,INTEGER']
+
+        with self.assertRaises(SpecificationException):
+            self.spec.process_specification(lines)
+
+        spec = Specification('fileformat1', self.db)
+        self.assertFalse(spec.does_specification_exist())
@@ -0,0 +1,40 @@
+from SpecificationCache import SpecificationCache
+
+import unittest
+
+
+class SpecificationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SpecificationCache(max_size=2)
+        self.columns = [(1, 1, 'name', 10, 'TEXT')]
+
+    def test_get_counts_hits_and_misses(self):
+        self.assertIsNone(self.cache.get('fileformat1'))
+
+        self.cache.put('fileformat1', 1, self.columns, {})
+        entry = self.cache.get('fileformat1')
+
+        self.assertEqual(entry['spec_id'], 1)
+        self.assertEqual(entry['columns'], self.columns)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hit_rate(), 0.5)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('fileformat1', 1, self.columns, {})
+        self.cache.put('fileformat2', 2, self.columns, {})
+        self.cache.get('fileformat1')
+        self.cache.put('fileformat3', 3, self.columns, {})
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('fileformat2'))
+        self.assertIsNotNone(self.cache.get('fileformat1'))
+        self.assertIsNotNone(self.cache.get('fileformat3'))
+
+    def test_invalidate(self):
+        self.cache.put('fileformat1', 1, self.columns, {})
+
+        self.cache.invalidate('fileformat1')
+
+        self.assertIsNone(self.cache.get('fileformat1'))
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from ValueConverter import get_converter
+from ValueConverter import RowConverter
+
+import datetime
+import unittest
+
+
+class ValueConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        columns = [(1, 1, 'name', 10, 'TEXT'), (2, 1, 'valid', 1, 'BOOLEAN'),
+                   (3, 1, 'count', 3, 'INTEGER')]
+        self.converter = RowConverter(columns)
+
+    def test_get_converter(self):
+        self.assertIsNone(get_converter('TEXT'))
+        self.assertIsNone(get_converter('varchar(10)'))
+        self.assertEqual(get_converter('numeric(10, 2)')('1.50'),
+                         Decimal('1.50'))
+        self.assertEqual(get_converter('date')('2015-06-28'),
+                         datetime.date(2015, 6, 28))
+
+    def test_convert(self):
+        self.assertEqual(self.converter.convert(['Foonyor', '1', '-12']),
+                         ['Foonyor', True, -12])
+        self.assertEqual(self.converter.convert(['Foonyor', '', '']),
+                         ['Foonyor', None, None])
+
+    def test_convert_bad_value(self):
+        with self.assertRaises(ValueError):
+            self.converter.convert(['Foonyor', 'x', '1'])
+
+    def test_convert_integer_out_of_range(self):
+        converter = RowConverter([(1, 1, 'count', 6, 'SMALLINT')])
+
+        with self.assertRaises(ValueError):
+            converter.convert(['40000'])
+
+    def test_convert_integer_takes_ascii_digits_only(self):
+        converter = RowConverter([(1, 1, 'count', 6, 'INTEGER')])
+
+        self.assertEqual(converter.convert([' +12 ']), [12])
+        for value in ['1_000', '\u0661\u0662', '1.0']:
+            with self.assertRaises(ValueError):
+                converter.convert([value])
+
+    def test_convert_batch(self):
+        rows = [['Foonyor', '1', '1'], ['Barzane', 'x', '-12'],
+                ['Quuxitude', '1', '1a3'], ['Bar', '0', '7']]
+
+        converted, errors = self.converter.convert_batch(rows)
+
+        self.assertEqual(converted, [['Foonyor', True, 1],
+                                     ['Bar', False, 7]])
+        self.assertEqual([index for index, _ in errors], [1, 2])
+        self.assertTrue(errors[0][1].startswith('valid'))
+        self.assertTrue(errors[1][1].startswith('count'))
+
+    def test_convert_empty_batch(self):
+        self.assertEqual(self.converter.convert_batch([]), ([], []))
@@ -0,0 +1,74 @@
+from BytesParser import BytesRowRenderer
+from VectorParser import VectorRowRenderer
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+COLUMNS = [(1, 1, 'name', 10, 'TEXT'), (2, 1, 'valid', 1, 'BOOLEAN'),
+           (3, 1, 'count', 3, 'INTEGER'), (4, 1, 'day', 10, 'DATE'),
+           (5, 1, 'total', 6, 'SMALLINT')]
+
+
+@unittest.skipIf(numpy is None, 'numpy is not available')
+class VectorRowRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = VectorRowRenderer(COLUMNS)
+        self.fallback = BytesRowRenderer(COLUMNS)
+
+    def assertMatchesBytesRenderer(self, block):
+        result = self.renderer.render_block(block)
+        self.assertEqual(result, self.fallback.render_block(block))
+        return result
+
+    def test_renders_columns(self):
+        block = (b'Foonyor   1  12015-06-28   +42\n'
+                 b'Barzane   F-122015-06-29-32768\n'
+                 b'Quuxitude 1103                \n')
+
+        self.assertIsNotNone(self.renderer._get_matrix(block))
+        text, row_count, line_count, errors = (
+            self.assertMatchesBytesRenderer(block))
+
+        self.assertEqual(text, b'Foonyor\tt\t1\t2015-06-28\t+42\n'
+                               b'Barzane\tf\t-12\t2015-06-29\t-32768\n'
+                               b'Quuxitude\tt\t103\t\\N\t\\N\n')
+        self.assertEqual((row_count, line_count, errors), (3, 3, []))
+
+    def test_rejects_in_place(self):
+        block = (b'Foonyor   x  12015-06-28     1\n'
+                 b'Barzane   01 12015-06-29     2\n'
+                 b'Quuxitude 1- 32015-06-30     3\n'
+                 b'Foonyor   1  12015-02-30     4\n'
+                 b'Foonyor   1  1           32768\n'
+                 b'Foonyor   1  1             007\n'
+                 b'Barzane   0  -                \n'
+                 b'Foonyor   1  1            -0  ')
+
+        self.assertIsNotNone(self.renderer._get_matrix(block))
+        text, row_count, line_count, errors = (
+            self.assertMatchesBytesRenderer(block))
+
+        self.assertEqual([error[0] for error in errors], [0, 1, 2, 3, 4, 6])
+        self.assertEqual(text, b'Foonyor\tt\t1\t\\N\t007\n'
+                               b'Foonyor\tt\t1\t\\N\t-0\n')
+        self.assertEqual((row_count, line_count), (2, 8))
+
+    def test_other_blocks_fall_back(self):
+        for block in (b'Foonyor   1  1\n',
+                      b'Foo\\bar\tx 1  12015-06-28     1\r\n',
+                      u'Föönyor  1  12015-06-28     1\n'.encode(
+                          'utf-8')):
+            self.assertIsNone(self.renderer._get_matrix(block))
+            self.assertMatchesBytesRenderer(block)
+
+    def test_timings(self):
+        timings = {'slice': 0.0, 'convert': 0.0}
+        self.renderer.render_block(b'Foonyor   1  12015-06-28     1\n',
+                                   timings)
+
+        self.assertGreater(timings['convert'], 0.0)
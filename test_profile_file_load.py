@@ -0,0 +1,59 @@
+from Metrics import REGISTRY
+from profile_file_load import dry_run
+from profile_file_load import run_profiled
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class ProfileFileLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory,
+                                 'fileformat1_2015-06-28.txt')
+        shutil.copy('test/fileformat1_2015-06-28.txt', self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_dry_run(self):
+        data_format = dry_run(self.path, 'test/fileformat1.csv')
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertEqual(data_format.rows_rejected, 0)
+        self.assertIn('render', data_format.timings)
+        self.assertNotIn('write', data_format.timings)
+
+    def test_dry_run_adds_nothing_to_the_metrics(self):
+        before = REGISTRY.render()
+
+        dry_run(self.path, 'test/fileformat1.csv')
+
+        self.assertEqual(REGISTRY.render(), before)
+
+    def test_dry_run_leaves_the_reject_file_alone(self):
+        with open(self.path, 'a') as f:
+            f.write('Barzane   x-12\n')
+        with open(self.path + '.rejects', 'w') as f:
+            f.write('2\tfrom the last load\tBarzane   x-12\n')
+
+        data_format = dry_run(self.path, 'test/fileformat1.csv')
+
+        self.assertEqual(data_format.rows_rejected, 1)
+        with open(self.path + '.rejects') as f:
+            self.assertEqual(f.read(),
+                             '2\tfrom the last load\tBarzane   x-12\n')
+
+    def test_run_profiled_writes_profiles(self):
+        output = os.path.join(self.directory, 'profile')
+
+        data_format = run_profiled(
+            lambda: dry_run(self.path, 'test/fileformat1.csv'),
+            ['cpu', 'memory'], output, 5)
+
+        self.assertEqual(data_format.rows_loaded, 3)
+        self.assertTrue(os.path.exists(output + '.prof'))
+        self.assertTrue(os.path.exists(output + '.tracemalloc'))